@@ -0,0 +1,180 @@
+################################################################################
+#
+#  Copyright 2014-2016 Eric Lacombe <eric.lacombe@security-labs.org>
+#
+################################################################################
+#
+#  This file is part of fuddly.
+#
+#  fuddly is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  fuddly is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with fuddly. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+'''
+Helpers to provide test cases to local programs without writing a new file in
+the workspace for each of them.
+'''
+
+import os
+import sys
+import random
+import tempfile
+
+from framework.global_resources import workspace_folder
+
+tmpfs_folder = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+class DataDelivery(object):
+    '''
+    Deliver data to a program, either through:
+
+    - ``FILE``: a file in the workspace (the legacy behavior). The file name is
+      unique for each instance.
+    - ``STDIN``: the standard input of the program. Data is stored in an
+      anonymous in-memory file which is rewound before each execution, so
+      that the program can read it at its own pace.
+    - ``MEMFD``: an anonymous in-memory file provided as ``/proc/self/fd/N``.
+    - ``RING``: a ring of pre-created files in a tmpfs (``/dev/shm`` if
+      available, otherwise the workspace).
+
+    The anonymous file is created with ``memfd_create()`` if available,
+    otherwise it is an unlinked file within the tmpfs.
+    '''
+
+    FILE = 'file'
+    STDIN = 'stdin'
+    MEMFD = 'memfd'
+    RING = 'ring'
+
+    modes = (FILE, STDIN, MEMFD, RING)
+
+    def __init__(self, mode=FILE, file_ext='', prefix='fuzz_test_', ring_size=8):
+        if mode not in self.modes:
+            raise ValueError('unknown delivery mode {!r}'.format(mode))
+        self.mode = mode
+        self.file_ext = file_ext
+        self.ring_size = ring_size
+        self._suffix = '{:0>12d}'.format(random.randint(2**16, 2**32))
+        self._prefix = prefix
+        self._anon_fd = None
+        self._ring_idx = 0
+        self._ring_files = []
+
+    @property
+    def stdin(self):
+        '''
+        File descriptor to use as standard input of the program, or None
+        '''
+        return self._get_anon_fd() if self.mode == self.STDIN else None
+
+    @property
+    def fds(self):
+        '''
+        File descriptors to be inherited by the program
+        '''
+        return (self._get_anon_fd(),) if self.mode == self.MEMFD else ()
+
+    def popen_kwargs(self):
+        '''
+        Returns:
+          dict: the parameters to provide to :class:`subprocess.Popen`
+        '''
+        kwargs = {}
+        if self.stdin is not None:
+            kwargs['stdin'] = self.stdin
+        if self.fds:
+            if sys.version_info[0] > 2:
+                kwargs['pass_fds'] = self.fds
+            else:
+                kwargs['close_fds'] = False
+        return kwargs
+
+    def deliver(self, data):
+        '''
+        Store the data for the next execution of the program.
+
+        Args:
+          data (bytes): the data to provide
+
+        Returns:
+          str: the path to give to the program, or None if it reads the data
+          from its standard input.
+        '''
+        if self.mode == self.FILE:
+            path = os.path.join(workspace_folder, self._prefix + self._suffix + self.file_ext)
+            with open(path, 'wb') as f:
+                f.write(data)
+            return path
+
+        elif self.mode == self.RING:
+            if len(self._ring_files) < self.ring_size:
+                folder = tmpfs_folder if tmpfs_folder is not None else workspace_folder
+                path = os.path.join(folder, '{:s}{:s}_{:d}{:s}'.format(
+                    self._prefix, self._suffix, len(self._ring_files), self.file_ext))
+                self._ring_files.append(path)
+            else:
+                path = self._ring_files[self._ring_idx]
+            self._ring_idx = (self._ring_idx + 1) % self.ring_size
+            with open(path, 'wb') as f:
+                f.write(data)
+            return path
+
+        fd = self._get_anon_fd()
+        os.ftruncate(fd, 0)
+        os.lseek(fd, 0, os.SEEK_SET)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        os.lseek(fd, 0, os.SEEK_SET)
+
+        return '/proc/self/fd/{:d}'.format(fd) if self.mode == self.MEMFD else None
+
+    def path(self):
+        '''
+        Returns:
+          str: the path given to the program by the last call to
+          :meth:`deliver`, or None
+        '''
+        if self.mode == self.FILE:
+            return os.path.join(workspace_folder, self._prefix + self._suffix + self.file_ext)
+        elif self.mode == self.RING:
+            return self._ring_files[self._ring_idx - 1] if self._ring_files else None
+        elif self.mode == self.MEMFD:
+            return '/proc/self/fd/{:d}'.format(self._get_anon_fd())
+        else:
+            return None
+
+    def close(self):
+        if self._anon_fd is not None:
+            os.close(self._anon_fd)
+            self._anon_fd = None
+        for path in self._ring_files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._ring_files = []
+        self._ring_idx = 0
+
+    def _get_anon_fd(self):
+        if self._anon_fd is None:
+            if hasattr(os, 'memfd_create'):
+                self._anon_fd = os.memfd_create(self._prefix + self._suffix)
+            else:
+                fd, path = tempfile.mkstemp(prefix=self._prefix, dir=tmpfs_folder)
+                os.unlink(path)
+                self._anon_fd = fd
+        return self._anon_fd
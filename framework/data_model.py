@@ -33,6 +33,8 @@ import re
 import binascii
 import collections
 import traceback
+import weakref
+import types
 
 from enum import Enum
 
@@ -405,6 +407,36 @@ def flatten(nested):
             yield x
 
 
+_slots_cache = {}
+
+def copy_slots(src, dst):
+    '''
+    Copy the attributes of `src` to `dst`, including the ones that are
+    stored in the ``__slots__`` of its classes.
+    '''
+    cls = type(src)
+    descriptors = _slots_cache.get(cls)
+    if descriptors is None:
+        descriptors = []
+        for c in cls.__mro__:
+            for name in c.__dict__.get('__slots__', ()):
+                if name in ('__dict__', '__weakref__'):
+                    continue
+                if name.startswith('__') and not name.endswith('__'):
+                    name = '_' + c.__name__.lstrip('_') + name
+                descriptors.append(c.__dict__[name])
+        _slots_cache[cls] = descriptors
+
+    for d in descriptors:
+        try:
+            d.__set__(dst, d.__get__(src))
+        except AttributeError:
+            pass
+
+    if hasattr(src, '__dict__'):
+        dst.__dict__.update(src.__dict__)
+
+
 def convert_to_internal_repr(val):
     if isinstance(val, int):
         val = bytes(val)
@@ -703,37 +735,40 @@ class NodeCustomization(object):
     """
     Base class for node cutomization
     """
+    __slots__ = ('_items',)
+
+    # Default values of the customization items (class attribute)
     _custo_items = {}
 
     def __init__(self, items_to_set=None, items_to_clear=None):
-        self._custo_items = copy.copy(self._custo_items)
+        self._items = copy.copy(self._custo_items)
         if items_to_set is not None:
             if isinstance(items_to_set, int):
-                assert(items_to_set in self._custo_items)
-                self._custo_items[items_to_set] = True
+                assert(items_to_set in self._items)
+                self._items[items_to_set] = True
             elif isinstance(items_to_set, list):
                 for item in items_to_set:
-                    assert(item in self._custo_items)
-                    self._custo_items[item] = True
+                    assert(item in self._items)
+                    self._items[item] = True
         if items_to_clear is not None:
             if isinstance(items_to_clear, int):
-                assert(items_to_clear in self._custo_items)
-                self._custo_items[items_to_clear] = False
+                assert(items_to_clear in self._items)
+                self._items[items_to_clear] = False
             elif isinstance(items_to_clear, list):
                 for item in items_to_clear:
-                    assert(item in self._custo_items)
-                    self._custo_items[item] = False
+                    assert(item in self._items)
+                    self._items[item] = False
 
     def __getitem__(self, key):
-        if key in self._custo_items:
-            return self._custo_items[key]
+        if key in self._items:
+            return self._items[key]
         else:
             return None
 
     def __copy__(self):
-        new_custo = type(self)()
-        new_custo.__dict__.update(self.__dict__)
-        new_custo._custo_items = copy.copy(self._custo_items)
+        new_custo = type(self).__new__(type(self))
+        copy_slots(self, new_custo)
+        new_custo._items = copy.copy(self._items)
         return new_custo
 
 class NonTermCusto(NodeCustomization):
@@ -741,6 +776,8 @@ class NonTermCusto(NodeCustomization):
     Non-terminal node behavior-customization
     To be provided to :meth:`NodeInternals.customize`
     """
+    __slots__ = ()
+
     MutableClone = 1
     FrozenCopy = 2
     CollapsePadding = 3
@@ -753,15 +790,15 @@ class NonTermCusto(NodeCustomization):
 
     @property
     def mutable_clone_mode(self):
-        return self._custo_items[self.MutableClone]
+        return self._items[self.MutableClone]
 
     @property
     def frozen_copy_mode(self):
-        return self._custo_items[self.FrozenCopy]
+        return self._items[self.FrozenCopy]
 
     @property
     def collapse_padding_mode(self):
-        return self._custo_items[self.CollapsePadding]
+        return self._items[self.CollapsePadding]
 
 
 class GenFuncCusto(NodeCustomization):
@@ -769,6 +806,8 @@ class GenFuncCusto(NodeCustomization):
     Generator node behavior-customization
     To be provided to :meth:`NodeInternals.customize`
     """
+    __slots__ = ()
+
     ForwardConfChange = 1
     CloneExtNodeArgs = 2
     ResetOnUnfreeze = 3
@@ -783,19 +822,19 @@ class GenFuncCusto(NodeCustomization):
 
     @property
     def forward_conf_change_mode(self):
-        return self._custo_items[self.ForwardConfChange]
+        return self._items[self.ForwardConfChange]
 
     @property
     def clone_ext_node_args_mode(self):
-        return self._custo_items[self.CloneExtNodeArgs]
+        return self._items[self.CloneExtNodeArgs]
 
     @property
     def reset_on_unfreeze_mode(self):
-        return self._custo_items[self.ResetOnUnfreeze]
+        return self._items[self.ResetOnUnfreeze]
 
     @property
     def trigger_last_mode(self):
-        return self._custo_items[self.TriggerLast]
+        return self._items[self.TriggerLast]
 
 
 class FuncCusto(NodeCustomization):
@@ -803,6 +842,8 @@ class FuncCusto(NodeCustomization):
     Function node behavior-customization
     To be provided to :meth:`NodeInternals.customize`
     """
+    __slots__ = ()
+
     FrozenArgs = 1
     CloneExtNodeArgs = 2
 
@@ -813,17 +854,20 @@ class FuncCusto(NodeCustomization):
 
     @property
     def frozen_args_mode(self):
-        return self._custo_items[self.FrozenArgs]
+        return self._items[self.FrozenArgs]
 
     @property
     def clone_ext_node_args_mode(self):
-        return self._custo_items[self.CloneExtNodeArgs]
+        return self._items[self.CloneExtNodeArgs]
 
 
 class NodeInternals(object):
     """
     Base class for implementing the contents of a node.
     """
+    __slots__ = ('private', 'absorb_helper', 'absorb_constraints', 'custo',
+                 '__attrs', '_sync_with')
+
     Freezable = 1
     Mutable = 2
     Determinist = 3
@@ -834,6 +878,23 @@ class NodeInternals(object):
 
     DISABLED = 100
 
+    # Bit associated to each attribute within the attributes bitfield
+    _attr_bits = {
+        ### GENERIC ###
+        Freezable: 1 << 0,
+        Mutable: 1 << 1,
+        Determinist: 1 << 2,
+        Finite: 1 << 3,
+        # Used for absorption
+        Abs_Postpone: 1 << 4,
+        # Used to distinguish separator
+        Separator: 1 << 5,
+
+        ### INTERNAL USAGE ###
+        DISABLED: 1 << 6
+    }
+
+    _default_attrs = _attr_bits[Freezable] | _attr_bits[Mutable] | _attr_bits[Determinist]
 
     default_custo = None
 
@@ -843,20 +904,7 @@ class NodeInternals(object):
         self.absorb_constraints = None
         self.custo = None
 
-        self.__attrs = {
-            ### GENERIC ###
-            NodeInternals.Freezable: True,
-            NodeInternals.Mutable: True,
-            NodeInternals.Determinist: True,
-            NodeInternals.Finite: False,
-            # Used for absorption
-            NodeInternals.Abs_Postpone: False,
-            # Used to distinguish separator
-            NodeInternals.Separator: False,
-
-            ### INTERNAL USAGE ###
-            NodeInternals.DISABLED: False
-            }
+        self.__attrs = NodeInternals._default_attrs
 
         self._sync_with = None
         self.customize(self.default_custo)
@@ -890,18 +938,24 @@ class NodeInternals(object):
         else:
             return self._sync_with.get(scope, None)
 
+    def __copy__(self):
+        new_obj = type(self).__new__(type(self))
+        copy_slots(self, new_obj)
+        return new_obj
+
     def make_private(self, ignore_frozen_state, accept_external_entanglement, delayed_node_internals):
         if self.private is not None:
             self.private = copy.copy(self.private)
         self.absorb_constraints = copy.copy(self.absorb_constraints)
-        self.__attrs = copy.copy(self.__attrs)
 
         if self._sync_with:
             delayed_node_internals.add(self)
-        self._sync_with = copy.copy(self._sync_with)
+        if self._sync_with is not None:
+            self._sync_with = copy.copy(self._sync_with)
 
         self._make_private_specific(ignore_frozen_state, accept_external_entanglement)
-        self.custo = copy.copy(self.custo)
+        # self.custo is not copied as a NodeCustomization is never altered
+        # after its creation (NodeInternals.customize() replaces it)
 
     # Called near the end of Node copy (Node.set_contents) to update
     # node references inside the NodeInternals
@@ -950,33 +1004,39 @@ class NodeInternals(object):
         self.absorb_constraints = csts
 
     def set_attr(self, name):
-        if name not in self.__attrs:
+        if name not in self._attr_bits:
             raise ValueError
         if self._make_specific(name):
-            self.__attrs[name] = True
+            self.__attrs |= self._attr_bits[name]
 
     def clear_attr(self, name):
-        if name not in self.__attrs:
+        if name not in self._attr_bits:
             raise ValueError
         if self._unmake_specific(name):
-            self.__attrs[name] = False
+            self.__attrs &= ~self._attr_bits[name]
 
     # To be used on very specific case only
     def _set_attr_direct(self, name):
-        if name not in self.__attrs:
+        if name not in self._attr_bits:
             raise ValueError
-        self.__attrs[name] = True
+        self.__attrs |= self._attr_bits[name]
 
     # To be used on very specific case only
     def _clear_attr_direct(self, name):
-        if name not in self.__attrs:
+        if name not in self._attr_bits:
             raise ValueError
-        self.__attrs[name] = False
+        self.__attrs &= ~self._attr_bits[name]
 
     def is_attr_set(self, name):
-        if name not in self.__attrs:
+        if name not in self._attr_bits:
             raise ValueError
-        return self.__attrs[name]
+        return bool(self.__attrs & self._attr_bits[name])
+
+    def get_attrs_bitfield(self):
+        '''
+        Return the attributes as a bitfield (cf. ``NodeInternals._attr_bits``)
+        '''
+        return self.__attrs
 
     def _make_specific(self, name):
         return name not in [NodeInternals.Determinist, NodeInternals.Finite]
@@ -984,15 +1044,6 @@ class NodeInternals(object):
     def _unmake_specific(self, name):
         return name not in [NodeInternals.Determinist, NodeInternals.Finite]
 
-    def _match_mandatory_attrs(self, criteria):
-        if criteria is None:
-            return True
-
-        for c in criteria:
-            if not self.__attrs[c]:
-                return False
-        return True
-
     def _match_negative_custo(self, criteria):
         if criteria is None:
             return True
@@ -1021,75 +1072,10 @@ class NodeInternals(object):
                 return False
         return True
 
-    def _match_negative_attrs(self, criteria):
-        if criteria is None:
-            return True
-
-        for c in criteria:
-            if self.__attrs[c]:
-                return False
-        return True
-
-    def _match_node_kinds(self, criteria):
-        if criteria is None:
-            return True
-
-        for c in criteria:
-            if issubclass(self.__class__, c):
-                return True
-        return False
-
-    def _match_negative_node_kinds(self, criteria):
-        if criteria is None:
-            return True
-
-        for c in criteria:
-            if issubclass(self.__class__, c):
-                return False
-        return True
-
-    def _match_node_subkinds(self, criteria):
-        if criteria is None:
-            return True
-
-        if self.has_subkinds():
-            skind = self.get_current_subkind()
-            for c in criteria:
-                if skind == c:
-                    ret = True
-                    break
-            else:
-                ret = False
-        else:
-            ret = True            
-
-        return ret
-
-    def _match_negative_node_subkinds(self, criteria):
-        if criteria is None:
-            return True
-
-        if self.has_subkinds():
-            skind = self.get_current_subkind()
-            for c in criteria:
-                if skind == c:
-                    ret = False
-                    break
-            else:
-                ret = True
-        else:
-            ret = True
-
-        return ret
-
-
     def _match_node_constraints(self, criteria):
-        # precond: criteria is not empty
+        # precond: criteria is not empty and does not include unset constraints
 
         for scope, required in criteria.items():
-            if required is None:
-                continue
-
             if self._sync_with is None:
                 if required:
                     return False
@@ -1105,45 +1091,37 @@ class NodeInternals(object):
 
 
     def match(self, internals_criteria):
-        c1 = self._match_mandatory_attrs(internals_criteria.mandatory_attrs)
-        if not c1:
-            return False
-
-        c2 = self._match_negative_attrs(internals_criteria.negative_attrs)
-        if not c2:
-            return False
+        ic = internals_criteria
+        if not ic.is_compiled():
+            ic.compile()
 
-        c3 = self._match_mandatory_custo(internals_criteria.mandatory_custo)
-        if not c3:
-            return False
-
-        c4 = self._match_negative_custo(internals_criteria.negative_custo)
-        if not c4:
+        attrs = self.__attrs
+        if attrs & ic.mandatory_attrs_mask != ic.mandatory_attrs_mask \
+                or attrs & ic.negative_attrs_mask:
             return False
 
-        c5 = self._match_node_kinds(internals_criteria.node_kinds)
-        if not c5:
+        if ic.kinds_filtered and not ic.match_kind(self.__class__):
             return False
 
-        c6 = self._match_negative_node_kinds(internals_criteria.negative_node_kinds)
-        if not c6:
-            return False
+        if ic.custo_filtered:
+            if not self._match_mandatory_custo(ic.mandatory_custo):
+                return False
+            if not self._match_negative_custo(ic.negative_custo):
+                return False
 
-        c7 = self._match_node_subkinds(internals_criteria.node_subkinds)
-        if not c7:
-            return False
+        if ic.subkinds_filtered and self.has_subkinds():
+            skind = self.get_current_subkind()
+            if ic.node_subkinds is not None and skind not in ic.subkinds_set:
+                return False
+            if skind in ic.negative_subkinds_set:
+                return False
 
-        c8 = self._match_negative_node_subkinds(internals_criteria.negative_node_subkinds)
-        if not c8:
+        if ic.csts_filter is not None and not self._match_node_constraints(ic.csts_filter):
             return False
 
-        if internals_criteria.has_node_constraints():
-            c9 = self._match_node_constraints(internals_criteria.get_all_node_constraints())
-            if not c9:
-                return False
-
         return True
 
+
     def set_private(self, val):
         self.private = val
 
@@ -1182,12 +1160,25 @@ class NodeInternals(object):
 
 
 class NodeInternalsCriteria(object):
+    '''
+    Criteria used to select NodeInternals (cf. :func:`NodeInternals.match`).
+
+    The criteria are compiled (cf. :func:`NodeInternalsCriteria.compile`)
+    the first time they are used, and recompiled each time they are
+    modified through attribute assignments or methods. The lists
+    provided as criteria shall not be altered in place.
+    '''
+
+    _criteria_fields = frozenset(['mandatory_attrs', 'negative_attrs', 'mandatory_custo',
+                                  'negative_custo', 'node_kinds', 'negative_node_kinds',
+                                  'node_subkinds', 'negative_node_subkinds', '_node_constraints'])
 
     def __init__(self, mandatory_attrs=None, negative_attrs=None, node_kinds=None,
                  negative_node_kinds=None, node_subkinds=None, negative_node_subkinds=None,
                  mandatory_custo=None, negative_custo=None,
                  required_csts=None, negative_csts=None):
 
+        self._compiled = False
         self.mandatory_attrs = mandatory_attrs
         self.negative_attrs = negative_attrs
         self.mandatory_custo = mandatory_custo
@@ -1206,6 +1197,74 @@ class NodeInternalsCriteria(object):
             for cst in negative_csts:
                 self.set_node_constraint(cst, False)
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in NodeInternalsCriteria._criteria_fields:
+            object.__setattr__(self, '_compiled', False)
+
+    def is_compiled(self):
+        return self._compiled
+
+    def compile(self):
+        '''
+        Compile the criteria in a form that enables
+        :func:`NodeInternals.match` to check them with a few
+        integer and set operations:
+
+        - the attributes criteria are turned into bitmasks matching the
+          NodeInternals attributes bitfield;
+        - the node kinds criteria are evaluated once for each NodeInternals
+          class, the result being memoized;
+        - the subkinds criteria are turned into sets;
+        - the unset node constraints are dropped.
+        '''
+        bits = NodeInternals._attr_bits
+
+        mask = 0
+        for a in (self.mandatory_attrs or ()):
+            mask |= bits[a]
+        object.__setattr__(self, 'mandatory_attrs_mask', mask)
+
+        mask = 0
+        for a in (self.negative_attrs or ()):
+            mask |= bits[a]
+        object.__setattr__(self, 'negative_attrs_mask', mask)
+
+        object.__setattr__(self, 'kinds_filtered',
+                           self.node_kinds is not None or self.negative_node_kinds is not None)
+        object.__setattr__(self, '_kinds_memo', {})
+
+        object.__setattr__(self, 'custo_filtered',
+                           self.mandatory_custo is not None or self.negative_custo is not None)
+
+        object.__setattr__(self, 'subkinds_filtered',
+                           self.node_subkinds is not None or self.negative_node_subkinds is not None)
+        object.__setattr__(self, 'subkinds_set', frozenset(self.node_subkinds or ()))
+        object.__setattr__(self, 'negative_subkinds_set', frozenset(self.negative_node_subkinds or ()))
+
+        csts = None
+        if self._node_constraints is not None:
+            csts = dict((k, v) for k, v in self._node_constraints.items() if v is not None)
+        object.__setattr__(self, 'csts_filter', csts if csts else None)
+
+        object.__setattr__(self, '_compiled', True)
+
+    def match_kind(self, internals_class):
+        '''
+        Return True if the NodeInternals class `internals_class` complies
+        with the node kinds criteria.
+        '''
+        try:
+            return self._kinds_memo[internals_class]
+        except KeyError:
+            pass
+
+        ok = self.node_kinds is None or \
+             any(issubclass(internals_class, c) for c in self.node_kinds)
+        if ok and self.negative_node_kinds is not None:
+            ok = not any(issubclass(internals_class, c) for c in self.negative_node_kinds)
+        self._kinds_memo[internals_class] = ok
+        return ok
 
     def extend(self, ic):
         crit = ic.mandatory_attrs
@@ -1261,10 +1320,13 @@ class NodeInternalsCriteria(object):
             for cst, required in crit.items():
                 self.set_node_constraint(cst, required)
 
+        self.compile()
+
     def set_node_constraint(self, cst, required):
         if self._node_constraints is None:
             self._node_constraints = {}
         self._node_constraints[cst] = required
+        self._compiled = False
 
     def get_node_constraint(self, cst):
         return self._node_constraints[cst] if cst in self._node_constraints else None
@@ -1273,6 +1335,7 @@ class NodeInternalsCriteria(object):
         if self._node_constraints is None:
             self._node_constraints = {}
         self._node_constraints[cst] = None
+        self._compiled = False
 
     def get_all_node_constraints(self):
         return self._node_constraints
@@ -1389,6 +1452,8 @@ class DynNode_Helpers(object):
 
 
 class NodeInternals_Empty(NodeInternals):
+    __slots__ = ()
+
     def _get_value(self, conf=None, recursive=True, return_node_internals=False):
         if return_node_internals:
             return (Node.DEFAULT_DISABLED_NODEINT, True)
@@ -1401,6 +1466,8 @@ class NodeInternals_Empty(NodeInternals):
 
 
 class NodeInternals_GenFunc(NodeInternals):
+    __slots__ = ('_generated_node', 'generator_func', 'generator_arg', 'node_arg', 'env',
+                 'pdepth', '_node_helpers', 'provide_helpers', '_trigger_registered')
 
     default_custo = GenFuncCusto()
 
@@ -1547,6 +1614,8 @@ class NodeInternals_GenFunc(NodeInternals):
 
 
     def reset_generator(self):
+        if self._generated_node is not None:
+            Node._structure_version += 1
         self._generated_node = None
 
     def _get_generated_node(self):
@@ -1578,6 +1647,7 @@ class NodeInternals_GenFunc(NodeInternals):
                 ret, private_val = ret
                 self.set_private(private_val)
 
+            Node._structure_version += 1
             self._generated_node = ret
             self._generated_node._reset_depth(parent_depth=self.pdepth)
             self._generated_node.set_env(self.env)
@@ -1748,12 +1818,14 @@ class NodeInternals_GenFunc(NodeInternals):
         if self._generated_node is not None:
             self._generated_node._reset_depth(parent_depth=self.pdepth)
 
-    def get_child_nodes_by_attr(self, internals_criteria, semantics_criteria, owned_conf, conf, path_regexp, 
-                               exclude_self, respect_order, relative_depth, top_node, ignore_fstate):
-        return self.generated_node.get_reachable_nodes(internals_criteria, semantics_criteria, owned_conf, conf,
-                                                       path_regexp=path_regexp, exclude_self=False,
-                                                       respect_order=respect_order, relative_depth=relative_depth,
-                                                       top_node=top_node, ignore_fstate=ignore_fstate)
+    def get_child_nodes_by_attr(self, internals_criteria, semantics_criteria, owned_conf, conf, path_regexp,
+                                relative_depth, top_node, ignore_fstate, result, seen):
+        result.extend(self.generated_node._get_reachable_nodes(internals_criteria, semantics_criteria,
+                                                               owned_conf, conf, path_regexp=path_regexp,
+                                                               exclude_self=False,
+                                                               relative_depth=relative_depth,
+                                                               top_node=top_node,
+                                                               ignore_fstate=ignore_fstate, seen=seen))
 
     def set_child_current_conf(self, node, conf, reverse, ignore_entanglement):
         if self.custo.forward_conf_change_mode:
@@ -1780,6 +1852,8 @@ class NodeInternals_GenFunc(NodeInternals):
 
 
 class NodeInternals_Term(NodeInternals):
+    __slots__ = ('frozen_node',)
+
     def _init_specific(self, arg):
         self.frozen_node = None
 
@@ -1922,8 +1996,8 @@ class NodeInternals_Term(NodeInternals):
         pass
 
     def get_child_nodes_by_attr(self, internals_criteria, semantics_criteria, owned_conf, conf, path_regexp,
-                               exclude_self, respect_order, relative_depth, top_node, ignore_fstate):
-        return None
+                                relative_depth, top_node, ignore_fstate, result, seen):
+        pass
 
     def set_child_current_conf(self, node, conf, reverse, ignore_entanglement):
         pass
@@ -1933,6 +2007,8 @@ class NodeInternals_Term(NodeInternals):
 
 
 class NodeInternals_TypedValue(NodeInternals_Term):
+    __slots__ = ('value_type', '__fuzzy_values')
+
     def _init_specific(self, arg):
         NodeInternals_Term._init_specific(self, arg)
         self.value_type = None
@@ -1964,6 +2040,18 @@ class NodeInternals_TypedValue(NodeInternals_Term):
     def get_value_type(self):
         return self.value_type
 
+    # Value type methods reachable from the node. The other ones are
+    # called through get_value_type().
+
+    def get_current_raw_val(self):
+        return self.value_type.get_current_raw_val()
+
+    def get_subfield(self, idx):
+        return self.value_type.get_subfield(idx)
+
+    def set_raw_values(self, val):
+        return self.value_type.set_raw_values(val)
+
     def set_specific_fuzzy_values(self, vals):
         self.__fuzzy_values = vals
 
@@ -1977,7 +2065,7 @@ class NodeInternals_TypedValue(NodeInternals_Term):
             self.value_type.make_determinist()
         else:
             self.value_type.make_random()
-        self.__fuzzy_values = copy.copy(self.__fuzzy_values)
+        # self.__fuzzy_values is shared as it is only read by the disruptors
 
     def _get_value_specific(self, conf=None, recursive=True):
         ret = self.value_type.get_value()
@@ -2018,15 +2106,9 @@ class NodeInternals_TypedValue(NodeInternals_Term):
     def pretty_print(self):
         return self.value_type.pretty_print()
 
-    def __getattr__(self, name):
-        vt = self.__getattribute__('value_type')
-        if hasattr(vt, name):
-            # to avoid looping in __getattr__
-            return vt.__getattribute__(name)
-        else:
-            return object.__getattribute__(self, name)
-
 class NodeInternals_Func(NodeInternals_Term):
+    __slots__ = ('fct', 'node_arg', 'fct_arg', 'env', '_node_helpers', 'provide_helpers')
+
     default_custo = FuncCusto()
 
     def _init_specific(self, arg):
@@ -2084,11 +2166,6 @@ class NodeInternals_Func(NodeInternals_Term):
         else:
             self.custo = copy.copy(custo)
 
-        if self.custo.frozen_args_mode:
-            self._get_value_specific = self.__get_value_specific_mode1
-        else:
-            self._get_value_specific = self.__get_value_specific_mode2
-
     def set_clone_info(self, info, node):
         self._node_helpers.set_graph_info(node, info)
 
@@ -2182,12 +2259,6 @@ class NodeInternals_Func(NodeInternals_Term):
         # is unknown at this local stage.
         self.fct_arg = copy.copy(self.fct_arg)
 
-        # This is MANDATORY, because when this object is copied, the
-        # new _get_value_specific() still points to the bounded method
-        # of the copied object, and thus the bounded 'node_arg'
-        # attribute used by this function is not what we want for the new object
-        self.customize(self.custo)
-
         self._node_helpers = copy.copy(self._node_helpers)
         # The call to 'self._node_helpers.make_private()' is performed
         # the latest that is during self.make_args_private()
@@ -2210,7 +2281,10 @@ class NodeInternals_Func(NodeInternals_Term):
         pass
 
     def _get_value_specific(self, conf, recursive):
-        raise NotImplementedError
+        if self.custo.frozen_args_mode:
+            return self.__get_value_specific_mode1(conf, recursive)
+        else:
+            return self.__get_value_specific_mode2(conf, recursive)
 
     def _unfreeze_without_state_change(self, current_val):
         # 'dont_change_state' is not supported in this case. But
@@ -2348,6 +2422,12 @@ class NodeInternals_NonTerm(NodeInternals):
                          # infinite (-1). "Infinite quantity" makes
                          # sense only for absorption operation.
 
+    __slots__ = ('encoder', '_frozen_node_list', 'subnodes_set', 'subnodes_csts',
+                 'subnodes_csts_total_weight', 'subnodes_minmax', 'separator',
+                 'exhausted', 'excluded_components', 'subcomp_exhausted',
+                 'expanded_nodelist', 'expanded_nodelist_sz', 'expanded_nodelist_origsz',
+                 'component_seed', '_perform_first_step', '_nodes_drawn_qty')
+
     default_custo = NonTermCusto()
 
     def _init_specific(self, arg):
@@ -2393,6 +2473,18 @@ class NodeInternals_NonTerm(NodeInternals):
         else:
             self._nodes_drawn_qty = nodes_drawn_qty
 
+    def _get_frozen_node_list(self):
+        return self._frozen_node_list
+
+    def _set_frozen_node_list(self, node_list):
+        # Changing the frozen node list changes the graph structure
+        Node._structure_version += 1
+        self._frozen_node_list = node_list
+
+    frozen_node_list = property(fget=_get_frozen_node_list, fset=_set_frozen_node_list)
+    '''Property linked to the list of subnodes of the current frozen state, or ``None``
+    if the node is not frozen (read / write)'''
+
     def set_encoder(self, encoder):
         self.encoder = encoder
         encoder.reset()
@@ -2524,6 +2616,7 @@ class NodeInternals_NonTerm(NodeInternals):
 
     def change_subnodes_csts(self, csts_ch):
 
+        Node._structure_version += 1
         modified_csts = {}
 
         for orig, new in csts_ch:
@@ -2651,13 +2744,13 @@ class NodeInternals_NonTerm(NodeInternals):
                 if isinstance(sublist[0], list):
                     for sslist in sublist:
                         if sslist[0] not in old2new_node:
-                            old2new_node[sslist[0]] = copy.copy(sslist[0])
+                            new_node = copy.copy(sslist[0])
+                            new_node.internals = copy.copy(new_node.internals)
+                            for c in new_node.internals:
+                                new_node.internals[c] = copy.copy(new_node.internals[c])
+                            old2new_node[sslist[0]] = new_node
                         new_node = old2new_node[sslist[0]]
 
-                        new_node.internals = copy.copy(new_node.internals)
-                        for c in new_node.internals:
-                            new_node.internals[c] = copy.copy(new_node.internals[c])
-
                         if len(sslist) == 2:
                             new_sublist.append([new_node, sslist[1]])
                         else:
@@ -2671,12 +2764,12 @@ class NodeInternals_NonTerm(NodeInternals):
                             new_sslist.append(sss) # add the relative weight
                         else:   # it is a list like [<framework.data_model.Node object at 0x7fc49fc56ad0>, 2]
                             if sss[0] not in old2new_node:
-                                old2new_node[sss[0]] = copy.copy(sss[0])
+                                new_node = copy.copy(sss[0])
+                                new_node.internals = copy.copy(new_node.internals)
+                                for c in new_node.internals:
+                                    new_node.internals[c] = copy.copy(new_node.internals[c])
+                                old2new_node[sss[0]] = new_node
                             new_node = old2new_node[sss[0]]
-                            
-                            new_node.internals = copy.copy(new_node.internals)
-                            for c in new_node.internals:
-                                new_node.internals[c] = copy.copy(new_node.internals[c])
 
                             if len(sss) == 2:
                                 new_sslist.append([new_node, sss[1]])
@@ -3187,6 +3280,7 @@ class NodeInternals_NonTerm(NodeInternals):
         if self.separator is not None and self.frozen_node_list and self.frozen_node_list[-1].is_attr_set(NodeInternals.Separator):
             if not self.separator.suffix:
                 self.frozen_node_list.pop(-1)
+                Node._structure_version += 1
             self._clone_separator_cleanup()
 
         return (self.frozen_node_list, True)
@@ -3352,6 +3446,7 @@ class NodeInternals_NonTerm(NodeInternals):
     @staticmethod
     def _expand_delayed_nodes(node, node_list, idx, conf, rec):
         node_internals, node_attrs, mode, ignore_sep_fstate, ignore_separator = node.get_private()
+        Node._structure_version += 1
         node.set_private(None)
         node.clear_attr(NodeInternals.DISABLED)
         node_desc = [node] + node_attrs
@@ -3372,6 +3467,7 @@ class NodeInternals_NonTerm(NodeInternals):
 
     @staticmethod
     def _cleanup_delayed_nodes(node, node_list, idx, conf, rec):
+        Node._structure_version += 1
         node.set_private(None)
         node.clear_attr(NodeInternals.DISABLED)
         if idx < len(node_list):
@@ -3385,6 +3481,7 @@ class NodeInternals_NonTerm(NodeInternals):
             print("\n*** The separator node name shall not be used by a subnode " + \
                   "of this non-terminal node")
             raise ValueError
+        Node._structure_version += 1
         self.separator = NodeSeparator(sep_node, prefix=prefix, suffix=suffix, unique=unique)
 
     def get_separator_node(self):
@@ -3420,6 +3517,7 @@ class NodeInternals_NonTerm(NodeInternals):
         return len(self.frozen_node_list)
 
     def replace_subnode(self, old, new):
+        Node._structure_version += 1
         self.subnodes_set.remove(old)
         self.subnodes_set.add(new)
                         
@@ -3784,6 +3882,7 @@ class NodeInternals_NonTerm(NodeInternals):
                     break
                 else:
                     self.frozen_node_list.append(new_sep)
+                    Node._structure_version += 1
 
             postponed_node_desc = None
             first_pass = True
@@ -3986,6 +4085,7 @@ class NodeInternals_NonTerm(NodeInternals):
             if self.separator is not None and self.frozen_node_list and self.frozen_node_list[-1].is_attr_set(NodeInternals.Separator):
                 if not self.separator.suffix:
                     sep = self.frozen_node_list.pop(-1)
+                    Node._structure_version += 1
                     data = sep._tobytes()
                     consumed_size = consumed_size - len(data)
                     blob = blob + data
@@ -4269,38 +4369,23 @@ class NodeInternals_NonTerm(NodeInternals):
             e._reset_depth(depth)
 
     def get_child_nodes_by_attr(self, internals_criteria, semantics_criteria, owned_conf, conf, path_regexp,
-                               exclude_self, respect_order, relative_depth, top_node, ignore_fstate):
+                                relative_depth, top_node, ignore_fstate, result, seen):
 
         if self.frozen_node_list is not None and not ignore_fstate:
             iterable = self.frozen_node_list
         else:
-            iterable = self.subnodes_set
-            # self.get_subnodes_with_csts()
-            # iterable = self.frozen_node_list
-
-        if respect_order:
             # if the node is not frozen, the order will not be
             # preserved as self.subnodes_set will be used as a base,
             # and it is a set()
-            s = []
-        else:
-            s = set()
+            iterable = self.subnodes_set
 
+        # @seen is shared by the whole walk so that the deduplication
+        # is done on identity, without scanning @result
         for e in iterable:
-            nlist = e.get_reachable_nodes(internals_criteria, semantics_criteria, owned_conf, conf,
-                                          path_regexp=path_regexp,
-                                          exclude_self=False, respect_order=respect_order,
-                                          relative_depth=relative_depth, top_node=top_node,
-                                          ignore_fstate=ignore_fstate)
-
-            if respect_order:
-                for e in nlist:
-                    if e not in s:
-                        s.append(e)
-            else:
-                s = s.union(nlist)
-
-        return s
+            result.extend(e._get_reachable_nodes(internals_criteria, semantics_criteria, owned_conf, conf,
+                                                 path_regexp=path_regexp, exclude_self=False,
+                                                 relative_depth=relative_depth, top_node=top_node,
+                                                 ignore_fstate=ignore_fstate, seen=seen))
 
 
     def set_child_current_conf(self, node, conf, reverse, ignore_entanglement):
@@ -4361,6 +4446,8 @@ class NodeSemantics(object):
     To be used while defining a data model as a means to associate
     semantics to an Node.
     '''
+    __slots__ = ('__attrs',)
+
     def __init__(self, attrs=[]):
         self.__attrs = attrs
 
@@ -4569,7 +4656,12 @@ class Node(object):
       internals (dict: str --> :class:`NodeInternals`): Contains all the configuration of a
         node. A configuration is associated to the internals/contents
         of a node, which can live independently of the other
-        configuration.
+        configuration. The dictionary is not watched: replacing one of
+        its items (or the dictionary itself) outside the Node methods
+        shall be followed by a call to :func:`Node.invalidate_bytes_cache()`,
+        otherwise :func:`Node.to_bytes()` may return a stale value. Use the
+        property :attr:`Node.cc` to replace the current configuration's
+        NodeInternals, as it performs the invalidation.
       current_conf (str): Identifier to a configuration. Every usable node use at least one main
         configuration, namely ``'MAIN'``.
       name (str): Identifier of a node. Defined at instantiation.
@@ -4605,8 +4697,20 @@ class Node(object):
       _post_freeze_handler (function): Is executed just after a node is frozen (which
         is the result of requesting its value when it is not
         freezed---e.g., at its creation).
+      _bytes_cache (bytes): (internal use) Serialized value of the node as returned by
+        :func:`Node.to_bytes()`, or ``None`` if it has to be recomputed.
+      _cache_parents (weakref.WeakSet): (internal use) Nodes whose cached serialized
+        value relies on this one. They are invalidated alongside this node.
+      _path_index (tuple): (internal use) Paths of the graph behind this node
+        (path --> node and node --> paths) associated to the structure version
+        they have been computed with.
     '''
-   
+
+    __slots__ = ('internals', 'current_conf', 'name', 'env', 'entangled_nodes', 'semantics',
+                 'fuzz_weight', 'depth', 'tmp_ref_count', '_post_freeze_handler',
+                 '_delayed_jobs_called', '_bytes_cache', '_cache_parents', '_path_index',
+                 '__weakref__')
+
     DJOBS_PRIO_nterm_existence = 100
     DJOBS_PRIO_dynhelpers = 200
     DJOBS_PRIO_genfunc = 300
@@ -4618,6 +4722,23 @@ class Node(object):
     CORRUPT_QTY_SYNC = 6
     CORRUPT_NODE_QTY = 7
 
+    # Serialization cache used by Node.to_bytes() (cf. Node._get_cached_bytes())
+    bytes_cache_enabled = True
+    _bytes_cache_stats = {'hits': 0, 'misses': 0}
+    _bytes_cache_epoch = 0 # incremented on each invalidation
+
+    # Incremented on each change that may alter the paths of a graph,
+    # namely: subnodes changes, configuration switches, generated nodes
+    # changes (cf. Node._get_path_index())
+    _structure_version = 0
+
+    # Methods forwarded to the NodeInternals (through __getattr__) that
+    # do not alter the node value, and thus do not need to invalidate the
+    # serialization cache.
+    _RO_FORWARDED_PREFIXES = ('get_', 'is_', 'has_', 'pretty_print')
+    # Wrappers of the other forwarded methods, by method name (cf. Node.__getattr__())
+    _invalidating_methods = {}
+
     def __init__(self, name, base_node=None, copy_dico=None, ignore_frozen_state=False,
                  accept_external_entanglement=False, acceptance_set=None,
                  subnodes=None, values=None, value_type=None, vt=None, new_env=False):
@@ -4648,7 +4769,14 @@ class Node(object):
            will be copied. Otherwise, the same will be used.
         '''
 
+        # Shall be set first, as attribute misses are forwarded to the
+        # NodeInternals through __getattr__()
+        self._bytes_cache = None
+        self._cache_parents = None
+        self._path_index = None
+
         self.internals = {}
+        self.current_conf = None
         self.name = name
         self.env = None
 
@@ -4707,6 +4835,17 @@ class Node(object):
             else:
                 self.make_empty()
 
+    def __copy__(self):
+        # Shallow copies are made when subnodes are duplicated (cf.
+        # NodeInternals_NonTerm.make_private_subnodes()). Their states may
+        # be reset afterwards, thus the caches are not inherited.
+        new_node = type(self).__new__(type(self))
+        copy_slots(self, new_node)
+        new_node._bytes_cache = None
+        new_node._cache_parents = None
+        new_node._path_index = None
+        return new_node
+
     def get_clone(self, name=None, ignore_frozen_state=False, new_env=True):
         '''Create a new node. To be used wihtin a graph-based data model.
         
@@ -4755,7 +4894,9 @@ class Node(object):
         '''
 
         self._post_freeze_handler = base_node._post_freeze_handler
-        
+        self.invalidate_bytes_cache()
+        Node._structure_version += 1
+
         if self.internals:
             self.internals = {}
         if self.entangled_nodes:
@@ -4920,6 +5061,7 @@ class Node(object):
 
     def remove_conf(self, conf):
         if conf != 'MAIN':
+            self._check_structure_change(self.internals[conf])
             del self.internals[conf]
 
     def is_conf_existing(self, conf):
@@ -4937,6 +5079,10 @@ class Node(object):
         else:
             conf2 = node.current_conf
 
+        node.invalidate_bytes_cache()
+        if node.current_conf != conf2:
+            Node._structure_version += 1
+
         if not reverse:
             node.current_conf = conf2
 
@@ -4965,6 +5111,9 @@ class Node(object):
                 self._set_subtrees_current_conf(e, conf, reverse, ignore_entanglement=ignore_entanglement)
             else:
                 if e.is_conf_existing(conf):
+                    e.invalidate_bytes_cache()
+                    if e.current_conf != conf:
+                        Node._structure_version += 1
                     e.current_conf = conf
 
         if not ignore_entanglement and self.entangled_nodes is not None:
@@ -4976,6 +5125,15 @@ class Node(object):
     def get_current_conf(self):
         return self.current_conf
 
+    @staticmethod
+    def _check_structure_change(*internals_list):
+        # Only non-terminal and generator nodes have subnodes, thus
+        # replacing other kinds of internals does not alter the paths.
+        for internals in internals_list:
+            if isinstance(internals, (NodeInternals_NonTerm, NodeInternals_GenFunc)):
+                Node._structure_version += 1
+                break
+
     def gather_alt_confs(self):
         cfs = set()
 
@@ -5010,13 +5168,16 @@ class Node(object):
         return self.internals[self.current_conf]
 
     def __set_current_internals(self, internal):
+        self.invalidate_bytes_cache()
+        self._check_structure_change(self.internals[self.current_conf], internal)
         self.internals[self.current_conf] = internal
 
     def __get_internals(self):
         return self.internals
 
     cc = property(fget=__get_current_internals, fset=__set_current_internals)
-    '''Property linked to the current node's `internals` (read / write)'''
+    '''Property linked to the current node's `internals` (read / write).
+    Setting it invalidates the serialization cache of the node and its ancestors.'''
 
     c = property(fget=__get_internals)
     '''Property linked to `self.internals` (read only)'''
@@ -5035,6 +5196,8 @@ class Node(object):
         self.internals = backup.internals
         self.current_conf = backup.current_conf
         self.entangled_nodes = backup.entangled_nodes
+        self.invalidate_bytes_cache()
+        Node._structure_version += 1
 
     def __check_conf(self, conf):
         if conf is None:
@@ -5133,6 +5296,7 @@ class Node(object):
 
     def set_subnodes_basic(self, node_list, conf=None, ignore_entanglement=False, separator=None):
         conf = self.__check_conf(conf)
+        self.invalidate_bytes_cache()
 
         self.internals[conf] = NodeInternals_NonTerm()
         self.internals[conf].import_subnodes_basic(node_list, separator=separator)
@@ -5146,6 +5310,7 @@ class Node(object):
 
     def set_subnodes_with_csts(self, wlnode_list, conf=None, ignore_entanglement=False, separator=None):
         conf = self.__check_conf(conf)
+        self.invalidate_bytes_cache()
 
         self.internals[conf] = NodeInternals_NonTerm()
         self.internals[conf].import_subnodes_with_csts(wlnode_list, separator=separator)
@@ -5158,6 +5323,7 @@ class Node(object):
 
     def set_subnodes_full_format(self, full_list, conf=None, separator=None):
         conf = self.__check_conf(conf)
+        self.invalidate_bytes_cache()
 
         self.internals[conf] = NodeInternals_NonTerm()
         self.internals[conf].import_subnodes_full_format(subnodes_csts=full_list, separator=separator)
@@ -5166,6 +5332,8 @@ class Node(object):
 
     def set_values(self, val_list=None, value_type=None, conf=None, ignore_entanglement=False):
         conf = self.__check_conf(conf)
+        self.invalidate_bytes_cache()
+        self._check_structure_change(self.internals[conf])
 
         if val_list is not None:
             from framework.value_types import String
@@ -5191,6 +5359,8 @@ class Node(object):
     def set_func(self, func, func_node_arg=None, func_arg=None,
                  conf=None, ignore_entanglement=False, provide_helpers=False):
         conf = self.__check_conf(conf)
+        self.invalidate_bytes_cache()
+        self._check_structure_change(self.internals[conf])
 
         self.internals[conf] = NodeInternals_Func()
         self.internals[conf].import_func(func,
@@ -5208,6 +5378,8 @@ class Node(object):
                            func_arg=None, conf=None, ignore_entanglement=False,
                            provide_helpers=False):
         conf = self.__check_conf(conf)
+        self.invalidate_bytes_cache()
+        Node._structure_version += 1
 
         self.internals[conf] = NodeInternals_GenFunc()
         self.internals[conf].import_generator_func(gen_func,
@@ -5221,6 +5393,8 @@ class Node(object):
 
     def make_empty(self, conf=None):
         conf = self.__check_conf(conf)
+        self.invalidate_bytes_cache()
+        self._check_structure_change(self.internals[conf])
         self.internals[conf] = NodeInternals_Empty()
         
     def is_empty(self, conf=None):
@@ -5228,6 +5402,7 @@ class Node(object):
         return isinstance(self.internals[conf], NodeInternals_Empty)
 
     def absorb(self, blob, constraints=AbsCsts(), conf=None):
+        self.invalidate_bytes_cache()
         conf, next_conf = self._compute_confs(conf=conf, recursive=True)
         blob = convert_to_internal_repr(blob)
         status, off, sz = self.internals[conf].absorb(blob, constraints=constraints, conf=next_conf)
@@ -5295,6 +5470,7 @@ class Node(object):
         return val
 
     def set_attr(self, name, conf=None, all_conf=False, recursive=False):
+        self.invalidate_bytes_cache()
         if all_conf:
             for c in self.internals:
                 self.internals[c].set_attr(name)
@@ -5307,6 +5483,7 @@ class Node(object):
 
 
     def clear_attr(self, name, conf=None, all_conf=False, recursive=False):
+        self.invalidate_bytes_cache()
         if all_conf:
             for c in self.internals:
                 self.internals[c].clear_attr(name)
@@ -5342,7 +5519,37 @@ class Node(object):
     def get_reachable_nodes(self, internals_criteria=None, semantics_criteria=None,
                             owned_conf=None, conf=None, path_regexp=None, exclude_self=False,
                             respect_order=False, relative_depth=-1, top_node=None, ignore_fstate=False):
-        
+
+        if top_node is None:
+            top_node = self
+
+        nodes = self._get_reachable_nodes(internals_criteria, semantics_criteria, owned_conf, conf,
+                                          path_regexp, exclude_self, relative_depth, top_node,
+                                          ignore_fstate)
+
+        if not respect_order:
+            l1 = []
+            l2 = []
+            for e in nodes:
+                if e.get_fuzz_weight() > 1:
+                    l1.append(e)
+                else:
+                    l2.append(e)
+            l1 = sorted(l1, key=lambda x: -x.get_fuzz_weight())
+
+            nodes = l1 + sorted(l2, key=lambda x: x.name)
+
+        return nodes
+
+
+    def _get_reachable_nodes(self, internals_criteria, semantics_criteria, owned_conf, conf,
+                             path_regexp, exclude_self, relative_depth, top_node, ignore_fstate,
+                             seen=None):
+        '''
+        Walk through the graph for get_reachable_nodes(). The nodes are
+        returned in the walking order, without duplicates.
+        '''
+
         def __compliant(node, config, top_node):
             if node is top_node and exclude_self:
                 return False
@@ -5373,75 +5580,35 @@ class Node(object):
 
             return cond1 and cond2 and cond3
 
+        if seen is None:
+            seen = set()
+        s = []
 
-        def get_reachable_nodes_rec(node, config, rdepth, top_node):
-            s = []
-            # if respect_order:
-            #     s = []
-            # else:
-            #     s = set()
+        if conf == None:
+            config = self.current_conf
+        else:
+            config = conf
 
-            if config == None:
-                config = self.current_conf
-                next_conf = None
-            else:
-                next_conf = config
-
-            if not node.is_conf_existing(config):
-                config = node.current_conf
-
-            internal = node.internals[config]
-
-            if node.is_conf_existing(owned_conf) or (owned_conf == None):
-                if __compliant(node, config, top_node):
-                    s.append(node)
-                    # if respect_order:
-                    #     s.append(node)
-                    # else:
-                    #     s.add(node)
-
-            if rdepth <= -1 or rdepth > 0:
-                s2 = internal.get_child_nodes_by_attr(internals_criteria=internals_criteria,
-                                                      semantics_criteria=semantics_criteria,
-                                                      owned_conf=owned_conf, conf=next_conf,
-                                                      path_regexp=path_regexp,
-                                                      exclude_self=False,
-                                                      respect_order=respect_order,
-                                                      relative_depth = rdepth - 1,
-                                                      top_node=top_node, ignore_fstate=ignore_fstate)
-                if s2:
-                    for e in s2:
-                        if e not in s:
-                            s.append(e)
-                    # if respect_order:
-                    #     for e in s2:
-                    #         if e not in s:
-                    #             s.append(e)
-                    # else:
-                    #     s = s.union(s2)
-
-            return s
+        if not self.is_conf_existing(config):
+            config = self.current_conf
 
-        if top_node is None:
-            nodes = get_reachable_nodes_rec(node=self, config=conf, rdepth=relative_depth,
-                                            top_node=self)
-        else:
-            nodes = get_reachable_nodes_rec(node=self, config=conf, rdepth=relative_depth,
-                                            top_node=top_node)
+        internal = self.internals[config]
 
-        if respect_order:
-            return nodes
-        else:
-            l1 = []
-            l2 = []
-            for e in nodes:
-                if e.get_fuzz_weight() > 1:
-                    l1.append(e)
-                else:
-                    l2.append(e)
-            l1 = sorted(l1, key=lambda x: -x.get_fuzz_weight())
+        if self.is_conf_existing(owned_conf) or (owned_conf == None):
+            if self not in seen and __compliant(self, config, top_node):
+                seen.add(self)
+                s.append(self)
 
-            return l1 + sorted(l2, key=lambda x: x.name)
+        if relative_depth <= -1 or relative_depth > 0:
+            internal.get_child_nodes_by_attr(internals_criteria=internals_criteria,
+                                             semantics_criteria=semantics_criteria,
+                                             owned_conf=owned_conf, conf=conf,
+                                             path_regexp=path_regexp,
+                                             relative_depth=relative_depth - 1,
+                                             top_node=top_node, ignore_fstate=ignore_fstate,
+                                             result=s, seen=seen)
+
+        return s
 
 
     @staticmethod
@@ -5468,7 +5635,10 @@ class Node(object):
         The set of nodes that is used to perform the search include
         the node itself and all the subnodes behind it.
         '''
-        htable = self.get_all_paths(conf=conf)
+        if conf is None:
+            htable = self._get_path_index()[1]
+        else:
+            htable = self.get_all_paths(conf=conf)
 
         if path is None:
             assert(path_regexp is not None)
@@ -5510,9 +5680,37 @@ class Node(object):
         internal.get_child_all_path(name, htable, conf=next_conf, recursive=recursive)
 
 
+    def _get_path_index(self):
+        '''
+        Return the paths of the graph behind this node (with the current
+        configuration), from the index associated to this node. The index is
+        recomputed only if the structure of a graph has changed since it was built.
+
+        Returns:
+          tuple: structure version, dict (path --> node), dict (node --> list of paths)
+        '''
+        index = self._path_index
+        if index is None or index[0] != Node._structure_version:
+            htable = collections.OrderedDict()
+            self._get_all_paths_rec('', htable, None, recursive=True)
+            node2paths = {}
+            for path, node in htable.items():
+                if node in node2paths:
+                    node2paths[node].append(path)
+                else:
+                    node2paths[node] = [path]
+            # The version is retrieved at the end, as walking through the
+            # graph may create the nodes of generators
+            index = self._path_index = (Node._structure_version, htable, node2paths)
+
+        return index
+
     def get_all_paths(self, conf=None, recursive=True, depth_min=None, depth_max=None):
-        htable = collections.OrderedDict()
-        self._get_all_paths_rec('', htable, conf, recursive=recursive)
+        if conf is None and recursive:
+            htable = copy.copy(self._get_path_index()[1])
+        else:
+            htable = collections.OrderedDict()
+            self._get_all_paths_rec('', htable, conf, recursive=recursive)
 
         if depth_min is not None or depth_max is not None:
             depth_min = int(depth_min) if depth_min is not None else 0
@@ -5529,6 +5727,10 @@ class Node(object):
 
 
     def get_path_from(self, node, conf=None):
+        if conf is None:
+            paths = node._get_path_index()[2].get(self, None)
+            return paths[0] if paths else None
+
         htable = node.get_all_paths(conf=conf)
         for n, e in htable.items():
             if e == self:
@@ -5538,6 +5740,9 @@ class Node(object):
 
 
     def get_all_paths_from(self, node, conf=None):
+        if conf is None:
+            return list(node._get_path_index()[2].get(self, []))
+
         htable = node.get_all_paths(conf=conf)
         l = []
         for n, e in htable.items():
@@ -5557,6 +5762,11 @@ class Node(object):
     def set_env(self, env):
         self.__set_env_rec(env)
 
+    def set_encoder(self, encoder, conf=None):
+        conf = self.__check_conf(conf)
+        self.invalidate_bytes_cache()
+        self.internals[conf].set_encoder(encoder)
+
     def get_env(self):
         return self.env
 
@@ -5636,6 +5846,7 @@ class Node(object):
 
     def reset_state(self, recursive=False, exclude_self=False, conf=None, ignore_entanglement=False):
         self._delayed_jobs_called = False
+        self.invalidate_bytes_cache()
         current_conf, next_conf = self._compute_confs(conf=conf, recursive=recursive)
         self.internals[current_conf].reset_state(recursive=recursive, exclude_self=exclude_self, conf=next_conf,
                                                  ignore_entanglement=ignore_entanglement)
@@ -5648,6 +5859,31 @@ class Node(object):
 
     def to_bytes(self, conf=None, recursive=True):
 
+        if conf is None and recursive and Node.bytes_cache_enabled:
+            val = self._bytes_cache
+            if val is not None:
+                Node._bytes_cache_stats['hits'] += 1
+                return val
+
+            # Delayed jobs are only handled by freeze(), thus we rely on it
+            # when they may be triggered, before filling the cache.
+            env = self.env
+            if env is not None and env.delayed_jobs_enabled and \
+                    (not self._delayed_jobs_called or env.djobs_exists(Node.DJOBS_PRIO_nterm_existence)):
+                self.freeze()
+
+            # Nodes can be altered while the graph is serialized (e.g., by
+            # Func/GenFunc nodes), in which case the values retrieved before
+            # the alteration may be obsolete. Thus we perform new passes
+            # until no more alteration occurs.
+            for i in range(3):
+                epoch = Node._bytes_cache_epoch
+                val = self._get_cached_bytes()
+                if epoch == Node._bytes_cache_epoch:
+                    break
+
+            return val
+
         def tobytes_helper(node_internals):
             if isinstance(node_internals, bytes):
                 return node_internals
@@ -5673,6 +5909,108 @@ class Node(object):
         val = self.to_bytes(conf=conf, recursive=recursive)
         return unconvert_from_internal_repr(val)
 
+    def _get_cached_bytes(self):
+        '''
+        Return the serialized value of the node (with the current configuration),
+        by relying on the cached value of the node, or if it is not valid, on the
+        cached values of its subnodes. Each subnode used for computing the value
+        keeps a reference to this node, in order for
+        :func:`Node.invalidate_bytes_cache()` to invalidate only the ancestor chain
+        of a modified node.
+
+        A node is not cached if its value may change without any modification
+        of the graph (e.g., non-freezable nodes, pending existence conditions,
+        ``TriggerLast`` generators). Its ancestors are not cached either.
+        '''
+        val = self._bytes_cache
+        if val is not None:
+            Node._bytes_cache_stats['hits'] += 1
+            return val
+
+        Node._bytes_cache_stats['misses'] += 1
+
+        epoch = Node._bytes_cache_epoch
+        internal = self.internals[self.current_conf]
+
+        if isinstance(internal, NodeInternals_NonTerm):
+            if internal.frozen_node_list is None:
+                self._get_value()
+
+            cacheable = True
+            fast_path = internal.encoder is None and not internal.custo.collapse_padding_mode
+            val_list = []
+            for n in internal.frozen_node_list:
+                if n.is_attr_set(NodeInternals.DISABLED):
+                    cacheable = fast_path = False
+                    continue
+                n._add_cache_parent(self)
+                val_list.append(n._get_cached_bytes())
+                if n._bytes_cache is None:
+                    cacheable = False
+
+            # the subnodes are always processed first, in order to keep
+            # them cached even if the encoding has to be recomputed
+            val = b''.join(val_list) if fast_path else self._tobytes()
+
+        elif isinstance(internal, NodeInternals_GenFunc):
+            if internal.is_attr_set(NodeInternals.Freezable) and not internal.custo.trigger_last_mode:
+                gen_node = internal.generated_node
+                gen_node._add_cache_parent(self)
+                val = gen_node._get_cached_bytes()
+                cacheable = gen_node._bytes_cache is not None
+            else:
+                val = self._tobytes()
+                cacheable = False
+
+        else:
+            val = self._tobytes()
+            cacheable = not isinstance(internal, NodeInternals_Term) or internal.is_frozen()
+
+        if cacheable and epoch == Node._bytes_cache_epoch:
+            self._bytes_cache = val
+
+        return val
+
+    def _add_cache_parent(self, node):
+        if self._cache_parents is None:
+            self._cache_parents = weakref.WeakSet()
+        self._cache_parents.add(node)
+
+    def invalidate_bytes_cache(self):
+        '''
+        Invalidate the cached serialized value of the node and of all the nodes
+        that rely on it (cf. :func:`Node.to_bytes()`).
+
+        Every Node methods that alter the node value call it. It has only to be
+        called directly if the NodeInternals of the node are modified without
+        going through the Node API (e.g., ``node.cc.import_value_type()``).
+        '''
+        Node._bytes_cache_epoch += 1
+        node_list = [self]
+        while node_list:
+            n = node_list.pop()
+            # If a node is not cached, the nodes relying on it are not cached
+            # either, thus there is no need to go further.
+            if n._bytes_cache is None and n is not self:
+                continue
+            n._bytes_cache = None
+            if n._cache_parents:
+                node_list.extend(n._cache_parents)
+
+    @staticmethod
+    def get_bytes_cache_stats():
+        '''
+        Returns:
+          dict: number of serialized values served from the cache ('hits')
+            and recomputed ('misses') since the last reset.
+        '''
+        return dict(Node._bytes_cache_stats)
+
+    @staticmethod
+    def reset_bytes_cache_stats():
+        Node._bytes_cache_stats['hits'] = 0
+        Node._bytes_cache_stats['misses'] = 0
+
 
     def _tobytes(self, conf=None, recursive=True):
 
@@ -5699,6 +6037,7 @@ class Node(object):
 
     def set_frozen_value(self, value, conf=None):
         conf = self.__check_conf(conf)
+        self.invalidate_bytes_cache()
 
         if self.is_term(conf):
             value = convert_to_internal_repr(value)
@@ -5710,6 +6049,7 @@ class Node(object):
     def unfreeze(self, conf=None, recursive=True, dont_change_state=False, ignore_entanglement=False, only_generators=False,
                  reevaluate_constraints=False):
         self._delayed_jobs_called = False
+        self.invalidate_bytes_cache()
 
         if conf is not None:
             next_conf = conf
@@ -5733,6 +6073,7 @@ class Node(object):
 
     def unfreeze_all(self, recursive=True, ignore_entanglement=False):
         self._delayed_jobs_called = False
+        self.invalidate_bytes_cache()
 
         for conf in self.internals:
             if self.is_frozen(conf):
@@ -5843,13 +6184,14 @@ class Node(object):
             smaller_depth = []
             prev_depth = l[i][0].count('/')
 
+            seen = set()
             for j in range(i, nodes_nb):
                 current = l[j][1]
                 sep_nb = l[j][0].count('/')
                 if current.depth != sep_nb:
                     # case when the same node is used at different depth
-                    if not hasattr(current, '_seen'):
-                        current._seen = True
+                    if current not in seen:
+                        seen.add(current)
                         current.depth = sep_nb
 
                 if current.depth != prev_depth:
@@ -5857,12 +6199,6 @@ class Node(object):
 
                 prev_depth = current.depth
 
-
-            for j in range(i, nodes_nb):
-                current = l[j][1]
-                if hasattr(current, '_seen'):
-                    del current._seen
-
             for j in range(i+1, nodes_nb):
                 delta = depth - l[j][1].depth
                 if delta > 0:
@@ -6074,10 +6410,26 @@ class Node(object):
                     if status != AbsorbStatus.FullyAbsorbed:
                         raise ValueError
 
+    @staticmethod
+    def _get_invalidating_method(name):
+        method = Node._invalidating_methods.get(name)
+        if method is None:
+            def method(node, *args, **kwargs):
+                node.invalidate_bytes_cache()
+                return getattr(node.internals[node.current_conf], name)(*args, **kwargs)
+            method.__name__ = name
+            Node._invalidating_methods[name] = method
+        return method
+
     def __getattr__(self, name):
         internals = self.__getattribute__('internals')[self.current_conf]
         if hasattr(internals, name):
-            return getattr(internals, name)
+            attr = getattr(internals, name)
+            if callable(attr) and hasattr(attr, '__self__') and \
+                    not name.startswith(Node._RO_FORWARDED_PREFIXES):
+                # Forwarded methods may alter the node value
+                return types.MethodType(Node._get_invalidating_method(name), self)
+            return attr
         else:
             return object.__getattribute__(self, name)
 
@@ -2,8 +2,14 @@ import sys
 import os
 import re
 import math
+import time
+import zlib
+import hashlib
 import threading
+import collections
+import multiprocessing
 from datetime import datetime
+from six.moves.urllib.request import pathname2url
 
 import framework.global_resources as gr
 import libs.external_modules as em
@@ -11,34 +17,247 @@ from libs.external_modules import *
 from libs.utils import ensure_dir, chunk_lines
 
 
+# SQL functions are called on every row, thus their patterns are compiled once
+_compiled_regexps = {}
+
+def _compile(expr):
+    reg = _compiled_regexps.get(expr)
+    if reg is None:
+        if len(_compiled_regexps) >= 100:
+            _compiled_regexps.clear()
+        reg = _compiled_regexps[expr] = re.compile(expr)
+    return reg
+
 def regexp(expr, item):
-    reg = re.compile(expr)
+    reg = _compile(expr)
     if item is None:
         return False
     robj = reg.search(item)
     return robj is not None
 
+def is_blank(item):
+    if item is None:
+        return True
+    if not hasattr(item, 'strip'):
+        item = bytes(item)
+    return not item.strip()
+
 def regexp_bin(expr, item):
     expr = bytes(expr)
-    reg = re.compile(expr)
+    reg = _compile(expr)
     if item is None:
         return False
     robj = reg.search(item)
     return robj is not None
 
+def _read_only_uri(path):
+    return 'file:{:s}?mode=ro'.format(pathname2url(os.path.abspath(path)))
+
+def _get_records_read_only(task):
+    """
+    Run an analysis statement on a read-only connection to the database (and its
+    shards). Executed by the worker processes of Database._get_analysis_records().
+    """
+    db_path, shards, stmt, params = task
+    connection = sqlite3.connect(_read_only_uri(db_path), uri=True,
+                                 detect_types=sqlite3.PARSE_DECLTYPES)
+    try:
+        for schema, path in shards:
+            connection.execute("ATTACH DATABASE ? AS {:s}".format(schema),
+                               (_read_only_uri(path),))
+        Database._create_shard_views(connection, [schema for schema, _ in shards])
+        Database._create_functions(connection)
+        return connection.execute(stmt, params).fetchall()
+    finally:
+        connection.close()
+
 
 class Database(object):
 
     DDL_fname = 'fmk_db.sql'
 
+    # Version of the schema described by DDL_fname (stored in the CONF table)
+    SCHEMA_VERSION = 4
+
+    # Scripts upgrading a database from the previous schema version
+    SCHEMA_MIGRATIONS = {
+        2: '''
+        BEGIN TRANSACTION;
+
+        CREATE INDEX IF NOT EXISTS DATA_PRJ_NAME_TARGET_IDX ON DATA (PRJ_NAME, TARGET);
+        CREATE INDEX IF NOT EXISTS DATA_SENT_DATE_IDX ON DATA (SENT_DATE);
+        CREATE INDEX IF NOT EXISTS FEEDBACK_DATA_ID_IDX ON FEEDBACK (DATA_ID);
+        CREATE INDEX IF NOT EXISTS FEEDBACK_STATUS_SOURCE_IDX ON FEEDBACK (STATUS, SOURCE);
+        CREATE INDEX IF NOT EXISTS COMMENTS_DATA_ID_IDX ON COMMENTS (DATA_ID);
+        CREATE INDEX IF NOT EXISTS FMKINFO_DATA_ID_IDX ON FMKINFO (DATA_ID);
+
+        CREATE TABLE DATA_STATS (
+            TARGET TEXT,
+            TYPE   TEXT,
+            TOTAL  INTEGER,
+            PRIMARY KEY (
+                TARGET,
+                TYPE
+            )
+        );
+
+        INSERT INTO DATA_STATS (TARGET, TYPE, TOTAL)
+            SELECT TARGET, TYPE, count(*) FROM DATA GROUP BY TARGET, TYPE;
+
+        CREATE TRIGGER DATA_STATS_INSERT AFTER INSERT ON DATA
+        BEGIN
+            INSERT INTO DATA_STATS (TARGET, TYPE, TOTAL)
+                SELECT NEW.TARGET, NEW.TYPE, 0
+                WHERE NOT EXISTS (SELECT 1 FROM DATA_STATS
+                                  WHERE TARGET IS NEW.TARGET AND TYPE IS NEW.TYPE);
+            UPDATE DATA_STATS SET TOTAL = TOTAL + 1
+                WHERE TARGET IS NEW.TARGET AND TYPE IS NEW.TYPE;
+        END;
+
+        CREATE TRIGGER DATA_STATS_DELETE AFTER DELETE ON DATA
+        BEGIN
+            UPDATE DATA_STATS SET TOTAL = TOTAL - 1
+                WHERE TARGET IS OLD.TARGET AND TYPE IS OLD.TYPE;
+            DELETE FROM DATA_STATS
+                WHERE TARGET IS OLD.TARGET AND TYPE IS OLD.TYPE AND TOTAL <= 0;
+        END;
+
+        DROP VIEW IF EXISTS STATS;
+        CREATE VIEW STATS AS
+            SELECT coalesce(DMK.CLONE_TYPE, DATA_STATS.TYPE) AS TYPE,
+                   sum(DATA_STATS.TOTAL) AS TOTAL
+            FROM DATA_STATS
+                 LEFT JOIN
+                 (SELECT TYPE, max(CLONE_TYPE) AS CLONE_TYPE FROM DMAKERS GROUP BY TYPE) AS DMK
+                 ON DATA_STATS.TYPE == DMK.TYPE
+            GROUP BY 1;
+
+        DROP VIEW IF EXISTS STATS_BY_TARGET;
+        CREATE VIEW STATS_BY_TARGET AS
+            SELECT DATA_STATS.TARGET AS TARGET, coalesce(DMK.CLONE_TYPE, DATA_STATS.TYPE) AS TYPE,
+                   sum(DATA_STATS.TOTAL) AS TOTAL
+            FROM DATA_STATS
+                 INNER JOIN
+                 (SELECT TYPE, max(CLONE_TYPE) AS CLONE_TYPE FROM DMAKERS GROUP BY TYPE) AS DMK
+                 ON DATA_STATS.TYPE == DMK.TYPE
+            GROUP BY 1, 2;
+
+        INSERT OR REPLACE INTO CONF (ITEM, VALUE) VALUES ('SCHEMA_VERSION', 2);
+
+        COMMIT TRANSACTION;
+        ''',
+        # Contents of the DATA recorded before are left in DATA.CONTENT
+        3: '''
+        BEGIN TRANSACTION;
+
+        CREATE TABLE DICTIONARIES (
+            ID        INTEGER  PRIMARY KEY ASC AUTOINCREMENT,
+            DM_NAME   TEXT REFERENCES DATAMODEL (NAME),
+            CODEC     TEXT,
+            DATE      TIMESTAMP,
+            CONTENT   BLOB
+        );
+
+        CREATE TABLE PAYLOADS (
+            ID        INTEGER  PRIMARY KEY ASC AUTOINCREMENT,
+            HASH      TEXT     UNIQUE
+                               NOT NULL,
+            CODEC     TEXT,
+            DICT_ID   INTEGER REFERENCES DICTIONARIES (ID),
+            SIZE      INTEGER,
+            CONTENT   BLOB,
+            REFS      INTEGER
+        );
+
+        ALTER TABLE DATA ADD COLUMN CONTENT_HASH TEXT REFERENCES PAYLOADS (HASH);
+
+        CREATE TRIGGER PAYLOADS_REFS_INSERT AFTER INSERT ON DATA
+        WHEN NEW.CONTENT_HASH IS NOT NULL
+        BEGIN
+            UPDATE PAYLOADS SET REFS = REFS + 1 WHERE HASH == NEW.CONTENT_HASH;
+        END;
+
+        CREATE TRIGGER PAYLOADS_REFS_DELETE AFTER DELETE ON DATA
+        WHEN OLD.CONTENT_HASH IS NOT NULL
+        BEGIN
+            UPDATE PAYLOADS SET REFS = REFS - 1 WHERE HASH == OLD.CONTENT_HASH;
+            DELETE FROM PAYLOADS WHERE HASH == OLD.CONTENT_HASH AND REFS <= 0;
+        END;
+
+        INSERT OR REPLACE INTO CONF (ITEM, VALUE) VALUES ('SCHEMA_VERSION', 3);
+
+        COMMIT TRANSACTION;
+        ''',
+        4: '''
+        BEGIN TRANSACTION;
+
+        CREATE TABLE SHARDS (
+            ID         INTEGER  PRIMARY KEY ASC AUTOINCREMENT,
+            PATH       TEXT,
+            FIRST_ID   INTEGER,
+            LAST_ID    INTEGER,
+            START_DATE TIMESTAMP,
+            END_DATE   TIMESTAMP
+        );
+
+        INSERT OR REPLACE INTO CONF (ITEM, VALUE) VALUES ('SHARD_START', strftime('%s', 'now'));
+        INSERT OR REPLACE INTO CONF (ITEM, VALUE) VALUES ('SCHEMA_VERSION', 4);
+
+        COMMIT TRANSACTION;
+        ''',
+    }
+
+    # Tables holding the records of the DATA, which are spread over the shards
+    SHARDED_TABLES = ['DATA', 'STEPS', 'FEEDBACK', 'COMMENTS', 'FMKINFO', 'PAYLOADS',
+                      'DATA_STATS']
+    # Tables copied to each new shard
+    CATALOG_TABLES = ['PROJECT', 'DATAMODEL', 'DMAKERS', 'DICTIONARIES', 'SHARDS']
+
+    COMPRESSION_CODECS = ['zlib', 'zstd']
+
+    # Minimal number of DATA IDs analyzed by a worker process
+    ANALYSIS_PARTITION_MIN_SIZE = 10000
+
+    # Number of recently stored payloads which are not submitted again to the database
+    PAYLOAD_CACHE_SIZE = 4096
+    # Maximum size of the compression dictionaries trained on data model samples
+    DICTIONARY_SIZE = 32768
+
     DEFAULT_DM_NAME = '__DEFAULT_DATAMODEL'
     DEFAULT_GTYPE_NAME = '__DEFAULT_GTYPE'
     DEFAULT_GEN_NAME = '__DEFAULT_GNAME'
 
     OUTCOME_ROWID = 1
     OUTCOME_DATA = 2
+    OUTCOME_BLOB = 3
+    OUTCOME_ROTATE = 4
+    OUTCOME_COMMIT = 5
 
-    def __init__(self, fmkdb_path=None):
+    SYNCHRONOUS_LEVELS = ['OFF', 'NORMAL', 'FULL', 'EXTRA']
+
+    def __init__(self, fmkdb_path=None, commit_batch_size=200, commit_period=0.5,
+                 journal_mode='WAL', synchronous='NORMAL', compression=None,
+                 compression_level=None, shard_max_size=None, shard_max_data=None,
+                 shard_max_age=None, analysis_workers=1):
+        """
+        Args:
+            fmkdb_path (str): path to the database file
+            commit_batch_size (int): maximum number of statements grouped in a transaction
+            commit_period (float): maximum duration (in seconds) a statement can wait
+              before being committed
+            journal_mode (str): SQLite journal mode (`None` to keep the one of the database)
+            synchronous (str): SQLite synchronous level (one of `SYNCHRONOUS_LEVELS`)
+            compression (str): codec used to compress the stored payloads (one of
+              `COMPRESSION_CODECS`, or `None` to store them as is)
+            compression_level (int): compression level (`None` for the codec default)
+            shard_max_size (int): size (in bytes) of the database file above which the
+              recorded DATA are moved to a new shard
+            shard_max_data (int): number of DATA recorded in a shard before rotating
+            shard_max_age (float): duration (in seconds) of recording in a shard before
+              rotating
+            analysis_workers (int): number of processes scanning the database in
+              parallel for the analysis requests (`None` for the number of CPUs)
+        """
         self.name = 'fmkDB.db'
         if fmkdb_path is None:
             self.fmk_db_path = os.path.join(gr.fuddly_data_folder, self.name)
@@ -51,8 +270,34 @@ class Database(object):
         self.last_feedback = {}
         self.last_data_id = None
 
+        # Last DATA ID allocated. Initialized from the database by the SQL handler,
+        # so that DATA records can be inserted without waiting for their rowid.
         self._data_id = None
 
+        self.commit_batch_size = commit_batch_size
+        self.commit_period = commit_period
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+
+        # Payloads are stored once in the PAYLOADS table, identified by their SHA-256
+        self.compression = None
+        self.compression_level = None
+        self._payload_cache = collections.OrderedDict()
+        self._payload_cache_lock = threading.Lock()
+        self._dm_dictionaries = {}
+        self._dictionaries = {}
+        self.set_compression(compression, compression_level)
+
+        # Previous shards are attached to the connection and described in the
+        # SHARDS table of the current one (cf. set_shard_rotation())
+        self._shards = []
+        self._shard_paths = {}
+        self._shard_first_id = None
+        self._shard_start = None
+        self.set_shard_rotation(shard_max_size, shard_max_data, shard_max_age)
+
+        self.set_analysis_workers(analysis_workers)
+
         self._sql_handler_thread = None
         self._sql_handler_stop_event = threading.Event()
 
@@ -92,11 +337,39 @@ class Database(object):
 
         return valid
 
+    @staticmethod
+    def _get_schema_version(cursor):
+        try:
+            cursor.execute("SELECT VALUE FROM CONF WHERE ITEM == 'SCHEMA_VERSION'")
+        except sqlite3.Error:
+            return None
+        version = cursor.fetchone()
+        # Databases created before schema versioning do not record their version
+        return 1 if version is None else int(version[0])
+
+    def _migrate(self, connection, cursor):
+        version = self._get_schema_version(cursor)
+        if version is None:
+            return False
+
+        while version < self.SCHEMA_VERSION:
+            version += 1
+            print("\n*** Upgrading the database '{:s}' to schema version {:d} ***"
+                  .format(self.fmk_db_path, version))
+            try:
+                cursor.executescript(self.SCHEMA_MIGRATIONS[version])
+            except sqlite3.Error as e:
+                connection.rollback()
+                print("\n*** ERROR[SQL:{:s}] while upgrading the database!".format(e.args[0]))
+                return False
+
+        return True
+
     def _sql_handler(self):
         if os.path.isfile(self.fmk_db_path):
             connection = sqlite3.connect(self.fmk_db_path, detect_types=sqlite3.PARSE_DECLTYPES)
             cursor = connection.cursor()
-            self._ok = self._is_valid(connection, cursor)
+            self._ok = self._migrate(connection, cursor) and self._is_valid(connection, cursor)
         else:
             connection = sqlite3.connect(self.fmk_db_path, detect_types=sqlite3.PARSE_DECLTYPES)
             fmk_db_sql = open(gr.fmk_folder + self.DDL_fname).read()
@@ -106,40 +379,82 @@ class Database(object):
                 cursor.executescript(fmk_db_sql)
                 self._ok = True
 
+        if not self._ok:
+            self._thread_initialized.set()
+            return
+
+        # Pending statements of the validation would prevent changing the journal mode
+        cursor.close()
+        cursor = connection.cursor()
+
+        try:
+            self._set_pragmas(connection)
+            self._attach_shards(connection)
+            self._data_id = self._get_last_data_id(cursor)
+            self._init_shard_state(cursor)
+        except sqlite3.Error as e:
+            print("\n*** ERROR[SQL:{:s}] while initializing the database!".format(e.args[0]))
+            self._ok = False
+
         self._thread_initialized.set()
 
         if not self._ok:
+            connection.close()
             return
 
-        connection.create_function("REGEXP", 2, regexp)
-        connection.create_function("BINREGEXP", 2, regexp_bin)
+        self._create_functions(connection)
 
-        while not self._sql_handler_stop_event.is_set():
+        uncommitted = 0
+        commit_deadline = None
 
-            with self._sql_stmt_submitted_cond:
-                self._sql_stmt_submitted_cond.wait(0.01)
+        while True:
 
-                if self._sql_stmt_list:
-                    sql_stmts = self._sql_stmt_list
-                    self._sql_stmt_list = []
-                else:
-                    continue
+            stop = self._sql_handler_stop_event.is_set()
+
+            with self._sql_stmt_submitted_cond:
+                if not self._sql_stmt_list and not stop:
+                    if commit_deadline is None:
+                        self._sql_stmt_submitted_cond.wait()
+                    else:
+                        self._sql_stmt_submitted_cond.wait(max(0, commit_deadline - time.time()))
+                sql_stmts = self._sql_stmt_list
+                self._sql_stmt_list = []
 
             last_stmt_error = True
+            outcome_type = None
             for stmt in sql_stmts:
-                sql_stmt, sql_params, outcome_type, sql_error = stmt
+                sql_stmt, sql_params, outcome_type, sql_error, many = stmt
                 try:
-                    if sql_params is None:
+                    if outcome_type == Database.OUTCOME_COMMIT:
+                        self._commit(connection)
+                        uncommitted = 0
+                        commit_deadline = None
+                    elif outcome_type == Database.OUTCOME_ROTATE:
+                        self._commit(connection)
+                        uncommitted = 0
+                        commit_deadline = None
+                        connection, rotated = self._rotate(connection, *sql_params)
+                        cursor = connection.cursor()
+                        if not rotated:
+                            raise sqlite3.OperationalError('shard rotation failed')
+                    elif outcome_type == Database.OUTCOME_BLOB:
+                        blob_chunk = self._read_blob(connection, cursor, *sql_params)
+                    elif many:
+                        cursor.executemany(sql_stmt, sql_params)
+                    elif sql_params is None:
                         cursor.execute(sql_stmt)
                     else:
                         cursor.execute(sql_stmt, sql_params)
-                    connection.commit()
                 except sqlite3.Error as e:
-                    connection.rollback()
+                    # Only the faulty statement is rolled back by SQLite, the
+                    # current transaction is kept
                     print("\n*** ERROR[SQL:{:s}] ".format(e.args[0])+sql_error)
                     last_stmt_error = True
                 else:
                     last_stmt_error = False
+                    uncommitted += 1
+                    if commit_deadline is None:
+                        commit_deadline = time.time() + self.commit_period
 
             if outcome_type is not None:
                 with self._sql_stmt_outcome_lock:
@@ -153,34 +468,251 @@ class Database(object):
                         self._sql_stmt_outcome = cursor.lastrowid
                     elif outcome_type == Database.OUTCOME_DATA:
                         self._sql_stmt_outcome = cursor.fetchall()
+                    elif outcome_type == Database.OUTCOME_BLOB:
+                        self._sql_stmt_outcome = blob_chunk
+                    elif outcome_type in (Database.OUTCOME_ROTATE, Database.OUTCOME_COMMIT):
+                        self._sql_stmt_outcome = True
                     else:
                         print("\n*** ERROR: Unrecognized outcome type request")
                         self._sql_stmt_outcome = None
 
                 self._sql_stmt_handled.set()
 
-            self._sql_handler_stop_event.wait(0.01)
+            if uncommitted and (stop or uncommitted >= self.commit_batch_size
+                                or time.time() >= commit_deadline):
+                try:
+                    self._commit(connection)
+                except sqlite3.Error as e:
+                    print("\n*** ERROR[SQL:{:s}] while committing {:d} statements!"
+                          .format(e.args[0], uncommitted))
+                uncommitted = 0
+                commit_deadline = None
+
+            if stop:
+                break
 
         if connection:
             connection.close()
 
+    def _commit(self, connection):
+        try:
+            connection.commit()
+        except sqlite3.Error:
+            connection.rollback()
+            # Payloads inserted by the rolled back statements have to be submitted again
+            self._clear_payload_cache()
+            raise
+
+    @staticmethod
+    def _create_functions(connection):
+        connection.create_function("REGEXP", 2, regexp)
+        connection.create_function("BINREGEXP", 2, regexp_bin)
+        connection.create_function("ISBLANK", 1, is_blank)
+
+    def _attach_shards(self, connection):
+        self._shards = []
+        self._shard_paths = {}
+        shards = connection.execute("SELECT ID, PATH FROM main.SHARDS ORDER BY ID DESC").fetchall()
+        for shard_id, path in shards:
+            path = os.path.join(os.path.dirname(self.fmk_db_path), path)
+            if not os.path.isfile(path):
+                print("\n*** WARNING: The FmkDB shard '{:s}' is missing. Its records are ignored!"
+                      .format(path))
+                continue
+
+            schema = 'SHARD{:d}'.format(shard_id)
+            try:
+                connection.execute("ATTACH DATABASE ? AS {:s}".format(schema), (path,))
+            except sqlite3.Error as e:
+                # The number of attached databases is limited by SQLite
+                print("\n*** WARNING[SQL:{:s}] The FmkDB shard '{:s}' cannot be attached. Its"
+                      " records and the ones of older shards are ignored!".format(e.args[0], path))
+                break
+
+            version = connection.execute("SELECT VALUE FROM {:s}.CONF WHERE ITEM == "
+                                         "'SCHEMA_VERSION'".format(schema)).fetchone()
+            if version is None or int(version[0]) != self.SCHEMA_VERSION:
+                connection.execute("DETACH DATABASE {:s}".format(schema))
+                print("\n*** WARNING: The schema of the FmkDB shard '{:s}' is not supported. Its"
+                      " records are ignored!".format(path))
+                continue
+
+            self._shards.append(schema)
+            self._shard_paths[schema] = path
+
+        self._create_shard_views(connection, self._shards)
+
+    @classmethod
+    def _create_shard_views(cls, connection, shards):
+        if not shards:
+            return
+
+        # Temporary views shadow the tables of the main database to gather the records
+        # of every shard, most recent first
+        schemas = ['main'] + shards
+        for table in cls.SHARDED_TABLES:
+            selects = []
+            for idx, schema in enumerate(schemas):
+                select = "SELECT *, '{sch:s}' AS SHARD FROM {sch:s}.{tbl:s}".format(sch=schema,
+                                                                                   tbl=table)
+                if table == 'PAYLOADS' and idx > 0:
+                    # A payload stored again in a more recent shard is provided only once
+                    select += " WHERE " + " AND ".join(
+                        "HASH NOT IN (SELECT HASH FROM {:s}.PAYLOADS)".format(prev)
+                        for prev in schemas[:idx])
+                selects.append(select)
+            connection.execute("DROP VIEW IF EXISTS temp.{:s}".format(table))
+            connection.execute("CREATE TEMP VIEW {:s} AS ".format(table) +
+                               " UNION ALL ".join(selects))
+
+        # Views of the main database only refer to its own tables
+        views = connection.execute("SELECT NAME, SQL FROM main.SQLITE_MASTER "
+                                   "WHERE TYPE == 'view'").fetchall()
+        for name, sql in views:
+            connection.execute("DROP VIEW IF EXISTS temp.{:s}".format(name))
+            connection.execute(re.sub(r'^\s*CREATE\s+VIEW', 'CREATE TEMP VIEW', sql,
+                                      flags=re.IGNORECASE))
+
+    def _init_shard_state(self, cursor):
+        cursor.execute("SELECT MAX(LAST_ID) FROM main.SHARDS")
+        last_id = cursor.fetchone()[0]
+        self._shard_first_id = (last_id or 0) + 1
+        cursor.execute("SELECT VALUE FROM main.CONF WHERE ITEM == 'SHARD_START'")
+        start = cursor.fetchone()
+        self._shard_start = time.time() if start is None else float(start[0])
+
+    def _rotate(self, connection, first_id, last_id):
+        base, ext = os.path.splitext(self.fmk_db_path)
+        shard_path = '{:s}.{:d}-{:d}{:s}'.format(base, first_id, last_id, ext)
+
+        if self.journal_mode is not None and self.journal_mode.upper() == 'WAL':
+            connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        connection.close()
+
+        moved = []
+        try:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(self.fmk_db_path + suffix):
+                    os.rename(self.fmk_db_path + suffix, shard_path + suffix)
+                    moved.append(suffix)
+
+            connection = sqlite3.connect(self.fmk_db_path, detect_types=sqlite3.PARSE_DECLTYPES)
+            try:
+                self._init_shard(connection, shard_path, first_id, last_id)
+            except sqlite3.Error:
+                connection.close()
+                os.remove(self.fmk_db_path)
+                raise
+        except (OSError, sqlite3.Error) as e:
+            print("\n*** ERROR: {!s} while rotating the database! Recording goes on in '{:s}'."
+                  .format(e, self.fmk_db_path))
+            for suffix in moved:
+                os.rename(shard_path + suffix, self.fmk_db_path + suffix)
+            connection = sqlite3.connect(self.fmk_db_path, detect_types=sqlite3.PARSE_DECLTYPES)
+            rotated = False
+        else:
+            rotated = True
+
+        self._set_pragmas(connection)
+        self._attach_shards(connection)
+        self._create_functions(connection)
+
+        return connection, rotated
+
+    def _init_shard(self, connection, prev_shard_path, first_id, last_id):
+        fmk_db_sql = open(gr.fmk_folder + self.DDL_fname).read()
+        connection.executescript(fmk_db_sql)
+
+        # The new shard starts with the catalog of the previous one. Foreign keys are not
+        # enforced as records may refer to DATA stored in the previous shards.
+        connection.execute("PRAGMA foreign_keys = off")
+        connection.execute("ATTACH DATABASE ? AS PREV", (prev_shard_path,))
+        with connection:
+            for table in self.CATALOG_TABLES:
+                connection.execute("INSERT INTO main.{tbl:s} SELECT * FROM PREV.{tbl:s}"
+                                   .format(tbl=table))
+            connection.execute("INSERT OR IGNORE INTO main.CONF SELECT * FROM PREV.CONF")
+            start = connection.execute("SELECT VALUE FROM PREV.CONF "
+                                       "WHERE ITEM == 'SHARD_START'").fetchone()
+            start = None if start is None else datetime.fromtimestamp(float(start[0]))
+            connection.execute("INSERT INTO main.SHARDS(PATH,FIRST_ID,LAST_ID,START_DATE,END_DATE)"
+                               " VALUES(?,?,?,?,?)",
+                               (os.path.basename(prev_shard_path), first_id, last_id, start,
+                                datetime.now()))
+            connection.execute("INSERT INTO main.SQLITE_SEQUENCE(NAME,SEQ) VALUES('DATA',?)",
+                               (last_id,))
+        connection.execute("DETACH DATABASE PREV")
+
+    def _set_pragmas(self, connection):
+        if self.journal_mode is not None:
+            connection.execute('PRAGMA journal_mode={:s}'.format(self.journal_mode))
+        if self.synchronous is not None:
+            if self.synchronous.upper() not in self.SYNCHRONOUS_LEVELS:
+                print("\n*** WARNING: Unknown synchronous level '{!s}'. Ignored!".format(self.synchronous))
+            else:
+                connection.execute('PRAGMA synchronous={:s}'.format(self.synchronous))
+
+    @staticmethod
+    def _read_blob(connection, cursor, schema, table, column, rowid, offset, size):
+        table = '{:s}.{:s}'.format(schema, table)
+        cursor.execute("SELECT typeof({col:s}) FROM {tbl:s} WHERE ROWID == ?"
+                       .format(col=column, tbl=table), (rowid,))
+        rec = cursor.fetchone()
+        if rec is None:
+            raise sqlite3.OperationalError('no such rowid: {!s}'.format(rowid))
+        if rec[0] == 'null':
+            return b''
+
+        if hasattr(connection, 'blobopen'):
+            # Incremental BLOB I/O only reads the requested part of the record
+            with connection.blobopen(table.split('.')[1], column, rowid, readonly=True,
+                                     name=schema) as blob:
+                blob.seek(min(offset, len(blob)))
+                return blob.read(size)
+
+        if size < 0:
+            cursor.execute("SELECT substr({col:s}, ?) FROM {tbl:s} WHERE ROWID == ?"
+                           .format(col=column, tbl=table), (offset + 1, rowid))
+        else:
+            cursor.execute("SELECT substr({col:s}, ?, ?) FROM {tbl:s} WHERE ROWID == ?"
+                           .format(col=column, tbl=table), (offset + 1, size, rowid))
+        return bytes(cursor.fetchone()[0])
+
+    @staticmethod
+    def _get_last_data_id(cursor):
+        # With AUTOINCREMENT, IDs of removed records are not reused
+        cursor.execute("SELECT MAX(ID) FROM DATA")
+        last_id = cursor.fetchone()[0] or 0
+        cursor.execute("SELECT SEQ FROM SQLITE_SEQUENCE WHERE NAME='DATA'")
+        seq = cursor.fetchone()
+        if seq is not None and seq[0] is not None:
+            last_id = max(last_id, seq[0])
+        return last_id
+
     def _stop_sql_handler(self):
         with self._sync_lock:
-            self._sql_handler_stop_event.set()
+            with self._sql_stmt_submitted_cond:
+                self._sql_handler_stop_event.set()
+                self._sql_stmt_submitted_cond.notify()
             self._sql_handler_thread.join()
 
 
-    def submit_sql_stmt(self, stmt, params=None, outcome_type=None, error_msg=''):
+    def submit_sql_stmt(self, stmt, params=None, outcome_type=None, error_msg='', many=False):
         """
         This method is the only one that should submit request to the threaded SQL handler.
         It is also synchronized to guarantee request order (especially needed when you wait for
         the outcomes of your submitted SQL statement).
 
+        Statements are grouped in transactions which are committed every
+        `commit_batch_size` statements or `commit_period` seconds.
+
         Args:
             stmt (str): SQL statement
             params (tuple): parameters
             outcome_type (int): type of the expected outcomes. If `None`, no outcomes are expected
             error_msg (str): specific error message to display in case of an error
+            many (bool): if `True`, `params` is a list of parameter tuples and the statement
+              is executed for each of them
 
         Returns:
             `None` or the expected outcomes
@@ -188,7 +720,7 @@ class Database(object):
         with self._sync_lock:
 
             with self._sql_stmt_submitted_cond:
-                self._sql_stmt_list.append((stmt, params, outcome_type, error_msg))
+                self._sql_stmt_list.append((stmt, params, outcome_type, error_msg, many))
                 self._sql_stmt_submitted_cond.notify()
 
             if outcome_type is not None:
@@ -230,12 +762,299 @@ class Database(object):
     def disable(self):
         self.enabled = False
 
+    def set_compression(self, codec, level=None):
+        """
+        Set the codec used to compress the payloads stored from now on. Payloads already
+        stored are left as is.
+
+        Args:
+            codec (str): one of `COMPRESSION_CODECS`, or `None` to disable compression
+            level (int): compression level (`None` for the codec default)
+
+        Returns:
+            bool: `False` if the codec is not available
+        """
+        if codec is not None and codec not in self.COMPRESSION_CODECS:
+            print("\n*** WARNING: Unknown compression codec '{!s}'. Ignored!".format(codec))
+            return False
+        if codec == 'zstd' and not zstd_module:
+            print("\n*** WARNING: zstd compression is unavailable because python-zstandard "
+                  "is not installed!")
+            return False
+
+        self.compression = codec
+        self.compression_level = level
+        self._dm_dictionaries = {}
+        return True
+
+    def set_shard_rotation(self, max_size=None, max_data=None, max_age=None):
+        """
+        Set the conditions to move the recorded DATA to a new shard, so that the
+        database file does not grow unbounded. The previous shards are kept alongside
+        the database file (named after the IDs of the DATA they contain) and queried
+        along with it, unless they are removed.
+
+        Args:
+            max_size (int): size (in bytes) of the database file
+            max_data (int): number of DATA recorded in the shard
+            max_age (float): duration (in seconds) of recording in the shard
+        """
+        self.shard_max_size = max_size
+        self.shard_max_data = max_data
+        self.shard_max_age = max_age
+
+    def _rotation_due(self):
+        if self._shard_first_id is None or self._data_id < self._shard_first_id:
+            # Empty shard
+            return False
+
+        if self.shard_max_data is not None and \
+                self._data_id - self._shard_first_id + 1 >= self.shard_max_data:
+            return True
+        if self.shard_max_age is not None and \
+                time.time() - self._shard_start >= self.shard_max_age:
+            return True
+        if self.shard_max_size is not None:
+            size = 0
+            for suffix in ('', '-wal'):
+                try:
+                    size += os.path.getsize(self.fmk_db_path + suffix)
+                except OSError:
+                    pass
+            if size >= self.shard_max_size:
+                return True
+
+        return False
+
+    def rotate_shard(self):
+        """
+        Move the DATA recorded so far to a new shard.
+
+        Returns:
+            bool: `True` if the rotation succeeded
+        """
+        if self._data_id < self._shard_first_id:
+            return False
+
+        ok = self.submit_sql_stmt(None, params=(self._shard_first_id, self._data_id),
+                                  outcome_type=Database.OUTCOME_ROTATE,
+                                  error_msg='while rotating the database!')
+        if not ok:
+            return False
+
+        self._shard_first_id = self._data_id + 1
+        self._shard_start = time.time()
+        # Payloads are stored again in the new shard
+        self._clear_payload_cache()
+        return True
+
+    def set_analysis_workers(self, workers=1):
+        """
+        Set the number of processes scanning the database in parallel for the analysis
+        requests (get_data_with_impact(), get_data_without_fbk() and
+        get_data_with_specific_fbk()). Each of them works on a range of DATA IDs through
+        its own read-only connection. As they are spawned, the main module of the
+        program has to be importable without side effects (`if __name__ == "__main__"`).
+
+        Args:
+            workers (int): number of processes (`None` for the number of CPUs)
+        """
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        self.analysis_workers = max(1, workers)
+
+    def commit(self):
+        """
+        Commit the pending statements, so that they are visible to other connections.
+
+        Returns:
+            bool: `True` on success
+        """
+        return self.submit_sql_stmt(None, outcome_type=Database.OUTCOME_COMMIT,
+                                    error_msg='while committing the database!')
+
+    def get_shards(self):
+        """
+        Returns:
+            list: tuples (path, first DATA ID, last DATA ID, start date, end date) of
+              the previous shards, the missing ones included
+        """
+        return self.execute_sql_statement(
+            "SELECT PATH, FIRST_ID, LAST_ID, START_DATE, END_DATE FROM main.SHARDS "
+            "ORDER BY ID ASC;"
+        )
+
+    def display_shards(self, colorized=True):
+        colorize = self._get_color_function(colorized)
+
+        shards = self.get_shards()
+        if not shards:
+            print(colorize("*** No previous shard ***", rgb=Color.FMKINFO))
+            return
+
+        for path, first_id, last_id, start, end in shards:
+            start = start.strftime("%d/%m/%Y - %H:%M:%S") if start else 'None'
+            end = end.strftime("%d/%m/%Y - %H:%M:%S") if end else 'None'
+            print(colorize("*** {:s} ***".format(path), rgb=Color.FMKINFOGROUP))
+            print(colorize("  Data IDs: ", rgb=Color.FMKINFO) +
+                  colorize("{:d} - {:d}".format(first_id, last_id), rgb=Color.FMKSUBINFO))
+            print(colorize("      From: ", rgb=Color.FMKINFO) + colorize(start, rgb=Color.DATE) +
+                  colorize(" to ", rgb=Color.FMKINFO) + colorize(end, rgb=Color.DATE))
+
+    @staticmethod
+    def _compress(codec, content, level=None, zdict=None):
+        if codec == 'zstd':
+            dict_data = None if zdict is None else zstd.ZstdCompressionDict(zdict)
+            cctx = zstd.ZstdCompressor(level=3 if level is None else level, dict_data=dict_data)
+            return cctx.compress(content)
+        else:
+            level = zlib.Z_DEFAULT_COMPRESSION if level is None else level
+            if zdict is None:
+                return zlib.compress(content, level)
+            cobj = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL,
+                                    zlib.Z_DEFAULT_STRATEGY, zdict)
+            return cobj.compress(content) + cobj.flush()
+
+    @staticmethod
+    def _decompress(codec, content, zdict=None):
+        if codec == 'zstd':
+            dict_data = None if zdict is None else zstd.ZstdCompressionDict(zdict)
+            return zstd.ZstdDecompressor(dict_data=dict_data).decompress(content)
+        else:
+            if zdict is None:
+                return zlib.decompress(content)
+            dobj = zlib.decompressobj(zlib.MAX_WBITS, zdict)
+            return dobj.decompress(content) + dobj.flush()
+
+    def _get_dictionary(self, dm_name):
+        if dm_name not in self._dm_dictionaries:
+            rec = self.execute_sql_statement(
+                "SELECT ID, CONTENT FROM DICTIONARIES "
+                "WHERE DM_NAME == ? AND CODEC == ? "
+                "ORDER BY ID DESC LIMIT 1;",
+                params=(dm_name, self.compression)
+            )
+            if rec:
+                dict_id, zdict = rec[0][0], bytes(rec[0][1])
+                self._dictionaries[dict_id] = zdict
+                self._dm_dictionaries[dm_name] = (dict_id, zdict)
+            else:
+                self._dm_dictionaries[dm_name] = (None, None)
+
+        return self._dm_dictionaries[dm_name]
+
+    def _get_dictionary_content(self, dict_id):
+        if dict_id not in self._dictionaries:
+            rec = self.execute_sql_statement(
+                "SELECT CONTENT FROM DICTIONARIES WHERE ID == ?;", params=(dict_id,)
+            )
+            self._dictionaries[dict_id] = bytes(rec[0][0]) if rec else None
+
+        return self._dictionaries[dict_id]
+
+    def has_dictionary(self, dm_name):
+        return self.compression is not None and self._get_dictionary(dm_name)[0] is not None
+
+    def train_dictionary(self, dm_name, samples):
+        """
+        Train a dictionary on samples of a data model, which is then used to compress
+        the payloads of this data model with the current codec.
+
+        Args:
+            dm_name (str): data model name
+            samples (list): list of sample contents (bytes)
+
+        Returns:
+            int: ID of the dictionary, or `None` if no dictionary can be trained
+        """
+        if self.compression is None or not samples:
+            return None
+
+        if self.compression == 'zstd':
+            try:
+                zdict = zstd.train_dictionary(self.DICTIONARY_SIZE, samples).as_bytes()
+            except zstd.ZstdError:
+                # Not enough samples
+                return None
+        else:
+            # zlib preset dictionaries are just data the compressor can refer to, the
+            # end of the dictionary being the closest to the compressed content
+            sample_sz = max(self.DICTIONARY_SIZE // len(samples), 64)
+            zdict = b''.join(s[:sample_sz] for s in samples)[-self.DICTIONARY_SIZE:]
+            if not zdict:
+                return None
+
+        stmt = "INSERT INTO DICTIONARIES(DM_NAME,CODEC,DATE,CONTENT) VALUES(?,?,?,?)"
+        params = (dm_name, self.compression, datetime.now(), sqlite3.Binary(zdict))
+        dict_id = self.submit_sql_stmt(stmt, params=params, outcome_type=Database.OUTCOME_ROWID,
+                                       error_msg='while inserting a value into table DICTIONARIES!')
+        if dict_id is None:
+            return None
+
+        self._dictionaries[dict_id] = zdict
+        self._dm_dictionaries[dm_name] = (dict_id, zdict)
+        return dict_id
+
+    def _store_payload(self, raw_data, dm_name):
+        content_hash = hashlib.sha256(raw_data).hexdigest()
+
+        with self._payload_cache_lock:
+            if content_hash in self._payload_cache:
+                self._payload_cache[content_hash] = self._payload_cache.pop(content_hash)
+                return content_hash
+
+        codec, dict_id, content = None, None, raw_data
+        if self.compression is not None:
+            dict_id, zdict = self._get_dictionary(dm_name)
+            compressed = self._compress(self.compression, raw_data,
+                                        level=self.compression_level, zdict=zdict)
+            if len(compressed) < len(raw_data):
+                codec, content = self.compression, compressed
+            else:
+                dict_id = None
+
+        # The payload is only inserted if it has not been stored before
+        stmt = "INSERT OR IGNORE INTO main.PAYLOADS(HASH,CODEC,DICT_ID,SIZE,CONTENT,REFS)"\
+               " VALUES(?,?,?,?,?,0)"
+        params = (content_hash, codec, dict_id, len(raw_data), sqlite3.Binary(content))
+        err_msg = 'while inserting a value into table PAYLOADS!'
+
+        # Cached before being submitted, so that a rollback of the statement always
+        # happens after, and clears it
+        with self._payload_cache_lock:
+            self._payload_cache[content_hash] = True
+            if len(self._payload_cache) > self.PAYLOAD_CACHE_SIZE:
+                self._payload_cache.popitem(last=False)
+
+        self.submit_sql_stmt(stmt, params=params, error_msg=err_msg)
+
+        return content_hash
+
+    def _clear_payload_cache(self):
+        with self._payload_cache_lock:
+            self._payload_cache.clear()
+
+    def _decode_payload(self, codec, dict_id, content):
+        if content is None or codec is None:
+            return content
+        zdict = None if dict_id is None else self._get_dictionary_content(dict_id)
+        return self._decompress(codec, bytes(content), zdict=zdict)
+
     def cleanup_current_state(self):
         self.last_feedback = {}
 
     def execute_sql_statement(self, sql_stmt, params=None):
         return self.submit_sql_stmt(sql_stmt, params=params, outcome_type=Database.OUTCOME_DATA)
 
+    def get_query_plan(self, sql_stmt, params=None):
+        """
+        Returns:
+            list: the details of the steps SQLite would follow to run `sql_stmt`
+              (e.g., 'SEARCH FEEDBACK USING INDEX ...' or 'SCAN DATA')
+        """
+        plan = self.execute_sql_statement('EXPLAIN QUERY PLAN ' + sql_stmt, params=params)
+        return [] if plan is None else [step[-1] for step in plan]
+
 
     def insert_data_model(self, dm_name):
         stmt = "INSERT INTO DATAMODEL(NAME) VALUES(?)"
@@ -269,21 +1088,20 @@ class Database(object):
         if not self.enabled:
             return None
 
-        blob = sqlite3.Binary(raw_data)
+        if self._rotation_due():
+            self.rotate_shard()
 
-        stmt = "INSERT INTO DATA(GROUP_ID,TYPE,DM_NAME,CONTENT,SIZE,SENT_DATE,ACK_DATE,"\
-               "TARGET,PRJ_NAME)"\
-               " VALUES(?,?,?,?,?,?,?,?,?)"
-        params = (group_id, dtype, dm_name, blob, sz, sent_date, ack_date, target_name, prj_name)
-        err_msg = 'while inserting a value into table DATA!'
+        content_hash = self._store_payload(raw_data, dm_name)
 
-        if self._data_id is None:
-            did = self.submit_sql_stmt(stmt, params=params, outcome_type=Database.OUTCOME_ROWID,
-                                       error_msg=err_msg)
-            self._data_id = did
-        else:
-            self.submit_sql_stmt(stmt, params=params, error_msg=err_msg)
-            self._data_id += 1
+        self._data_id += 1
+
+        stmt = "INSERT INTO main.DATA(ID,GROUP_ID,TYPE,DM_NAME,SIZE,SENT_DATE,ACK_DATE,"\
+               "TARGET,PRJ_NAME,CONTENT_HASH)"\
+               " VALUES(?,?,?,?,?,?,?,?,?,?)"
+        params = (self._data_id, group_id, dtype, dm_name, sz, sent_date, ack_date,
+                  target_name, prj_name, content_hash)
+        err_msg = 'while inserting a value into table DATA!'
+        self.submit_sql_stmt(stmt, params=params, error_msg=err_msg)
 
         return self._data_id
 
@@ -296,15 +1114,49 @@ class Database(object):
         if info:
             info = sqlite3.Binary(info)
 
-        stmt = "INSERT INTO STEPS(DATA_ID,STEP_ID,DMAKER_TYPE,DMAKER_NAME,DATA_ID_SRC,USER_INPUT,INFO)"\
+        stmt = "INSERT INTO main.STEPS(DATA_ID,STEP_ID,DMAKER_TYPE,DMAKER_NAME,DATA_ID_SRC,USER_INPUT,INFO)"\
                " VALUES(?,?,?,?,?,?,?)"
         params = (data_id, step_id, dmaker_type, dmaker_name, data_id_src, user_input, info)
         err_msg = 'while inserting a value into table STEPS!'
         self.submit_sql_stmt(stmt, params=params, error_msg=err_msg)
 
 
+    def insert_multiple_steps(self, steps):
+        """
+        Args:
+            steps (list): list of tuples (data_id, step_id, dmaker_type, dmaker_name,
+              data_id_src, user_input, info) inserted with a single statement
+        """
+        if not self.enabled or not steps:
+            return None
+
+        params = []
+        for step in steps:
+            info = step[6]
+            if info:
+                step = step[:6] + (sqlite3.Binary(info),)
+            params.append(step)
+
+        stmt = "INSERT INTO main.STEPS(DATA_ID,STEP_ID,DMAKER_TYPE,DMAKER_NAME,DATA_ID_SRC,USER_INPUT,INFO)"\
+               " VALUES(?,?,?,?,?,?,?)"
+        err_msg = 'while inserting values into table STEPS!'
+        self.submit_sql_stmt(stmt, params=params, error_msg=err_msg, many=True)
+
+
     def insert_feedback(self, data_id, source, timestamp, content, status_code=None):
+        self.insert_multiple_feedback(data_id, source, [(timestamp, content)],
+                                      status_code=status_code)
+
 
+    def insert_multiple_feedback(self, data_id, source, feedback, status_code=None):
+        """
+        Args:
+            data_id (int): ID of the data the feedback relates to
+            source (str): feedback source
+            feedback (list): list of tuples (timestamp, content) inserted with a
+              single statement
+            status_code (int): status code shared by all the feedback items
+        """
         if data_id != self.last_data_id:
             self.last_data_id = data_id
             self.last_feedback = {}
@@ -312,32 +1164,35 @@ class Database(object):
         if source not in self.last_feedback:
             self.last_feedback[source] = []
 
-        self.last_feedback[source].append(
-            {
-                'timestamp': timestamp,
-                'content': content,
-                'status': status_code
-            }
-        )
+        for timestamp, content in feedback:
+            self.last_feedback[source].append(
+                {
+                    'timestamp': timestamp,
+                    'content': content,
+                    'status': status_code
+                }
+            )
 
-        if not self.enabled:
+        if not self.enabled or not feedback:
             return None
 
-        if content:
-            content = sqlite3.Binary(content)
+        params = []
+        for timestamp, content in feedback:
+            if content:
+                content = sqlite3.Binary(content)
+            params.append((data_id, source, timestamp, content, status_code))
 
-        stmt = "INSERT INTO FEEDBACK(DATA_ID,SOURCE,DATE,CONTENT,STATUS)"\
+        stmt = "INSERT INTO main.FEEDBACK(DATA_ID,SOURCE,DATE,CONTENT,STATUS)"\
                " VALUES(?,?,?,?,?)"
-        params = (data_id, source, timestamp, content, status_code)
         err_msg = 'while inserting a value into table FEEDBACK!'
-        self.submit_sql_stmt(stmt, params=params, error_msg=err_msg)
+        self.submit_sql_stmt(stmt, params=params, error_msg=err_msg, many=True)
 
 
     def insert_comment(self, data_id, content, date):
         if not self.enabled:
             return None
 
-        stmt = "INSERT INTO COMMENTS(DATA_ID,CONTENT,DATE)" \
+        stmt = "INSERT INTO main.COMMENTS(DATA_ID,CONTENT,DATE)" \
                " VALUES(?,?,?)"
         params = (data_id, content, date)
         err_msg = 'while inserting a value into table COMMENTS!'
@@ -348,32 +1203,118 @@ class Database(object):
         if not self.enabled:
             return None
 
-        stmt = "INSERT INTO FMKINFO(DATA_ID,CONTENT,DATE,ERROR)"\
+        stmt = "INSERT INTO main.FMKINFO(DATA_ID,CONTENT,DATE,ERROR)"\
                " VALUES(?,?,?,?)"
         params = (data_id, content, date, error)
         err_msg = 'while inserting a value into table FMKINFO!'
         self.submit_sql_stmt(stmt, params=params, error_msg=err_msg)
 
 
-    def fetch_data(self, start_id=1, end_id=-1):
-        ign_end_id = '--' if end_id < 1 else ''
+    def _iter_by_data_id(self, stmt, start_id=1, end_id=-1, batch_size=100):
+        """
+        Run `stmt` over consecutive ranges of DATA IDs (keyset pagination), so that only
+        `batch_size` DATA records are held in memory at once.
+
+        `stmt` takes three parameters: the last DATA ID already handled (excluded), the
+        last DATA ID to handle, and `batch_size`. The DATA ID has to be the first column
+        of the returned records, which have to be sorted by DATA ID.
+        """
+        last_id = start_id - 1
+        end_id = (1 << 63) - 1 if end_id < 1 else end_id
+
+        while True:
+            records = self.execute_sql_statement(stmt, params=(last_id, end_id, batch_size))
+            if not records:
+                break
 
+            for rec in records:
+                yield rec
+
+            data_ids = set(rec[0] for rec in records)
+            if len(data_ids) < batch_size:
+                break
+            last_id = max(data_ids)
+
+    def iter_data(self, start_id=1, end_id=-1, batch_size=100, with_content=True):
+        """
+        Yield the records (data_id, content, dmaker_type, dmaker_name, dm_name) of the
+        DATA which IDs are between `start_id` and `end_id` (included), sorted by DATA ID.
+
+        Args:
+            start_id (int): first DATA ID
+            end_id (int): last DATA ID (if lower than 1, up to the last one)
+            batch_size (int): number of DATA records retrieved from the database at once
+            with_content (bool): if `False`, `content` is `None` and can be loaded lazily
+              by the caller with :meth:`read_data_content`
+        """
         stmt = \
             '''
-            SELECT DATA.ID, DATA.CONTENT, DATA.TYPE, DMAKERS.NAME, DATA.DM_NAME
-            FROM DATA INNER JOIN DMAKERS
-              ON DATA.TYPE = DMAKERS.TYPE AND DMAKERS.CLONE_TYPE IS NULL
-            WHERE DATA.ID >= {sid:d} {ign_eid:s} AND DATA.ID <= {eid:d}
-            UNION ALL
-            SELECT DATA.ID, DATA.CONTENT, DMAKERS.CLONE_TYPE AS TYPE, DMAKERS.CLONE_NAME AS NAME,
-                   DATA.DM_NAME
-            FROM DATA INNER JOIN DMAKERS
-              ON DATA.TYPE = DMAKERS.TYPE AND DMAKERS.CLONE_TYPE IS NOT NULL
-            WHERE DATA.ID >= {sid:d} {ign_eid:s} AND DATA.ID <= {eid:d}
-            '''.format(sid = start_id, eid = end_id, ign_eid = ign_end_id)
-
-        ret = self.submit_sql_stmt(stmt, outcome_type=Database.OUTCOME_DATA)
-        return ret
+            SELECT DATA.ID, {content:s}, coalesce(DMAKERS.CLONE_TYPE, DATA.TYPE),
+                   coalesce(DMAKERS.CLONE_NAME, DMAKERS.NAME), DATA.DM_NAME, DMAKERS.TYPE,
+                   PAYLOADS.CODEC, PAYLOADS.DICT_ID
+            FROM (SELECT * FROM DATA WHERE ID > ? AND ID <= ? ORDER BY ID ASC LIMIT ?) AS DATA
+                 LEFT JOIN PAYLOADS ON PAYLOADS.HASH == DATA.CONTENT_HASH
+                 LEFT JOIN DMAKERS ON DATA.TYPE = DMAKERS.TYPE
+            ORDER BY DATA.ID ASC
+            '''.format(content='coalesce(PAYLOADS.CONTENT, DATA.CONTENT)' if with_content
+                       else 'NULL')
+
+        for rec in self._iter_by_data_id(stmt, start_id, end_id, batch_size):
+            data_id, content, dtype, dmk_name, dm_name, dmk_type, codec, dict_id = rec
+            # DATA without related data maker are ignored
+            if dmk_type is not None:
+                yield (data_id, self._decode_payload(codec, dict_id, content), dtype, dmk_name,
+                       dm_name)
+
+    def read_data_content(self, data_id, offset=0, size=-1):
+        """
+        Read (part of) the content of a DATA record, with incremental BLOB I/O when
+        supported by the sqlite3 module.
+
+        Returns:
+            bytes: at most `size` bytes (all of them if `size` is negative) starting at
+              `offset`, or `None` if the DATA does not exist
+        """
+        location = self._get_content_location(data_id)
+        if location is None:
+            return None
+
+        schema, table, rowid, codec, dict_id = location
+        if codec is None:
+            return self._read_content_blob(schema, table, rowid, offset, size)
+
+        # Compressed payloads have to be read as a whole
+        content = self._decode_payload(codec, dict_id,
+                                       self._read_content_blob(schema, table, rowid, 0, -1))
+        if content is None:
+            return None
+        return content[offset:] if size < 0 else content[offset:offset+size]
+
+    def _get_content_location(self, data_id):
+        shard_columns = "DATA.SHARD, PAYLOADS.SHARD" if self._shards else "'main', 'main'"
+        rec = self.execute_sql_statement(
+            "SELECT PAYLOADS.ID, PAYLOADS.CODEC, PAYLOADS.DICT_ID, " + shard_columns + " "
+            "FROM DATA LEFT JOIN PAYLOADS ON PAYLOADS.HASH == DATA.CONTENT_HASH "
+            "WHERE DATA.ID == ?;",
+            params=(data_id,)
+        )
+        if not rec:
+            return None
+
+        payload_id, codec, dict_id, data_shard, payload_shard = rec[0]
+        if payload_id is None:
+            # Recorded before payloads were deduplicated
+            return data_shard, 'DATA', data_id, None, None
+        else:
+            return payload_shard, 'PAYLOADS', payload_id, codec, dict_id
+
+    def _read_content_blob(self, schema, table, rowid, offset, size):
+        return self.submit_sql_stmt(None, params=(schema, table, 'CONTENT', rowid, offset, size),
+                                    outcome_type=Database.OUTCOME_BLOB,
+                                    error_msg='while reading the content of a DATA!')
+
+    def fetch_data(self, start_id=1, end_id=-1):
+        return list(self.iter_data(start_id=start_id, end_id=end_id))
 
 
     def _get_color_function(self, colorized):
@@ -408,7 +1349,8 @@ class Database(object):
 
         prt = sys.stdout.write
 
-        data_id, gr_id, data_type, dm_name, data_content, size, sent_date, ack_date, tg, prj = data[0]
+        data_id, gr_id, data_type, dm_name, data_content, size, sent_date, ack_date, tg, prj = \
+            data[0][:10]
 
         steps = self.execute_sql_statement(
             "SELECT * FROM STEPS "
@@ -584,6 +1526,8 @@ class Database(object):
         msg = ''
         if with_data:
             msg += colorize("\n Sent Data:\n", rgb=Color.FMKINFOGROUP)
+            if data_content is None:
+                data_content = self.read_data_content(data_id) or b''
             if sys.version_info[0] > 2:
                 data_content = data_content.decode("latin_1")
                 data_content = "{!a}".format(data_content)
@@ -691,7 +1635,8 @@ class Database(object):
         colorize = self._get_color_function(colorized)
 
         records = self.execute_sql_statement(
-            "SELECT TARGET, TYPE, TOTAL FROM STATS_BY_TARGET;"
+            "SELECT TARGET, TYPE, TOTAL FROM STATS_BY_TARGET "
+            "ORDER BY TARGET ASC, TYPE ASC;"
         )
 
         if records:
@@ -719,59 +1664,107 @@ class Database(object):
         else:
             print(colorize("*** ERROR: Statistics are unavailable ***", rgb=Color.ERROR))
 
+        storage = self.get_storage_stats()
+        if storage is not None:
+            nb_payloads, nb_data, emitted_sz, stored_sz = storage
+            saved_sz = emitted_sz - stored_sz
+            print(colorize("*** Payload storage ***", rgb=Color.FMKINFOGROUP))
+            print(colorize(" Payloads : {:d} for {:d} data (dedup ratio {:.2f})"
+                           .format(nb_payloads, nb_data, float(nb_data) / nb_payloads),
+                           rgb=Color.FMKSUBINFO))
+            print(colorize("    Bytes : {:d} stored for {:d} emitted ({:d} saved, {:.1f}%)"
+                           .format(stored_sz, emitted_sz, saved_sz,
+                                   100.0 * saved_sz / emitted_sz if emitted_sz else 0.0),
+                           rgb=Color.FMKSUBINFO))
+
+    def get_storage_stats(self):
+        """
+        Returns:
+            tuple: (number of stored payloads, number of DATA referencing them, emitted
+              bytes, stored bytes), or `None` if no payload is stored
+        """
+        stats = [0, 0, 0, 0]
+        # Payloads stored in several shards are accounted in each of them
+        for schema in ['main'] + self._shards:
+            rec = self.execute_sql_statement(
+                "SELECT count(*), sum(REFS), sum(SIZE * REFS), sum(length(CONTENT)) "
+                "FROM {:s}.PAYLOADS;".format(schema)
+            )
+            if rec:
+                stats = [total + (v or 0) for total, v in zip(stats, rec[0])]
+
+        return tuple(stats) if stats[0] else None
+
+
+    def _export_data_content(self, data_id, fd, chunk_size=1048576):
+        location = self._get_content_location(data_id)
+        if location is None:
+            return
+
+        schema, table, rowid, codec, dict_id = location
+        if codec is not None:
+            content = self._read_content_blob(schema, table, rowid, 0, -1)
+            if content is not None:
+                fd.write(self._decode_payload(codec, dict_id, content))
+            return
+
+        offset = 0
+        while True:
+            chunk = self._read_content_blob(schema, table, rowid, offset, chunk_size)
+            if chunk:
+                fd.write(chunk)
+            if chunk is None or len(chunk) < chunk_size:
+                break
+            offset += chunk_size
 
     def export_data(self, first, last=None, colorized=True):
         colorize = self._get_color_function(colorized)
 
-        if last is not None:
-            records = self.execute_sql_statement(
-                "SELECT ID, TYPE, DM_NAME, SENT_DATE, CONTENT FROM DATA "
-                "WHERE {start:d} <= ID and ID <= {end:d};".format(start=first,
-                                                                  end=last)
-            )
-        else:
-            records = self.execute_sql_statement(
-                "SELECT ID, TYPE, DM_NAME, SENT_DATE, CONTENT FROM DATA "
-                "WHERE ID == {data_id:d};".format(data_id=first)
-            )
+        # Contents are streamed to the exported files, records are retrieved without them
+        records = self._iter_by_data_id(
+            "SELECT ID, TYPE, DM_NAME, SENT_DATE FROM DATA "
+            "WHERE ID > ? AND ID <= ? ORDER BY ID ASC LIMIT ?;",
+            start_id=first, end_id=first if last is None else last
+        )
 
-        if records:
-            base_dir = gr.exported_data_folder
-            prev_export_date = None
-            export_cpt = 0
+        exported = False
+        base_dir = gr.exported_data_folder
+        prev_export_date = None
+        export_cpt = 0
 
-            for rec in records:
-                data_id, data_type, dm_name, sent_date, content = rec
+        for rec in records:
+            exported = True
+            data_id, data_type, dm_name, sent_date = rec
 
-                file_extension = dm_name
+            file_extension = dm_name
 
-                if sent_date is None:
-                    current_export_date = datetime.now().strftime("%Y-%m-%d-%H%M%S")
-                else:
-                    current_export_date = sent_date.strftime("%Y-%m-%d-%H%M%S")
+            if sent_date is None:
+                current_export_date = datetime.now().strftime("%Y-%m-%d-%H%M%S")
+            else:
+                current_export_date = sent_date.strftime("%Y-%m-%d-%H%M%S")
 
-                if current_export_date != prev_export_date:
-                    prev_export_date = current_export_date
-                    export_cpt = 0
-                else:
-                    export_cpt += 1
+            if current_export_date != prev_export_date:
+                prev_export_date = current_export_date
+                export_cpt = 0
+            else:
+                export_cpt += 1
 
-                export_fname = '{typ:s}_{date:s}_{cpt:0>2d}.{ext:s}'.format(
-                    date=current_export_date,
-                    cpt=export_cpt,
-                    ext=file_extension,
-                    typ=data_type)
+            export_fname = '{typ:s}_{date:s}_{cpt:0>2d}.{ext:s}'.format(
+                date=current_export_date,
+                cpt=export_cpt,
+                ext=file_extension,
+                typ=data_type)
 
-                export_full_fn = os.path.join(base_dir, dm_name, export_fname)
-                ensure_dir(export_full_fn)
+            export_full_fn = os.path.join(base_dir, dm_name, export_fname)
+            ensure_dir(export_full_fn)
 
-                with open(export_full_fn, 'wb') as fd:
-                    fd.write(content)
+            with open(export_full_fn, 'wb') as fd:
+                self._export_data_content(data_id, fd)
 
-                print(colorize("Data ID #{:d} --> {:s}".format(data_id, export_full_fn),
-                               rgb=Color.FMKINFO))
+            print(colorize("Data ID #{:d} --> {:s}".format(data_id, export_full_fn),
+                           rgb=Color.FMKINFO))
 
-        else:
+        if not exported:
             print(colorize("*** ERROR: The provided DATA IDs do not exist ***", rgb=Color.ERROR))
 
     def remove_data(self, data_id, colorized=True):
@@ -780,30 +1773,18 @@ class Database(object):
         if not self.check_data_existence(data_id, colorized=colorized):
             return
 
-        comments = self.execute_sql_statement(
-            "DELETE FROM COMMENTS "
-            "WHERE DATA_ID == {data_id:d};".format(data_id=data_id)
-        )
-
-        fmkinfo = self.execute_sql_statement(
-            "DELETE FROM FMKINFO "
-            "WHERE DATA_ID == {data_id:d};".format(data_id=data_id)
-        )
-
-        fbk = self.execute_sql_statement(
-            "DELETE FROM FEEDBACK "
-            "WHERE DATA_ID == {data_id:d};".format(data_id=data_id)
-        )
+        # Records related to a DATA may have been written after a shard rotation
+        for schema in ['main'] + self._shards:
+            for table, column in (('COMMENTS', 'DATA_ID'), ('FMKINFO', 'DATA_ID'),
+                                  ('FEEDBACK', 'DATA_ID'), ('STEPS', 'DATA_ID'), ('DATA', 'ID')):
+                self.execute_sql_statement(
+                    "DELETE FROM {schema:s}.{table:s} "
+                    "WHERE {column:s} == {data_id:d};".format(schema=schema, table=table,
+                                                              column=column, data_id=data_id)
+                )
 
-        steps = self.execute_sql_statement(
-            "DELETE FROM STEPS "
-            "WHERE DATA_ID == {data_id:d};".format(data_id=data_id)
-        )
-
-        data = self.execute_sql_statement(
-            "DELETE FROM DATA "
-            "WHERE ID == {data_id:d};".format(data_id=data_id)
-        )
+        # The payload may have been removed with its last reference
+        self._clear_payload_cache()
 
         print(colorize("*** Data and all related records have been removed ***", rgb=Color.FMKINFO))
 
@@ -824,57 +1805,121 @@ class Database(object):
 
         return prj_records
 
+    def _get_analysis_records(self, stmt, conditions, params, prj_name=None):
+        # Records are fetched with the TARGET and PRJ_NAME of their DATA, so that the
+        # whole DATA table is not loaded to sort them out by project
+        if prj_name:
+            conditions.append("DATA.PRJ_NAME == ?")
+            params.append(prj_name)
+
+        partitions = self._get_analysis_partitions()
+        if partitions:
+            conditions.append("DATA.ID BETWEEN ? AND ?")
+
+        if conditions:
+            stmt += " WHERE " + " AND ".join(conditions)
+        stmt += " ORDER BY DATA.PRJ_NAME ASC, DATA.TARGET ASC, DATA.ID ASC;"
+
+        if not partitions:
+            return self.execute_sql_statement(stmt, params=tuple(params))
+
+        # Workers only see what has been committed
+        self.commit()
+
+        shards = [(schema, self._shard_paths[schema]) for schema in self._shards]
+        tasks = [(self.fmk_db_path, shards, stmt, tuple(params) + part) for part in partitions]
+        records = []
+        # Workers are spawned rather than forked, as the SQL handler thread is running
+        pool = multiprocessing.get_context('spawn').Pool(min(self.analysis_workers,
+                                                             len(partitions)))
+        try:
+            for recs in pool.imap(_get_records_read_only, tasks):
+                records.extend(recs)
+        except sqlite3.Error as e:
+            print("\n*** ERROR[SQL:{:s}] while analyzing the database!".format(e.args[0]))
+            return None
+        finally:
+            pool.close()
+            pool.join()
+
+        # Partitions are merged in the order SQLite would have provided (NULL first)
+        records.sort(key=lambda rec: (rec[2] is not None, rec[2] or '',
+                                      rec[1] is not None, rec[1] or ''))
+        return records
+
+    def _get_analysis_partitions(self):
+        # Use the read-only parallel scan only when it is worth spawning processes
+        if self.analysis_workers <= 1 or sys.version_info < (3, 4):
+            return None
+
+        rec = self.execute_sql_statement("SELECT MIN(ID), MAX(ID) FROM DATA;")
+        if not rec or rec[0][0] is None:
+            return None
+        first_id, last_id = rec[0]
+
+        nb_parts = min(self.analysis_workers * 4,
+                       (last_id - first_id + 1) // self.ANALYSIS_PARTITION_MIN_SIZE)
+        if nb_parts <= 1:
+            return None
+
+        part_size = int(math.ceil((last_id - first_id + 1) / float(nb_parts)))
+        return [(start, min(start + part_size - 1, last_id))
+                for start in range(first_id, last_id + 1, part_size)]
+
+    @staticmethod
+    def _data_id_format_string(data_ids):
+        data_id_pattern = "{:>" + str(int(math.log10(max(data_ids))) + 2) + "s}"
+        return "     [DataID " + data_id_pattern + "] --> {:s}"
+
     def get_data_with_impact(self, prj_name=None, fbk_src=None, display=True, verbose=False,
                              colorized=True):
 
         colorize = self._get_color_function(colorized)
 
+        conditions = ["FEEDBACK.STATUS < 0"]
+        params = []
         if fbk_src:
-            fbk_records = self.execute_sql_statement(
-                "SELECT DATA_ID, STATUS, SOURCE FROM FEEDBACK "
-                "WHERE STATUS < 0 and SOURCE REGEXP ?;",
-                params=(fbk_src,)
-            )
-        else:
-            fbk_records = self.execute_sql_statement(
-                "SELECT DATA_ID, STATUS, SOURCE FROM FEEDBACK "
-                "WHERE STATUS < 0;"
-            )
+            conditions.append("FEEDBACK.SOURCE REGEXP ?")
+            params.append(fbk_src)
+
+        records = self._get_analysis_records(
+            "SELECT DATA.ID, DATA.TARGET, DATA.PRJ_NAME, FEEDBACK.STATUS, FEEDBACK.SOURCE "
+            "FROM FEEDBACK INNER JOIN DATA ON DATA.ID == FEEDBACK.DATA_ID",
+            conditions, params, prj_name=prj_name
+        )
 
-        prj_records = self.get_project_record(prj_name)
         data_list = []
 
-        if fbk_records and prj_records:
+        if records:
             id2fbk = {}
-            for rec in fbk_records:
-                data_id, status, src = rec
+            for rec in records:
+                data_id, target, prj, status, src = rec
                 if data_id not in id2fbk:
                     id2fbk[data_id] = {}
+                    data_list.append((data_id, target, prj))
                 if src not in id2fbk[data_id]:
                     id2fbk[data_id][src] = []
                 id2fbk[data_id][src].append(status)
 
-            data_id_pattern = "{:>" + str(int(math.log10(len(prj_records))) + 2) + "s}"
-            format_string = "     [DataID " + data_id_pattern + "] --> {:s}"
+            format_string = self._data_id_format_string(id2fbk)
 
             current_prj = None
-            for rec in prj_records:
-                data_id, target, prj = rec
-                if data_id in id2fbk:
-                    data_list.append(data_id)
-                    if display:
-                        if prj != current_prj:
-                            current_prj = prj
-                            print(
-                                colorize("*** Project '{:s}' ***".format(prj), rgb=Color.FMKINFOGROUP))
-                        print(colorize(format_string.format('#' + str(data_id), target),
-                                       rgb=Color.DATAINFO))
-                        if verbose:
-                            for src, status in id2fbk[data_id].items():
-                                status_str = ''.join([str(s) + ',' for s in status])[:-1]
-                                print(colorize("       |_ status={:s} from {:s}".format(status_str,
-                                                                                        src),
-                                               rgb=Color.FMKSUBINFO))
+            for data_id, target, prj in data_list:
+                if display:
+                    if prj != current_prj:
+                        current_prj = prj
+                        print(
+                            colorize("*** Project '{:s}' ***".format(prj), rgb=Color.FMKINFOGROUP))
+                    print(colorize(format_string.format('#' + str(data_id), target),
+                                   rgb=Color.DATAINFO))
+                    if verbose:
+                        for src, status in id2fbk[data_id].items():
+                            status_str = ''.join([str(s) + ',' for s in status])[:-1]
+                            print(colorize("       |_ status={:s} from {:s}".format(status_str,
+                                                                                    src),
+                                           rgb=Color.FMKSUBINFO))
+
+            data_list = [data_id for data_id, _, _ in data_list]
 
         else:
             print(colorize("*** No data has negatively impacted a target ***", rgb=Color.FMKINFO))
@@ -884,59 +1929,37 @@ class Database(object):
     def get_data_without_fbk(self, prj_name=None, fbk_src=None, display=True, colorized=True):
         colorize = self._get_color_function(colorized)
 
+        params = []
         if fbk_src:
-            fbk_records = self.execute_sql_statement(
-                "SELECT DATA_ID, STATUS, SOURCE, CONTENT FROM FEEDBACK "
-                "WHERE SOURCE REGEXP ?;",
-                params=(fbk_src,)
-            )
+            src_condition = " AND FEEDBACK.SOURCE REGEXP ?"
+            params.append(fbk_src)
         else:
-            fbk_records = self.execute_sql_statement(
-                "SELECT DATA_ID, STATUS, SOURCE, CONTENT FROM FEEDBACK;"
-            )
+            src_condition = ""
+
+        records = self._get_analysis_records(
+            "SELECT DATA.ID, DATA.TARGET, DATA.PRJ_NAME FROM DATA",
+            ["NOT EXISTS (SELECT 1 FROM FEEDBACK "
+             "WHERE FEEDBACK.DATA_ID == DATA.ID" + src_condition +
+             " AND NOT ISBLANK(FEEDBACK.CONTENT))"],
+            params, prj_name=prj_name
+        )
 
-        prj_records = self.get_project_record(prj_name)
         data_list = []
 
-        if fbk_records and prj_records:
-            id2fbk = {}
-            for rec in fbk_records:
-                data_id, status, src, content = rec
-                if data_id not in id2fbk:
-                    id2fbk[data_id] = {}
-                if src not in id2fbk[data_id]:
-                    id2fbk[data_id][src] = []
-                id2fbk[data_id][src].append((status, content))
-
-            data_id_pattern = "{:>" + str(int(math.log10(len(prj_records))) + 2) + "s}"
-            format_string = "     [DataID " + data_id_pattern + "] --> {:s}"
+        if records:
+            format_string = self._data_id_format_string([rec[0] for rec in records])
 
             current_prj = None
-            for rec in prj_records:
+            for rec in records:
                 data_id, target, prj = rec
-                to_gather = True
-                if data_id in id2fbk:
-                    current_fbk = id2fbk[data_id]  # the dictionnay is never empty
-                    for src, fbk_list in current_fbk.items():
-                        for fbk in fbk_list:
-                            if fbk[1] is None or \
-                                    (isinstance(fbk[1], bytes) and fbk[1].strip() == b''):
-                                continue
-                            else:
-                                to_gather = False
-                                break
-                        if not to_gather:
-                            break
-
-                if to_gather:
-                    data_list.append(data_id)
-                    if display:
-                        if prj != current_prj:
-                            current_prj = prj
-                            print(
-                                colorize("*** Project '{:s}' ***".format(prj), rgb=Color.FMKINFOGROUP))
-                        print(colorize(format_string.format('#' + str(data_id), target),
-                                       rgb=Color.DATAINFO))
+                data_list.append(data_id)
+                if display:
+                    if prj != current_prj:
+                        current_prj = prj
+                        print(
+                            colorize("*** Project '{:s}' ***".format(prj), rgb=Color.FMKINFOGROUP))
+                    print(colorize(format_string.format('#' + str(data_id), target),
+                                   rgb=Color.DATAINFO))
 
         else:
             print(colorize("*** No data has been found for analysis ***", rgb=Color.FMKINFO))
@@ -951,54 +1974,53 @@ class Database(object):
         if sys.version_info[0] > 2:
             fbk = bytes(fbk, 'latin_1')
 
+        conditions = []
+        params = []
         if fbk_src:
-            fbk_records = self.execute_sql_statement(
-                "SELECT DATA_ID, CONTENT, SOURCE FROM FEEDBACK "
-                "WHERE SOURCE REGEXP ? AND BINREGEXP(?,CONTENT);",
-                params=(fbk_src, fbk)
-            )
-        else:
-            fbk_records = self.execute_sql_statement(
-                "SELECT DATA_ID, CONTENT, SOURCE FROM FEEDBACK "
-                "WHERE BINREGEXP(?,CONTENT);",
-                params=(fbk,)
-            )
+            conditions.append("FEEDBACK.SOURCE REGEXP ?")
+            params.append(fbk_src)
+        conditions.append("BINREGEXP(?,FEEDBACK.CONTENT)")
+        params.append(fbk)
+
+        records = self._get_analysis_records(
+            "SELECT DATA.ID, DATA.TARGET, DATA.PRJ_NAME, FEEDBACK.CONTENT, FEEDBACK.SOURCE "
+            "FROM FEEDBACK INNER JOIN DATA ON DATA.ID == FEEDBACK.DATA_ID",
+            conditions, params, prj_name=prj_name
+        )
 
-        prj_records = self.get_project_record(prj_name)
         data_list = []
 
-        data_id_pattern = "{:>" + str(int(math.log10(len(prj_records))) + 2) + "s}"
-        format_string = "     [DataID " + data_id_pattern + "] --> {:s}"
-
-        if fbk_records and prj_records:
+        if records:
 
             ids_to_display = {}
-            for rec in fbk_records:
-                data_id, content, src = rec
+            for rec in records:
+                data_id, target, prj, content, src = rec
                 if data_id not in ids_to_display:
                     ids_to_display[data_id] = {}
+                    data_list.append((data_id, target, prj))
                 if src not in ids_to_display[data_id]:
                     ids_to_display[data_id][src] = []
                 ids_to_display[data_id][src].append(content)
 
+            format_string = self._data_id_format_string(ids_to_display)
+
             current_prj = None
-            for rec in prj_records:
-                data_id, target, prj = rec
-                if data_id in ids_to_display:
-                    data_list.append(data_id)
-                    if display:
-                        fbk = ids_to_display[data_id]
-                        if prj != current_prj:
-                            current_prj = prj
+            for data_id, target, prj in data_list:
+                if display:
+                    fbk = ids_to_display[data_id]
+                    if prj != current_prj:
+                        current_prj = prj
+                        print(
+                            colorize("*** Project '{:s}' ***".format(prj), rgb=Color.FMKINFOGROUP))
+                    print(colorize(format_string.format('#' + str(data_id), target),
+                                   rgb=Color.DATAINFO))
+                    for src, contents in fbk.items():
+                        print(colorize("       |_ From [{:s}]:".format(src), rgb=Color.FMKSUBINFO))
+                        for ct in contents:
                             print(
-                                colorize("*** Project '{:s}' ***".format(prj), rgb=Color.FMKINFOGROUP))
-                        print(colorize(format_string.format('#' + str(data_id), target),
-                                       rgb=Color.DATAINFO))
-                        for src, contents in fbk.items():
-                            print(colorize("       |_ From [{:s}]:".format(src), rgb=Color.FMKSUBINFO))
-                            for ct in contents:
-                                print(
-                                    colorize("          {:s}".format(str(ct)), rgb=Color.DATAINFO_ALT))
+                                colorize("          {:s}".format(str(ct)), rgb=Color.DATAINFO_ALT))
+
+            data_list = [data_id for data_id, _, _ in data_list]
 
         else:
             print(colorize("*** No data has been found for analysis ***", rgb=Color.FMKINFO))
@@ -52,7 +52,27 @@ CREATE TABLE DATA (
     SENT_DATE TIMESTAMP,
     ACK_DATE  TIMESTAMP,
     TARGET TEXT,
-    PRJ_NAME TEXT REFERENCES PROJECT (NAME)
+    PRJ_NAME TEXT REFERENCES PROJECT (NAME),
+    CONTENT_HASH TEXT REFERENCES PAYLOADS (HASH)
+);
+
+CREATE TABLE DICTIONARIES (
+    ID        INTEGER  PRIMARY KEY ASC AUTOINCREMENT,
+    DM_NAME   TEXT REFERENCES DATAMODEL (NAME),
+    CODEC     TEXT,
+    DATE      TIMESTAMP,
+    CONTENT   BLOB
+);
+
+CREATE TABLE PAYLOADS (
+    ID        INTEGER  PRIMARY KEY ASC AUTOINCREMENT,
+    HASH      TEXT     UNIQUE
+                       NOT NULL,
+    CODEC     TEXT,
+    DICT_ID   INTEGER REFERENCES DICTIONARIES (ID),
+    SIZE      INTEGER,
+    CONTENT   BLOB,
+    REFS      INTEGER
 );
 
 CREATE TABLE STEPS (
@@ -84,6 +104,15 @@ CREATE TABLE FEEDBACK (
     STATUS   INTEGER
 );
 
+CREATE TABLE SHARDS (
+    ID         INTEGER  PRIMARY KEY ASC AUTOINCREMENT,
+    PATH       TEXT,
+    FIRST_ID   INTEGER,
+    LAST_ID    INTEGER,
+    START_DATE TIMESTAMP,
+    END_DATE   TIMESTAMP
+);
+
 CREATE TABLE COMMENTS (
     ID        INTEGER  PRIMARY KEY ASC AUTOINCREMENT,
     DATA_ID   INTEGER REFERENCES DATA (ID),
@@ -99,45 +128,73 @@ CREATE TABLE FMKINFO (
     ERROR     BOOLEAN
 );
 
-CREATE VIEW STATS AS
-    SELECT TYPE, sum(CPT) as TOTAL
-    FROM (
-            WITH joint AS (
-                     SELECT DATA.TYPE,
-                          DMAKERS.clone_type
-                     FROM DATA
-                          LEFT JOIN
-                          DMAKERS ON DATA.TYPE = DMAKERS.TYPE
-            )
-            SELECT CLONE_TYPE AS type, count(*) AS cpt
-            FROM joint
-            WHERE CLONE_TYPE IS NOT NULL
-            GROUP BY CLONE_TYPE
-               UNION ALL
-            SELECT TYPE, count(*) AS cpt
-            FROM joint
-            WHERE CLONE_TYPE IS NULL
-            GROUP BY TYPE
+CREATE INDEX DATA_PRJ_NAME_TARGET_IDX ON DATA (PRJ_NAME, TARGET);
+CREATE INDEX DATA_SENT_DATE_IDX ON DATA (SENT_DATE);
+CREATE INDEX FEEDBACK_DATA_ID_IDX ON FEEDBACK (DATA_ID);
+CREATE INDEX FEEDBACK_STATUS_SOURCE_IDX ON FEEDBACK (STATUS, SOURCE);
+CREATE INDEX COMMENTS_DATA_ID_IDX ON COMMENTS (DATA_ID);
+CREATE INDEX FMKINFO_DATA_ID_IDX ON FMKINFO (DATA_ID);
+
+CREATE TABLE DATA_STATS (
+    TARGET TEXT,
+    TYPE   TEXT,
+    TOTAL  INTEGER,
+    PRIMARY KEY (
+        TARGET,
+        TYPE
     )
-    GROUP BY TYPE;
+);
+
+CREATE TRIGGER DATA_STATS_INSERT AFTER INSERT ON DATA
+BEGIN
+    INSERT INTO DATA_STATS (TARGET, TYPE, TOTAL)
+        SELECT NEW.TARGET, NEW.TYPE, 0
+        WHERE NOT EXISTS (SELECT 1 FROM DATA_STATS
+                          WHERE TARGET IS NEW.TARGET AND TYPE IS NEW.TYPE);
+    UPDATE DATA_STATS SET TOTAL = TOTAL + 1
+        WHERE TARGET IS NEW.TARGET AND TYPE IS NEW.TYPE;
+END;
+
+CREATE TRIGGER DATA_STATS_DELETE AFTER DELETE ON DATA
+BEGIN
+    UPDATE DATA_STATS SET TOTAL = TOTAL - 1
+        WHERE TARGET IS OLD.TARGET AND TYPE IS OLD.TYPE;
+    DELETE FROM DATA_STATS
+        WHERE TARGET IS OLD.TARGET AND TYPE IS OLD.TYPE AND TOTAL <= 0;
+END;
+
+CREATE TRIGGER PAYLOADS_REFS_INSERT AFTER INSERT ON DATA
+WHEN NEW.CONTENT_HASH IS NOT NULL
+BEGIN
+    UPDATE PAYLOADS SET REFS = REFS + 1 WHERE HASH == NEW.CONTENT_HASH;
+END;
+
+CREATE TRIGGER PAYLOADS_REFS_DELETE AFTER DELETE ON DATA
+WHEN OLD.CONTENT_HASH IS NOT NULL
+BEGIN
+    UPDATE PAYLOADS SET REFS = REFS - 1 WHERE HASH == OLD.CONTENT_HASH;
+    DELETE FROM PAYLOADS WHERE HASH == OLD.CONTENT_HASH AND REFS <= 0;
+END;
+
+CREATE VIEW STATS AS
+    SELECT coalesce(DMK.CLONE_TYPE, DATA_STATS.TYPE) AS TYPE, sum(DATA_STATS.TOTAL) AS TOTAL
+    FROM DATA_STATS
+         LEFT JOIN
+         (SELECT TYPE, max(CLONE_TYPE) AS CLONE_TYPE FROM DMAKERS GROUP BY TYPE) AS DMK
+         ON DATA_STATS.TYPE == DMK.TYPE
+    GROUP BY 1;
 
 CREATE VIEW STATS_BY_TARGET AS
-  with joint as (
-      select TARGET, TYPE, count(*) as CPT, CLONE_TYPE from (
-          select DATA.TARGET, DATA.TYPE, DMAKERS.CLONE_TYPE
-          from DATA inner join DMAKERS
-              on DATA.TYPE == DMAKERS.TYPE
-      )
-      group by TARGET, TYPE
-  )
-  select TARGET, TYPE, sum(CPT) as TOTAL from (
-      select TARGET, CLONE_TYPE as TYPE, CPT from joint
-      where CLONE_TYPE is not null
-      union all
-      select TARGET, TYPE, CPT from joint
-      where CLONE_TYPE is null
-  )
-  group by TARGET, TYPE;
+    SELECT DATA_STATS.TARGET AS TARGET, coalesce(DMK.CLONE_TYPE, DATA_STATS.TYPE) AS TYPE,
+           sum(DATA_STATS.TOTAL) AS TOTAL
+    FROM DATA_STATS
+         INNER JOIN
+         (SELECT TYPE, max(CLONE_TYPE) AS CLONE_TYPE FROM DMAKERS GROUP BY TYPE) AS DMK
+         ON DATA_STATS.TYPE == DMK.TYPE
+    GROUP BY 1, 2;
+
+INSERT INTO CONF (ITEM, VALUE) VALUES ('SCHEMA_VERSION', 4);
+INSERT INTO CONF (ITEM, VALUE) VALUES ('SHARD_START', strftime('%s', 'now'));
 
 COMMIT TRANSACTION;
 PRAGMA foreign_keys = on;
@@ -0,0 +1,324 @@
+################################################################################
+#
+#  Copyright 2014-2016 Eric Lacombe <eric.lacombe@security-labs.org>
+#
+################################################################################
+#
+#  This file is part of fuddly.
+#
+#  fuddly is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  fuddly is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with fuddly. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+'''
+Fork server used by LocalTarget to run the target application once per test
+case. The stub part of this module is started once, and then forks and
+executes the target on request. It is therefore no longer needed to spawn a
+process from the (bigger) framework process for each test case, and the exit
+status of the application is directly provided.
+
+Protocol between the framework and the stub (integers are 4-byte long,
+little endian):
+
+- when the stub is ready, it writes FORK_SERVER_HELLO on the status pipe;
+- for each request read on the control pipe, it forks and executes the target
+  command, writes the PID of the child on the status pipe, waits for it, and
+  then writes its wait status. A request is the length of the command line to
+  use for this execution followed by its arguments separated by null bytes. A
+  null length means the command the stub has been started with;
+- the stub terminates when the control pipe is closed.
+'''
+
+import os
+import sys
+import time
+import fcntl
+import select
+import signal
+import struct
+import subprocess
+
+FORK_SERVER_HELLO = 0x56525346  # 'FSRV'
+
+
+def _set_cloexec(fd):
+    flags = fcntl.fcntl(fd, fcntl.F_GETFD)
+    fcntl.fcntl(fd, fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+
+
+def _read_exactly(fd, size):
+    buf = b''
+    while len(buf) < size:
+        chunk = os.read(fd, size - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return buf
+
+
+def _wait_readable(fd, timeout):
+    # select.poll() supports file descriptors beyond FD_SETSIZE. Same as
+    # libs.utils.wait_for_fds(), which cannot be imported by the stub.
+    poller = select.poll()
+    poller.register(fd, select.POLLIN)
+    return bool(poller.poll(None if timeout is None else max(timeout, 0) * 1000))
+
+
+def _spawn(cmd):
+    if hasattr(os, 'posix_spawnp'):
+        # vfork()-based, much cheaper than duplicating the interpreter
+        try:
+            return os.posix_spawnp(cmd[0], cmd, os.environ)
+        except OSError:
+            pass
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.execvp(cmd[0], cmd)
+        except OSError:
+            pass
+        os._exit(127)
+    return pid
+
+
+def stub_main(ctl_fd, st_fd, cmd):
+    _set_cloexec(ctl_fd)
+    _set_cloexec(st_fd)
+    os.write(st_fd, struct.pack('<I', FORK_SERVER_HELLO))
+
+    while True:
+        req = _read_exactly(ctl_fd, 4)
+        if req is None:
+            break
+        length = struct.unpack('<I', req)[0]
+        if length:
+            args = _read_exactly(ctl_fd, length)
+            if args is None:
+                break
+            pid = _spawn(args.split(b'\x00'))
+        else:
+            pid = _spawn(cmd)
+
+        os.write(st_fd, struct.pack('<I', pid))
+        _, status = os.waitpid(pid, 0)
+        os.write(st_fd, struct.pack('<i', status))
+
+
+class ForkServerChild(object):
+    '''
+    Process run by the fork server for one test case. Provides the subset of
+    the `subprocess.Popen` interface used by LocalTarget.
+    '''
+
+    def __init__(self, fork_server, pid):
+        self._fork_server = fork_server
+        self.pid = pid
+        self.returncode = None
+
+    @property
+    def stdout(self):
+        return self._fork_server.stdout
+
+    @property
+    def stderr(self):
+        return self._fork_server.stderr
+
+    def poll(self, timeout=0):
+        '''
+        Args:
+          timeout (float): maximum time to wait for the termination of the process
+
+        Returns:
+          int: the exit code of the process, or the negated number of the signal
+          that terminated it, or None if it is still running.
+        '''
+        if self.returncode is None:
+            status = self._fork_server.read_status(timeout)
+            if status is not None:
+                if os.WIFSIGNALED(status):
+                    self.returncode = -os.WTERMSIG(status)
+                else:
+                    self.returncode = os.WEXITSTATUS(status)
+        return self.returncode
+
+    def kill(self, sig=signal.SIGTERM):
+        # once its status is available, the process has been reaped by the stub
+        # and its PID may have been reused
+        if self.poll() is None:
+            os.kill(self.pid, sig)
+
+
+class ForkServer(object):
+    '''
+    Client side of the fork server
+    '''
+
+    def __init__(self, cmd, handshake_timeout=2, stdin=None, pass_fds=()):
+        self.cmd = cmd
+        self.stdin = stdin
+        self.pass_fds = tuple(pass_fds)
+        self.handshake_timeout = handshake_timeout
+        self._stub = None
+        self._ctl_fd = None
+        self._st_fd = None
+        self._child = None
+
+    @property
+    def stdout(self):
+        return self._stub.stdout
+
+    @property
+    def stderr(self):
+        return self._stub.stderr
+
+    def start(self):
+        '''
+        Returns:
+          bool: True if the stub has been started and has answered to the handshake
+        '''
+        ctl_r, ctl_w = os.pipe()
+        st_r, st_w = os.pipe()
+        args = [sys.executable, os.path.abspath(__file__).replace('.pyc', '.py'),
+                str(ctl_r), str(st_w)] + self.cmd
+        if sys.version_info[0] > 2:
+            kwargs = {'pass_fds': (ctl_r, st_w) + self.pass_fds}
+        else:
+            kwargs = {'close_fds': False}
+        try:
+            with open(os.devnull, 'rb') as devnull:
+                stdin = devnull if self.stdin is None else self.stdin
+                self._stub = subprocess.Popen(args=args, stdin=stdin, stdout=subprocess.PIPE,
+                                              stderr=subprocess.PIPE, **kwargs)
+        except OSError:
+            for fd in (ctl_r, ctl_w, st_r, st_w):
+                os.close(fd)
+            return False
+        finally:
+            if self._stub is not None:
+                os.close(ctl_r)
+                os.close(st_w)
+
+        self._ctl_fd = ctl_w
+        self._st_fd = st_r
+        _set_cloexec(ctl_w)
+        _set_cloexec(st_r)
+
+        for fd in (self._stub.stdout, self._stub.stderr):
+            fl = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, fl | os.O_NONBLOCK)
+
+        ready = _wait_readable(self._st_fd, self.handshake_timeout)
+        hello = _read_exactly(self._st_fd, 4) if ready else None
+        if hello is None or struct.unpack('<I', hello)[0] != FORK_SERVER_HELLO:
+            self.stop()
+            return False
+
+        return True
+
+    def stop(self):
+        if self._stub is None:
+            return
+        if self._child is not None:
+            self._terminate_child()
+        os.close(self._ctl_fd)
+        try:
+            self._wait_stub()
+        finally:
+            os.close(self._st_fd)
+            self._stub.stdout.close()
+            self._stub.stderr.close()
+            self._stub = None
+            self._child = None
+
+    def _wait_stub(self, timeout=1):
+        t0 = time.time()
+        while self._stub.poll() is None:
+            if time.time() - t0 > timeout:
+                self._stub.kill()
+                self._stub.wait()
+                break
+            time.sleep(0.01)
+
+    def is_alive(self):
+        return self._stub is not None and self._stub.poll() is None
+
+    def run(self, cmd=None):
+        '''
+        Execute the command once.
+
+        Args:
+          cmd (list): command line to use instead of the one provided at
+            initialization
+
+        Returns:
+          ForkServerChild: the new process, or None if the fork server is broken
+        '''
+        if self._child is not None:
+            self._terminate_child()
+        self._drain_output()
+        if cmd is None or cmd == self.cmd:
+            req = struct.pack('<I', 0)
+        else:
+            args = b'\x00'.join(a if isinstance(a, bytes) else a.encode('utf-8') for a in cmd)
+            req = struct.pack('<I', len(args)) + args
+        try:
+            os.write(self._ctl_fd, req)
+        except OSError:
+            return None
+        try:
+            pid = _read_exactly(self._st_fd, 4)
+        except OSError:
+            return None
+        if pid is None:
+            return None
+        self._child = ForkServerChild(self, struct.unpack('<I', pid)[0])
+        return self._child
+
+    def _drain_output(self):
+        # stdout/stderr are shared by all the processes run by the stub, thus
+        # what has not been consumed for the previous test case is discarded
+        for f in (self._stub.stdout, self._stub.stderr):
+            while _wait_readable(f, 0):
+                try:
+                    if not os.read(f.fileno(), 65536):
+                        break
+                except OSError:
+                    break
+
+    def read_status(self, timeout=0):
+        '''
+        Called by ForkServerChild.poll()
+        '''
+        if not _wait_readable(self._st_fd, timeout):
+            return None
+        status = _read_exactly(self._st_fd, 4)
+        self._child = None
+        return None if status is None else struct.unpack('<i', status)[0]
+
+    def _terminate_child(self):
+        # The status of the previous child has to be consumed before a new one
+        # is requested
+        child = self._child
+        try:
+            child.kill()
+        except OSError:
+            pass
+        if child.poll(timeout=self.handshake_timeout) is None:
+            child.kill(signal.SIGKILL)
+            child.poll(timeout=self.handshake_timeout)
+
+
+if __name__ == '__main__':
+    stub_main(int(sys.argv[1]), int(sys.argv[2]), sys.argv[3:])
@@ -53,6 +53,21 @@ class ModelWalker(object):
     to a combinatorial explosion, with limited interest...
     '''
 
+    # When set to (chunk_size, nb_workers, worker_idx), the walk is split in
+    # shares dealt out in turn to nb_workers workers, and only the steps of
+    # the shares of the worker worker_idx are yielded (cf. plumbing.GenerationPool):
+    # - if the consumer is partitionable (cf. NodeConsumerStub) and the whole
+    #   walk is requested, a share is made of the steps of one consumed node.
+    #   The nodes of the other workers are walked through as if the consumer
+    #   was not interested by them, thus each worker only performs its own
+    #   cases. The steps are numbered within the worker.
+    # - otherwise, a share is a window of chunk_size steps. Every worker walks
+    #   through all the steps, thus they keep the same numbering.
+    # The share of the last yielded step is recorded in last_share, along
+    # with a flag telling if the share is a node.
+    partition = None
+    last_share = None
+
     def __init__(self, root_node, node_consumer, make_determinist=False, make_random=False,
                  max_steps=-1, initial_step=1):
         self._root_node = root_node
@@ -76,6 +91,8 @@ class ModelWalker(object):
         self.triglast_ic = dm.NodeInternalsCriteria(mandatory_custo=[dm.GenFuncCusto.TriggerLast])
 
         self.consumed_node_path = None
+        self._share = -1
+        self._share_by_node = False
 
         self.set_consumer(node_consumer)
 
@@ -87,25 +104,30 @@ class ModelWalker(object):
     def __iter__(self):
 
         self._cpt = 1
+        self._share = -1
+        self._share_by_node = self.partition is not None and self._consumer.partitionable \
+                              and self._initial_step == 1 and self._max_steps == -1
 
         gen = self.walk_graph_rec([self._root_node], self._consumer.yield_original_val,
                                   structure_has_changed=False, consumed_nodes=set())
         for consumed_node, orig_node_val in gen:
             self._root_node.freeze()
 
-            if self._cpt >= self._initial_step:
-                self.consumed_node_path = consumed_node.get_path_from(self._root_node)
-                if self.consumed_node_path == None:
-                    # 'consumed_node_path' can be None if
-                    # consumed_node is not part of the frozen rnode
-                    # (it may however exist when rnode is not
-                    # frozen). This situation can trigger in some
-                    # specific situations related to the use of
-                    # existence conditions within a data model. Thus,
-                    # in this case we skip the just generated case as
-                    # nothing is visible.
-                    continue
+            consumed_node_path = consumed_node.get_path_from(self._root_node)
+            if consumed_node_path == None:
+                # 'consumed_node_path' can be None if
+                # consumed_node is not part of the frozen rnode
+                # (it may however exist when rnode is not
+                # frozen). This situation can trigger in some
+                # specific situations related to the use of
+                # existence conditions within a data model. Thus,
+                # in this case we skip the just generated case as
+                # nothing is visible, and it is not counted as a step.
+                continue
 
+            if self._cpt >= self._initial_step and self._is_in_partition(self._cpt):
+                self.consumed_node_path = consumed_node_path
+                self._record_share(self._cpt)
                 yield self._root_node, consumed_node, orig_node_val, self._cpt
 
             if self._max_steps != -1 and self._cpt >= (self._max_steps+self._initial_step-1):
@@ -114,7 +136,7 @@ class ModelWalker(object):
             else:
                 self._cpt += 1
 
-        if self._cpt <= self._initial_step and self._cpt > 1:
+        if self._cpt <= self._initial_step and self._cpt > 1 and self._is_in_partition(self._initial_step):
             self._initial_step = 1
             print("\n*** DEBUG: initial_step idx ({:d}) is after" \
                       " the last idx ({:d})!\n".format(self._initial_step, self._cpt-1))
@@ -122,10 +144,37 @@ class ModelWalker(object):
             if self.consumed_node_path == None:
                 return
             else:
+                self._record_share(self._initial_step)
                 yield self._root_node, consumed_node, orig_node_val, self._cpt-1
 
         return
 
+    def _is_in_partition(self, step):
+        if self.partition is None or self._share_by_node:
+            return True
+        chunk_size, nb_workers, worker_idx = self.partition
+        window = (step - self._initial_step) // chunk_size
+        return window % nb_workers == worker_idx
+
+    def _record_share(self, step):
+        if self.partition is None:
+            return
+        if self._share_by_node:
+            ModelWalker.last_share = (self._share, True)
+        else:
+            ModelWalker.last_share = ((step - self._initial_step) // self.partition[0], False)
+
+    def _take_node_share(self):
+        '''
+        Called each time the consumer is given a new node. Return False
+        if the node belongs to another worker (cf. ModelWalker.partition).
+        '''
+        if not self._share_by_node:
+            return True
+        self._share += 1
+        chunk_size, nb_workers, worker_idx = self.partition
+        return self._share % nb_workers == worker_idx
+
 
     def _do_reset(self, node):
         last_gen = self._root_node.get_reachable_nodes(internals_criteria=self.triglast_ic)
@@ -297,9 +346,16 @@ class ModelWalker(object):
         if self._consumer.interested_by(node):
             if node in consumed_nodes:
                 go_on = False
+            elif not self._take_node_share():
+                # Consumed by another worker. It is registered as consumed
+                # to be skipped the same way by all the workers.
+                consumed_nodes.add(node)
+                go_on = False
             else:
                 self._consumer.save_node(node)
                 go_on = self._consumer.consume_node(node)
+                if not go_on and self._share_by_node:
+                    consumed_nodes.add(node)
         else:
             go_on = False
 
@@ -382,6 +438,10 @@ class NodeConsumerStub(object):
     def __init__(self, specific_args=None, max_runs_per_node=-1, min_runs_per_node=-1, respect_order=True):
         self.yield_original_val = True
         self.need_reset_when_structure_change = False
+        # True if consuming a node does not alter the walk through the other
+        # nodes, thus the nodes can be consumed within different walks
+        # (cf. ModelWalker.partition)
+        self.partitionable = False
 
         self._internals_criteria = None
         self._semantics_criteria = None
@@ -789,6 +849,7 @@ class TypedNodeDisruption(NodeConsumerStub):
 
         self.yield_original_val = True
         self.need_reset_when_structure_change = True
+        self.partitionable = True
 
     def consume_node(self, node):
         if node is not self.current_node:
@@ -948,6 +1009,7 @@ class SeparatorDisruption(NodeConsumerStub):
 
         self.yield_original_val = False
         # self.need_reset_when_structure_change = True
+        self.partitionable = True
 
     def consume_node(self, node):
         orig_val = node.to_bytes()
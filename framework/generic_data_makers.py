@@ -38,6 +38,7 @@ from framework.value_types import *
 from framework.data_model_helpers import GENERIC_ARGS
 
 from framework.global_resources import *
+from framework.data_delivery import DataDelivery
 
 tactics = Tactics()
 
@@ -505,6 +506,10 @@ class sd_struct_constraints(StatefulDisruptor):
                  'file_mode': ('if True the data will be provided through ' \
                                'a file to the external program, otherwise it ' \
                                'will be provided on the command line directly', True, bool),
+                 'delivery': ('if provided, overrides @file_mode and specifies how ' \
+                              'the data is provided to the external program: ' \
+                              '"file", "stdin", "memfd" (anonymous file in memory) ' \
+                              'or "ring" (ring of files in a tmpfs)', None, str),
                  'path': ('graph path regexp to select nodes on which ' \
                           'the disruptor should apply', None, str)})
 class d_call_external_program(Disruptor):
@@ -517,8 +522,19 @@ class d_call_external_program(Disruptor):
                 print("\n*** ERROR: A command should be provided!")
                 return False
 
+        if self.delivery is not None and self.delivery not in DataDelivery.modes:
+            print("\n*** ERROR: Unknown delivery mode '{:s}'!".format(self.delivery))
+            return False
+
+        self._delivery = None
+
         return True
 
+    def cleanup(self):
+        if self._delivery is not None:
+            self._delivery.close()
+            self._delivery = None
+
     def _get_cmd(self):
         return self.cmd
 
@@ -541,8 +557,23 @@ class d_call_external_program(Disruptor):
         else:
             cmd_repr = cmd
 
-        # provide prev_data through a file
-        if self.file_mode:
+        popen_kwargs = {}
+
+        # provide prev_data through a file, stdin, ...
+        if self.delivery is not None:
+            if self._delivery is None:
+                dm = prev_data.get_data_model()
+                file_extension = '.' + dm.file_extension if dm else '.bin'
+                self._delivery = DataDelivery(self.delivery, file_ext=file_extension,
+                                              prefix='EXT_file_')
+            arg = self._delivery.deliver(raw_data)
+            popen_kwargs = self._delivery.popen_kwargs()
+            if arg is None:
+                prev_data.add_info("Execute command: {:s} < [data]".format(cmd_repr))
+            else:
+                prev_data.add_info("Execute command: {:s}".format(cmd_repr + ' ' + arg))
+
+        elif self.file_mode:
             dm = prev_data.get_data_model()
             if dm:
                 file_extension = dm.file_extension
@@ -563,13 +594,15 @@ class d_call_external_program(Disruptor):
 
         if isinstance(cmd, list):
             cmd = list(cmd)
-            cmd.append(arg)
+            if arg is not None:
+                cmd.append(arg)
         else:
-            cmd = cmd + ' ' + arg
+            if arg is not None:
+                cmd = cmd + ' ' + arg
             cmd = cmd.split()
 
         try:
-            out_val = subprocess.check_output(cmd)
+            out_val = subprocess.check_output(cmd, **popen_kwargs)
         except subprocess.CalledProcessError as e:
             prev_data.add_info("/!\\ Error encountered while executing external command!")
             return prev_data
@@ -241,6 +241,9 @@ class Logger(object):
 
             if self.last_data_id is None:
                 print("\n*** ERROR: Cannot insert the data record in FMKDB!")
+                # an ID from a previous recording (e.g., data fetched from FmkDB)
+                # does not identify this emission
+                self._current_data.set_data_id(None)
                 self.last_data_id = None
                 self.last_data_recordable = None
                 self._reset_current_state()
@@ -248,10 +251,10 @@ class Logger(object):
 
             self._current_data.set_data_id(self.last_data_id)
 
+            steps = []
             if self._current_orig_data_id is not None:
-                self.fmkDB.insert_steps(self.last_data_id, 1, None, None,
-                                        self._current_orig_data_id,
-                                        None, None)
+                steps.append((self.last_data_id, 1, None, None,
+                              self._current_orig_data_id, None, None))
                 step_id_start = 2
             else:
                 step_id_start = 1
@@ -265,10 +268,10 @@ class Logger(object):
                         info = bytes(info, 'latin_1')
                     else:
                         info = bytes(info)
-                self.fmkDB.insert_steps(self.last_data_id, step_id, dmaker_type, dmaker_name,
-                                        self._current_src_data_id,
-                                        str(user_input), info)
+                steps.append((self.last_data_id, step_id, dmaker_type, dmaker_name,
+                              self._current_src_data_id, str(user_input), info))
 
+            self.fmkDB.insert_multiple_steps(steps)
 
             self._reset_current_state()
 
@@ -375,14 +378,23 @@ class Logger(object):
     def log_target_feedback_from(self, feedback, timestamp,
                                  preamble=None, epilogue=None,
                                  source=None,
-                                 status_code=None):
+                                 status_code=None,
+                                 data=None):
         decoded_feedback = self._decode_target_feedback(feedback)
 
-        if self.last_data_recordable or not self.__explicit_data_recording:
+        if data is not None:
+            # feedback related to a specific data, which is not necessarily the last
+            # one. It is only recorded in FmkDB along with this data.
+            data_id = data.get_data_id()
             record = True
+            db_record = data_id is not None
+        elif self.last_data_recordable or not self.__explicit_data_recording:
+            data_id = self.last_data_id
+            record = db_record = True
         else:
             # feedback will not be recorded because data is not recorded
-            record = False
+            data_id = None
+            record = db_record = False
 
         if preamble is not None:
             self.log_fn(preamble, do_record=record)
@@ -409,15 +421,18 @@ class Logger(object):
                 else:
                     self.log_fn(decoded_feedback, rgb=body_color, do_record=record)
 
-            if record:
+            if record and not db_record:
+                self.log_fn("### Feedback not recorded in FmkDB (its data has not been recorded)",
+                            rgb=Color.DATAINFO, do_record=record)
+            elif db_record:
                 src = 'Default' if source is None else source
                 if isinstance(feedback, list):
-                    for fbk, ts in zip(feedback, timestamp):
-                        self.fmkDB.insert_feedback(self.last_data_id, src, ts,
-                                                   self._encode_target_feedback(fbk),
-                                                   status_code=status_code)
+                    fbk_list = [(ts, self._encode_target_feedback(fbk))
+                                for fbk, ts in zip(feedback, timestamp)]
+                    self.fmkDB.insert_multiple_feedback(data_id, src, fbk_list,
+                                                        status_code=status_code)
                 else:
-                    self.fmkDB.insert_feedback(self.last_data_id, src, timestamp,
+                    self.fmkDB.insert_feedback(data_id, src, timestamp,
                                                self._encode_target_feedback(feedback),
                                                status_code=status_code)
 
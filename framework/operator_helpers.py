@@ -111,6 +111,12 @@ class LastInstruction(object):
 
 class Operator(object):
 
+    # If True, the framework may plan the next operations while the current
+    # one is being sent (cf. FmkPlumbing.set_pipeline_depth()). Only relevant
+    # for operators whose planning does not depend on the feedback of the
+    # previous operation.
+    prefetchable = False
+
     def __init__(self):
         pass
 
@@ -36,6 +36,12 @@ import atexit
 import datetime
 import time
 import signal
+import threading
+import contextlib
+import multiprocessing
+
+import six
+from six.moves import queue
 
 from libs.external_modules import *
 
@@ -200,18 +206,431 @@ class FmkTask(threading.Thread):
         self._stop.set()
 
 
+class DataPrefetcher(threading.Thread):
+    '''
+    Call @produce_func in the background and provide its results, in
+    order, through a bounded queue of @depth items.
+
+    @produce_func is called with @lock held, and shall return a tuple
+    (item, last). No more item is produced once @last is True. The
+    consumer shall hold @lock, which is only released while it waits
+    for an item (cf. get()) or while the framework waits for the target
+    (cf. FmkPlumbing._wait_section()).
+    '''
+
+    def __init__(self, produce_func, depth, lock):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._produce = produce_func
+        self._queue = queue.Queue(depth)
+        self._lock = lock
+        self._stop_event = threading.Event()
+        self._unqueued = None
+        self.stats = {'depth': depth, 'produced': 0, 'consumed': 0, 'max_queue_depth': 0,
+                      'consumer_stalls': 0, 'producer_stalls': 0}
+
+    def run(self):
+        last = False
+        while not last and not self._stop_event.is_set():
+            with self._lock:
+                if self._stop_event.is_set():
+                    break
+                try:
+                    item, last = self._produce()
+                    entry = (item, last, None)
+                except Exception:
+                    entry = (None, True, sys.exc_info())
+                    last = True
+            self.stats['produced'] += 1
+
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                self.stats['producer_stalls'] += 1
+                while True:
+                    if self._stop_event.is_set():
+                        self._unqueued = entry
+                        break
+                    try:
+                        self._queue.put(entry, timeout=0.1)
+                    except queue.Full:
+                        continue
+                    break
+
+            self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self._queue.qsize())
+
+    def get(self):
+        '''
+        Returns:
+          tuple: (item, last)
+        '''
+        try:
+            item, last, exc_info = self._queue.get_nowait()
+        except queue.Empty:
+            self.stats['consumer_stalls'] += 1
+            self._lock.release()
+            try:
+                item, last, exc_info = self._queue.get()
+            finally:
+                self._lock.acquire()
+
+        self.stats['consumed'] += 1
+        if exc_info is not None:
+            six.reraise(*exc_info)
+        return item, last
+
+    def stop(self):
+        '''
+        Stop the production (the consumer shall not hold the lock anymore).
+
+        Returns:
+          list: the items that have been produced but not consumed
+        '''
+        self._stop_event.set()
+        self.join()
+        entries = []
+        while True:
+            try:
+                entries.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if self._unqueued is not None:
+            entries.append(self._unqueued)
+        return [item for item, last, exc_info in entries if exc_info is None and item is not None]
+
+
+def _export_user_input(user_input):
+    # UI objects are turned into dicts before crossing process boundaries
+    if user_input is None:
+        return None
+    gen_ui = user_input.get_generic()
+    spe_ui = user_input.get_specific()
+    return (None if gen_ui is None else dict(gen_ui.inputs),
+            None if spe_ui is None else dict(spe_ui.inputs))
+
+def _import_user_input(t):
+    if t is None:
+        return None
+    uis = _import_uis(t)
+    return UserInputContainer(generic=uis[0], specific=uis[1])
+
+def _import_uis(inputs_list):
+    uis = []
+    for inputs in inputs_list:
+        if inputs is None:
+            uis.append(None)
+        else:
+            ui = UI()
+            ui.set_user_inputs(inputs)
+            uis.append(ui)
+    return uis
+
+def _export_action_list(action_list):
+    exported = []
+    for full_action in action_list:
+        if isinstance(full_action, (tuple, list)):
+            uis = [None if ui is None else dict(ui.inputs) for ui in full_action[1:]]
+            exported.append(tuple([full_action[0]] + uis))
+        else:
+            exported.append(full_action)
+    return exported
+
+def _import_action_list(action_list):
+    imported = []
+    for full_action in action_list:
+        if isinstance(full_action, tuple):
+            imported.append(tuple([full_action[0]] + _import_uis(full_action[1:])))
+        else:
+            imported.append(full_action)
+    return imported
+
+
+class GenerationPool(object):
+    '''
+    Run FmkPlumbing.get_data() pipelines within worker processes, and
+    stream the produced data back through bounded queues.
+
+    The work is split in windows of @chunk_size data. Worker N handles
+    the windows N, N+nb_workers, N+2*nb_workers, ... and the windows are
+    read back in order, so the resulting data sequence does not depend
+    on the number of workers.
+
+    If @action_list contains a disruptor relying on the ModelWalker
+    (e.g., tTYPE, tWALK, ...), its walk is split in shares
+    (cf. ModelWalker.partition). Every worker generates the same seed
+    (same random seed) and walks through it. With tTYPE for instance,
+    a share is made of the cases of one node, and each worker only
+    performs the cases of its nodes. Otherwise, a share is a window of
+    @chunk_size steps, and every worker walks through the whole walk
+    but only processes the steps of its own windows. In both cases, the
+    shares are read back in the walk order, thus no walking step is
+    duplicated or skipped, and the walking indexes reported by the
+    disruptor are the ones of a sequential run (values randomly chosen
+    by the disruptor may however differ). Otherwise, each window runs
+    the pipeline @chunk_size times from a new seed, with its own random
+    seed (@seed + window index).
+
+    The workers are spawned processes, which do not inherit anything
+    from the current one (no fork while the framework threads are
+    running). Each one launches the current project with the current
+    data model(s) (cf. FmkPlumbing._launch_generation_worker()). Thus,
+    the modifications performed at runtime (e.g., on the data makers or
+    the data model) are not taken into account, and the data makers
+    interact with the EmptyTarget. Only the raw bytes and the metadata
+    of the data (history, info, initial data maker, feedback timeout)
+    are transferred back, thus data callbacks registered by data makers
+    are not supported.
+    '''
+
+    def __init__(self, fmk, action_list, nb_workers, chunk_size=50, queue_size=100,
+                 seed=None, valid_gen=False, save_seed=True, partitioned=False):
+        self._fmk = fmk
+        self.nb_workers = max(1, int(nb_workers))
+        self.chunk_size = max(1, int(chunk_size))
+        self.seed = random.randint(0, 2**31) if seed is None else seed
+
+        # everything the workers need, picklable
+        self._spec = {'project': fmk.prj.name, 'data_model': fmk._get_data_model_names(),
+                      'action_list': _export_action_list(action_list),
+                      'valid_gen': valid_gen, 'save_seed': save_seed, 'seed': self.seed,
+                      'nb_workers': self.nb_workers, 'chunk_size': self.chunk_size,
+                      'partitioned': partitioned}
+
+        self._ctx = multiprocessing.get_context('spawn')
+        self._queues = [self._ctx.Queue(max(1, queue_size // self.nb_workers))
+                        for i in range(self.nb_workers)]
+        self._workers = []
+        self._started = False
+
+    def start(self):
+        assert not self._started
+        self._started = True
+        for idx in range(self.nb_workers):
+            p = self._ctx.Process(target=_run_generation_worker,
+                                  args=(self._spec, idx, self._queues[idx]))
+            p.daemon = True
+            p.start()
+            self._workers.append(p)
+
+    def stop(self):
+        for p in self._workers:
+            if p.is_alive():
+                p.terminate()
+        for p in self._workers:
+            p.join()
+        for q in self._queues:
+            q.close()
+            q.cancel_join_thread()
+        self._workers = []
+
+    def __iter__(self):
+        '''
+        Yield the produced Data in window order. Stop when the
+        partitioned walk is exhausted, or when a worker reports an error.
+        In both cases, the errors reported by the worker are registered
+        within the framework through FmkPlumbing.set_error().
+        '''
+        if not self._started:
+            self.start()
+
+        if self._spec['partitioned']:
+            for data in self._iter_shares():
+                yield data
+            return
+
+        window = 0
+        while True:
+            worker_idx = window % self.nb_workers
+            while True:
+                rec = self._get_record(worker_idx)
+                if rec is None:
+                    return
+
+                kind = rec[0]
+                if kind == 'data':
+                    yield self._build_data(rec[1])
+                elif kind == 'end':
+                    break
+                else: # 'exhausted' or 'error'
+                    self._report(rec[1])
+                    return
+
+            window += 1
+
+    def _iter_shares(self):
+        # The records of a worker are ('data', exported data, share, share_by_node),
+        # its shares being increasing. Some shares may not produce any data,
+        # thus the walk is only over when every worker has reached its end.
+        pending = [None] * self.nb_workers
+        end_errors = [None] * self.nb_workers
+        step = 0
+        share = 0
+        while True:
+            worker_idx = share % self.nb_workers
+            while end_errors[worker_idx] is None:
+                rec = pending[worker_idx]
+                pending[worker_idx] = None
+                if rec is None:
+                    rec = self._get_record(worker_idx)
+                    if rec is None:
+                        return
+
+                kind = rec[0]
+                if kind == 'data':
+                    if rec[2] > share:
+                        pending[worker_idx] = rec
+                        break
+                    step += 1
+                    # the steps of the shares made of nodes are numbered
+                    # within the worker (cf. ModelWalker.partition)
+                    yield self._build_data(rec[1], walk_step=step if rec[3] else None)
+                elif kind == 'exhausted':
+                    end_errors[worker_idx] = rec[1]
+                else: # 'error'
+                    self._report(rec[1])
+                    return
+
+            if all(e is not None for e in end_errors):
+                self._report(end_errors[worker_idx])
+                return
+
+            share += 1
+
+    def _get_record(self, worker_idx):
+        q = self._queues[worker_idx]
+        while True:
+            try:
+                return q.get(timeout=1)
+            except queue.Empty:
+                if not self._workers[worker_idx].is_alive():
+                    self._fmk.set_error('Generation worker #{:d} has died!'.format(worker_idx),
+                                        code=Error.FmkError)
+                    return None
+
+    def _report(self, errors):
+        for msg, code in errors:
+            self._fmk.set_error(msg, code=code)
+
+    @staticmethod
+    def _export_data(data):
+        info = {}
+        for k, v in data.info.items():
+            info[k] = [list(l) for l in v]
+        hist = data.get_history()
+        hist = None if hist is None else [(t, n, _export_user_input(ui)) for t, n, ui in hist]
+        init_dmaker = data.get_initial_dmaker()
+        if init_dmaker is not None:
+            t, n, ui = init_dmaker
+            init_dmaker = (t, n, _export_user_input(ui))
+        return {'raw': data.to_bytes(), 'info': info, 'history': hist,
+                'initial_dmaker': init_dmaker, 'feedback_timeout': data.feedback_timeout,
+                'recordable': data.is_recordable()}
+
+    @staticmethod
+    def _build_data(d, walk_step=None):
+        data = Data(d['raw'])
+        data.info = d['info']
+        if walk_step is not None:
+            for info_list in data.info.values():
+                for info in info_list:
+                    for i, line in enumerate(info):
+                        if line.startswith('model walking index: '):
+                            info[i] = 'model walking index: {:d}'.format(walk_step)
+        if d['history'] is not None:
+            data.set_history([(t, n, _import_user_input(ui)) for t, n, ui in d['history']])
+        if d['initial_dmaker'] is not None:
+            t, n, ui = d['initial_dmaker']
+            data.set_initial_dmaker([t, n, _import_user_input(ui)])
+        data.feedback_timeout = d['feedback_timeout']
+        if d['recordable']:
+            data.make_recordable()
+        return data
+
+
+def _run_generation_worker(spec, worker_idx, q):
+    # Ctrl+C is handled by the process that consumes the data
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # What the framework prints is only reported along with the errors
+    out = six.StringIO()
+    sys.stdout = out
+
+    def report(kind, err_list):
+        errors = [(e.msg, e.code) for e in err_list]
+        trace = out.getvalue().strip()
+        if kind == 'error' and trace:
+            errors.append((trace, Error.FmkError))
+        q.put((kind, errors))
+
+    try:
+        fmk = FmkPlumbing(fmkdb_path=':memory:')
+        if not fmk._launch_generation_worker(spec['project'], spec['data_model']):
+            report('error', fmk.get_error())
+            return
+
+        nb_workers, chunk_size = spec['nb_workers'], spec['chunk_size']
+        action_list = _import_action_list(spec['action_list'])
+
+        def generate():
+            out.seek(0)
+            out.truncate()
+            data = fmk.get_data(action_list, valid_gen=spec['valid_gen'],
+                                save_seed=spec['save_seed'])
+            if data is None:
+                err_list = fmk.get_error()
+                if spec['partitioned'] and err_list \
+                        and err_list[-1].code in (Error.HandOver, Error.DataUnusable):
+                    # the walk is over
+                    report('exhausted', err_list)
+                else:
+                    report('error', err_list or [Error('get_data() has failed', code=Error.FmkError)])
+            return data
+
+        if spec['partitioned']:
+            # the worker only processes the shares of the walk that are
+            # dealt out to it
+            walker_cls = framework.fuzzing_primitives.ModelWalker
+            walker_cls.partition = (chunk_size, nb_workers, worker_idx)
+            random.seed(spec['seed'])
+            while True:
+                data = generate()
+                if data is None:
+                    return
+                share, share_by_node = walker_cls.last_share
+                q.put(('data', GenerationPool._export_data(data), share, share_by_node))
+
+        window = worker_idx
+        while True:
+            fmk.cleanup_all_dmakers(reset_existing_seed=True)
+            random.seed(spec['seed'] + window)
+
+            for i in range(chunk_size):
+                data = generate()
+                if data is None:
+                    return
+                q.put(('data', GenerationPool._export_data(data)))
+
+            q.put(('end',))
+            window += nb_workers
+
+    except Exception:
+        q.put(('error', [(traceback.format_exc(), Error.FmkError)]))
+
+
+
 class FmkPlumbing(object):
 
     ''' 
     Defines the methods to operate every sub-systems of fuddly
     '''
 
-    def __init__(self):
+    def __init__(self, fmkdb_path=None):
         self.__started = False
         self.__first_loading = True
 
-        self.error = False
         self.fmk_error = []
+        self._error_lock = threading.Lock()
+        self._error_ctx = threading.local()
 
         self.__tg_enabled = False
         self.__prj_to_be_reloaded = False
@@ -246,7 +665,19 @@ class FmkPlumbing(object):
         self._task_list = {}
         self._task_list_lock = threading.Lock()
 
-        self.fmkDB = Database()
+        # cf. GenerationPool
+        self._gen_workers = 1
+        self._gen_chunk_size = 50
+
+        # cf. FmkPlumbing.prefetch()
+        self._pipeline_depth = 0
+        self._pipeline_stats = None
+        self._gen_lock = threading.Lock()
+        self._prefetcher = None
+        self._prefetcher_owner = None
+        self.__prefetched_data = {}
+
+        self.fmkDB = Database(fmkdb_path=fmkdb_path)
         ok = self.fmkDB.start()
         if not ok:
             raise InvalidFmkDB("The database {:s} is invalid!".format(self.fmkDB.fmk_db_path))
@@ -275,21 +706,56 @@ class FmkPlumbing(object):
                        '               - user projects and user data models',
                        rgb=Color.FMKSUBINFO))
 
+    def _get_error_list(self):
+        return getattr(self._error_ctx, 'errors', None)
+
     def set_error(self, msg='', context=None, code=Error.Reserved):
-        self.error = True
-        self.fmk_error.append(Error(msg, context=context, code=code))
+        err = Error(msg, context=context, code=code)
+        errors = self._get_error_list()
+        if errors is not None:
+            errors.append(err)
+        else:
+            with self._error_lock:
+                self.fmk_error.append(err)
 
     def get_error(self):
-        self.error = False
-        fmk_err = self.fmk_error
-        self.fmk_error = []
+        errors = self._get_error_list()
+        if errors is not None:
+            fmk_err = errors[:]
+            del errors[:]
+            return fmk_err
+        with self._error_lock:
+            fmk_err = self.fmk_error
+            self.fmk_error = []
         return fmk_err
 
     def is_not_ok(self):
-        return self.error
+        errors = self._get_error_list()
+        if errors is not None:
+            return bool(errors)
+        with self._error_lock:
+            return bool(self.fmk_error)
 
     def is_ok(self):
-        return not self.error
+        return not self.is_not_ok()
+
+    @contextlib.contextmanager
+    def _error_context(self):
+        '''
+        Give the current thread its own error list, so that the errors it sets
+        are neither seen nor cleared by the other threads (cf. prefetch()).
+        The errors that are still pending on exit are provided to the caller.
+        '''
+        errors = []
+        self._error_ctx.errors = errors
+        try:
+            yield errors
+        finally:
+            del self._error_ctx.errors
+
+    def _merge_errors(self, errors):
+        with self._error_lock:
+            self.fmk_error.extend(errors)
 
     def __reset_fmk_internals(self, reset_existing_seed=True):
         self.cleanup_all_dmakers(reset_existing_seed)
@@ -474,6 +940,17 @@ class FmkPlumbing(object):
                     gen_obj = tactics.get_generator_obj(gen_type, gen_name)
                     self.fmkDB.insert_dmaker(dm_name, gen_type, gen_name, True, True)
 
+    def _fmkDB_train_dictionary(self, dm):
+        if self.fmkDB.has_dictionary(dm.name):
+            return
+        samples = []
+        for data_id in dm.data_identifiers():
+            try:
+                samples.append(dm.get_data(data_id).to_bytes())
+            except:
+                continue
+        self.fmkDB.train_dictionary(dm.name, samples)
+
     def _recover_target(self):
         if self.group_id == self._saved_group_id:
             # This method can be called after checking target feedback or checking
@@ -880,6 +1357,9 @@ class FmkPlumbing(object):
                     self.__dynamic_generator_ids[self.dm].append(dmaker_type)
                     self.fmkDB.insert_dmaker(self.dm.name, dmaker_type, gen_cls_name, True, True)
 
+            if self.fmkDB.compression is not None:
+                self._fmkDB_train_dictionary(self.dm)
+
             print(colorize("*** Data Model '%s' loaded ***" % self.dm.name, rgb=Color.DATA_MODEL_LOADED))
 
         except:
@@ -1060,6 +1540,15 @@ class FmkPlumbing(object):
         print(colorize('        Target feedback timeout: ', rgb=Color.SUBINFO) + str(self.tg.feedback_timeout))
         print(colorize('              Workspace enabled: ', rgb=Color.SUBINFO) + repr(self._wkspace_enabled))
         print(colorize('                  FmkDB enabled: ', rgb=Color.SUBINFO) + repr(self.fmkDB.enabled))
+        print(colorize('             Generation workers: ', rgb=Color.SUBINFO) +
+              '{:d} (chunk size: {:d})'.format(self._gen_workers, self._gen_chunk_size))
+        print(colorize('                 Pipeline depth: ', rgb=Color.SUBINFO) + str(self._pipeline_depth))
+        stats = self._pipeline_stats
+        if stats is not None:
+            print(colorize('   Last pipeline stalls (c/p): ', rgb=Color.SUBINFO) +
+                  '{:d}/{:d} (max queue depth: {:d})'.format(stats['consumer_stalls'],
+                                                             stats['producer_stalls'],
+                                                             stats['max_queue_depth']))
 
     @EnforceOrder(accepted_states=['20_load_prj','25_load_dm','S1','S2'])
     def projects(self):
@@ -1390,6 +1879,40 @@ class FmkPlumbing(object):
             self.lg.log_fmk_info('Wrong burst value!', do_record=False)
             return False
 
+    @EnforceOrder(accepted_states=['S1','S2'])
+    def set_generation_workers(self, val, chunk_size=None, do_record=False):
+        if val >= 1 and (chunk_size is None or chunk_size >= 1):
+            self._gen_workers = int(val)
+            if chunk_size is not None:
+                self._gen_chunk_size = int(chunk_size)
+            self.lg.log_fmk_info('Generation workers = {:d} (chunk size = {:d})'
+                                 .format(self._gen_workers, self._gen_chunk_size),
+                                 do_record=do_record)
+            return True
+        else:
+            self.lg.log_fmk_info('Wrong generation workers value!', do_record=False)
+            return False
+
+    @EnforceOrder(accepted_states=['S1','S2'])
+    def set_pipeline_depth(self, val, do_record=False):
+        if val >= 0:
+            self._pipeline_depth = int(val)
+            self.lg.log_fmk_info('Pipeline depth = {:d}'.format(self._pipeline_depth),
+                                 do_record=do_record)
+            return True
+        else:
+            self.lg.log_fmk_info('Wrong pipeline depth value!', do_record=False)
+            return False
+
+    def get_pipeline_stats(self):
+        '''
+        Returns:
+          dict: statistics of the last pipelined loop (cf. prefetch()) or None.
+            'consumer_stalls' counts the times the sending loop had to wait
+            for data, 'producer_stalls' the times the queue was full.
+        '''
+        return None if self._pipeline_stats is None else dict(self._pipeline_stats)
+
     @EnforceOrder(accepted_states=['S1','S2'])
     def set_health_check_timeout(self, timeout, do_record=False, do_show=True):
         if timeout >= 0:
@@ -1419,6 +1942,125 @@ class FmkPlumbing(object):
             self.lg.log_fmk_info('Wrong timeout value!', do_record=False)
             return False
 
+    @contextlib.contextmanager
+    def _wait_section(self):
+        '''
+        Let the prefetcher (if any) generate data while waiting for the target
+        '''
+        if self._prefetcher is None or self._prefetcher_owner is not threading.current_thread():
+            yield
+        else:
+            self._gen_lock.release()
+            try:
+                yield
+            finally:
+                self._gen_lock.acquire()
+
+    def prefetch(self, produce_func, leftover_func=None, depth=None):
+        '''
+        Generator that yields the items returned by @produce_func. The latter
+        shall return a tuple (item, last) and is not called anymore once @last
+        is True.
+
+        If a pipeline depth has been set (cf. set_pipeline_depth(), or @depth
+        to override it), the items
+        are produced in the background, while the framework is waiting for the
+        target (cf. _wait_section()), up to the pipeline depth. Items are
+        still produced and consumed in the same order, and never concurrently
+        with other framework operations. When the generator is closed before
+        the last item, @leftover_func is called on each item that has been
+        produced but not consumed. The errors set while producing an item in
+        the background (cf. set_error()) are reported when the item is
+        consumed.
+        '''
+        depth = self._pipeline_depth if depth is None else depth
+        if depth < 1 or self._prefetcher is not None:
+            last = False
+            while not last:
+                item, last = produce_func()
+                yield item
+            return
+
+        def produce_in_context():
+            # errors set by the producer thread are handed off with the item
+            with self._error_context() as errors:
+                item, last = produce_func()
+            return (item, errors), last
+
+        self._gen_lock.acquire()
+        prefetcher = DataPrefetcher(produce_in_context, depth, self._gen_lock)
+        self._prefetcher = prefetcher
+        self._prefetcher_owner = threading.current_thread()
+        prefetcher.start()
+        try:
+            last = False
+            while not last:
+                (item, errors), last = prefetcher.get()
+                self._merge_errors(errors)
+                yield item
+        finally:
+            self._prefetcher = None
+            self._prefetcher_owner = None
+            self._gen_lock.release()
+            leftovers = prefetcher.stop()
+            self._pipeline_stats = prefetcher.stats
+            if leftover_func is not None:
+                for item, errors in leftovers:
+                    if item is not None:
+                        leftover_func(item)
+
+    @staticmethod
+    def _get_action_list_key(action_list, valid_gen):
+        key = []
+        for action in action_list:
+            if isinstance(action, (tuple, list)):
+                key.append(tuple([str(a) for a in action]))
+            else:
+                key.append(str(action))
+        return (tuple(key), valid_gen)
+
+    def _push_prefetched_data(self, action_list, valid_gen, data):
+        if data is None:
+            return
+        key = self._get_action_list_key(action_list, valid_gen)
+        self.__prefetched_data.setdefault(key, collections.deque()).append(data)
+
+    def _pop_prefetched_data(self, action_list, valid_gen):
+        key = self._get_action_list_key(action_list, valid_gen)
+        pending = self.__prefetched_data.get(key)
+        if not pending:
+            return None
+        data = pending.popleft()
+        if not pending:
+            del self.__prefetched_data[key]
+        return data
+
+    @EnforceOrder(accepted_states=['S2'])
+    def iter_data(self, action_list, max_loop=-1, valid_gen=False, save_seed=False):
+        '''
+        Generator that yields up to @max_loop data produced by get_data() (-1
+        means until get_data() fails). It takes advantage of the pipeline
+        depth if set (cf. prefetch()). Data prefetched but not consumed are
+        provided first by the next call to get_data() with the same
+        @action_list, so that stateful disruptors do not skip any test case.
+        '''
+        cpt = [0]
+        def produce():
+            cpt[0] += 1
+            data = self.get_data(action_list, valid_gen=valid_gen, save_seed=save_seed)
+            return data, data is None or cpt[0] == max_loop
+
+        data_iter = self.prefetch(produce,
+                                  leftover_func=lambda d: self._push_prefetched_data(action_list,
+                                                                                     valid_gen, d))
+        try:
+            for data in data_iter:
+                if data is None:
+                    break
+                yield data
+        finally:
+            data_iter.close()
+
     # Used to introduce some delay after sending data
     def __delay_fuzzing(self):
         '''
@@ -1723,13 +2365,15 @@ class FmkPlumbing(object):
 
         # When checking target readiness, feedback timeout is taken into account indirectly
         # through the call to Target.is_target_ready_for_new_data()
-        cont0 = self.check_target_readiness() >= 0
+        with self._wait_section():
+            cont0 = self.check_target_readiness() >= 0
 
         ack_date = self.tg.get_last_target_ack_date()
         self.lg.log_target_ack_date(ack_date)
 
         if cont0:
-            cont0 = self.__delay_fuzzing()
+            with self._wait_section():
+                cont0 = self.__delay_fuzzing()
         else:
             self.mon.do_on_error()
 
@@ -1982,6 +2626,14 @@ class FmkPlumbing(object):
                                                      epilogue=epilogue,
                                                      source=ref, status_code=err_code)
 
+            if tg_fbk.has_data_fbk():
+                for dt, ref, fbk, tstamp, status in tg_fbk.iter_and_cleanup_data_fbk():
+                    self.lg.log_target_feedback_from(fbk, tstamp, preamble=preamble,
+                                                     epilogue=epilogue, source=ref,
+                                                     status_code=status, data=dt)
+                    if status is not None and status < 0:
+                        err_detected = True
+
             self.lg.log_target_feedback_from(tg_fbk.get_bytes(),
                                              tg_fbk.get_timestamp(),
                                              status_code=err_code,
@@ -2052,7 +2704,7 @@ class FmkPlumbing(object):
 
     @EnforceOrder(accepted_states=['S2'])
     def fmkdb_fetch_data(self, start_id=1, end_id=-1):
-        for record in self.fmkDB.fetch_data(start_id=start_id, end_id=end_id):
+        for record in self.fmkDB.iter_data(start_id=start_id, end_id=end_id):
             data_id, content, dtype, dmk_name, dm_name = record
             data = Data(content)
             data.set_data_id(data_id)
@@ -2073,6 +2725,33 @@ class FmkPlumbing(object):
         self.fmkDB.disable()
         self.lg.log_fmk_info('Disable FmkDB', do_record=False)
 
+    @EnforceOrder(accepted_states=['S2'])
+    def set_fmkdb_compression(self, codec, level=None):
+        if not self.fmkDB.set_compression(codec, level=level):
+            self.set_error('The compression codec {!s} is not available!'.format(codec),
+                           code=Error.CommandError)
+            return False
+        if codec is not None and self.dm is not None:
+            self._fmkDB_train_dictionary(self.dm)
+        self.lg.log_fmk_info('FmkDB payload compression: {!s}'.format(codec), do_record=False)
+        return True
+
+    @EnforceOrder(accepted_states=['S2'])
+    def set_fmkdb_rotation(self, max_size=None, max_data=None, max_age=None):
+        self.fmkDB.set_shard_rotation(max_size=max_size, max_data=max_data, max_age=max_age)
+        self.lg.log_fmk_info('FmkDB shard rotation: max size={!s}, max data={!s}, '
+                             'max age={!s}'.format(max_size, max_data, max_age),
+                             do_record=False)
+
+    @EnforceOrder(accepted_states=['S2'])
+    def rotate_fmkdb(self):
+        if not self.fmkDB.rotate_shard():
+            self.set_error('FmkDB shard rotation has not been performed!',
+                           code=Error.CommandError)
+            return False
+        self.lg.log_fmk_info('FmkDB shard rotated', do_record=False)
+        return True
+
     @EnforceOrder(accepted_states=['S2'])
     def get_last_data(self):
         if not self._wkspace_enabled:
@@ -2296,74 +2975,29 @@ class FmkPlumbing(object):
 
         fmk_feedback = FmkFeedback()
 
-        exit_operator = False
-        while not exit_operator:
+        def produce():
+            operation, data_list = self._plan_next_operation(operator, fmk_feedback,
+                                                             use_existing_seed)
+            last = operation is None or operation.is_flag_set(Operation.Stop)
+            return (operation, data_list), last
 
-            try:
-                operation = operator.plan_next_operation(self._exportable_fmk_ops, self.dm,
-                                                         self.mon, self.tg, self.lg, fmk_feedback)
-            except:
-                self._handle_user_code_exception('Operator has crashed during its plan_next_operation() method')
-                return False
+        # The next operations can only be planned in advance if they do
+        # not depend on the feedback of the current one
+        op_iter = self.prefetch(produce, depth=None if operator.prefetchable else 0)
 
-            if operation is None:
-                self.set_error("An operator shall always return an Operation() object in its plan_next_operation()",
-                               code=Error.UserCodeError)
-                return False
-
-            if operation.is_flag_set(Operation.CleanupDMakers):
-                self.cleanup_all_dmakers(reset_existing_seed=False)
-
-            if operation.is_flag_set(Operation.Stop):
-                self.log_target_feedback()
-                break
-            else:
-                retry = False
-                data_list = []
-                change_list = []
-
-                instr_list = operation.get_instructions()
-                for instruction, idx in zip(instr_list, range(len(instr_list))):
-                    action_list, orig = instruction
-                    
-                    if action_list is None:
-                        data = orig
-                    else:
-                        data = self.get_data(action_list, data_orig=orig,
-                                             save_seed=use_existing_seed)
-
-                    data_list.append(data)
+        try:
+            for operation, data_list in op_iter:
 
-                    if self.is_not_ok():
-                        if fmk_feedback.is_flag_set(FmkFeedback.NeedChange):
-                            self.set_error('Operator has not made a choice that allows to produce usable data',
-                                           code=Error.WrongOpPlan)
-                            return False
-                        else:
-                            err_list = self.get_error()
-                            for e in err_list:
-                                self.lg.log_fmk_info(e.msg)
-                                if e.code in [Error.DataUnusable, Error.HandOver]:
-                                    if e.code == Error.DataUnusable:
-                                        change_list.append((e.context, idx))
-                                    retry = True
-                                else:
-                                    self.set_error('Unrecoverable error in get_data() method!',
-                                                   code=Error.UnrecoverableError)
-                                    return False
-
-                if retry:
-                    fmk_feedback.set_flag(FmkFeedback.NeedChange, context=change_list)
-                    continue
+                if operation is None:
+                    return False
 
-                fmk_feedback.clear_produced_data()
-                for d in data_list:
-                    fmk_feedback.add_produced_data(d)
+                if operation.is_flag_set(Operation.Stop):
+                    self.log_target_feedback()
+                    break
 
+                exit_operator = False
                 multiple_data = len(data_list) > 1
 
-                fmk_feedback.clear_flag(FmkFeedback.NeedChange)
-
                 try:
                     data_list = self._do_sending_and_logging_init(data_list)
                 except TargetFeedbackError:
@@ -2393,7 +3027,8 @@ class FmkPlumbing(object):
                 else:
                     self.log_data(data_list[0], verbose=verbose)
 
-                ret = self.check_target_readiness()
+                with self._wait_section():
+                    ret = self.check_target_readiness()
                 # Note: the condition (ret = -1) is supposed to be managed by the operator
                 if ret < -1:
                     exit_operator = True
@@ -2406,7 +3041,9 @@ class FmkPlumbing(object):
                 self.lg.log_target_ack_date(ack_date)
 
                 # Delay introduced after logging data
-                if not self.__delay_fuzzing():
+                with self._wait_section():
+                    go_on = self.__delay_fuzzing()
+                if not go_on:
                     exit_operator = True
                     self.lg.log_fmk_info("Operator will shutdown because waiting has been cancelled by the user")
 
@@ -2442,6 +3079,12 @@ class FmkPlumbing(object):
 
                 if self._burst_countdown == self._burst:
                     self.tg.cleanup()
+
+                if exit_operator:
+                    break
+        finally:
+            op_iter.close()
+
         try:
             operator.stop(self._exportable_fmk_ops, self.dm, self.mon, self.tg, self.lg)
         except:
@@ -2452,6 +3095,79 @@ class FmkPlumbing(object):
 
         return True
 
+    def _plan_next_operation(self, operator, fmk_feedback, use_existing_seed):
+        '''
+        Get the next operation from @operator and produce its data.
+
+        Returns:
+          tuple: (operation, data_list). @operation is None if an error occurred,
+            and @data_list is None if the operator requested to stop.
+        '''
+        while True:
+            try:
+                operation = operator.plan_next_operation(self._exportable_fmk_ops, self.dm,
+                                                         self.mon, self.tg, self.lg, fmk_feedback)
+            except:
+                self._handle_user_code_exception('Operator has crashed during its plan_next_operation() method')
+                return None, None
+
+            if operation is None:
+                self.set_error("An operator shall always return an Operation() object in its plan_next_operation()",
+                               code=Error.UserCodeError)
+                return None, None
+
+            if operation.is_flag_set(Operation.CleanupDMakers):
+                self.cleanup_all_dmakers(reset_existing_seed=False)
+
+            if operation.is_flag_set(Operation.Stop):
+                return operation, None
+
+            retry = False
+            data_list = []
+            change_list = []
+
+            instr_list = operation.get_instructions()
+            for instruction, idx in zip(instr_list, range(len(instr_list))):
+                action_list, orig = instruction
+
+                if action_list is None:
+                    data = orig
+                else:
+                    data = self.get_data(action_list, data_orig=orig,
+                                         save_seed=use_existing_seed)
+
+                data_list.append(data)
+
+                if self.is_not_ok():
+                    if fmk_feedback.is_flag_set(FmkFeedback.NeedChange):
+                        self.set_error('Operator has not made a choice that allows to produce usable data',
+                                       code=Error.WrongOpPlan)
+                        return None, None
+                    else:
+                        err_list = self.get_error()
+                        for e in err_list:
+                            self.lg.log_fmk_info(e.msg)
+                            if e.code in [Error.DataUnusable, Error.HandOver]:
+                                if e.code == Error.DataUnusable:
+                                    change_list.append((e.context, idx))
+                                retry = True
+                            else:
+                                self.set_error('Unrecoverable error in get_data() method!',
+                                               code=Error.UnrecoverableError)
+                                return None, None
+
+            if retry:
+                fmk_feedback.set_flag(FmkFeedback.NeedChange, context=change_list)
+                continue
+
+            fmk_feedback.clear_produced_data()
+            for d in data_list:
+                fmk_feedback.add_produced_data(d)
+
+            fmk_feedback.clear_flag(FmkFeedback.NeedChange)
+
+            return operation, data_list
+
     @EnforceOrder(accepted_states=['S2'])
     def get_data(self, action_list, data_orig=None, valid_gen=False, save_seed=False):
         '''
@@ -2464,6 +3180,11 @@ class FmkPlumbing(object):
         where action_N can be either: dmaker_type_N or (dmaker_type_N, dmaker_name_N)
         '''
 
+        if data_orig is None and self.__prefetched_data:
+            data = self._pop_prefetched_data(action_list, valid_gen)
+            if data is not None:
+                return data
+
         l = []
         action_list = action_list[:]
 
@@ -2799,9 +3520,92 @@ class FmkPlumbing(object):
         else:
             return data
 
+    def _get_disruptor_candidates(self, action):
+        if isinstance(action, (tuple, list)):
+            dmaker_type, dmaker_name = action[0], action[1]
+        else:
+            dmaker_type, dmaker_name = action, None
+
+        for tactics in (self._tactics, self._generic_tactics):
+            dmakers = tactics.get_disruptors()
+            if dmaker_type not in dmakers:
+                parsed = self.check_clone_re.match(dmaker_type)
+                if parsed is None or parsed.group(1) not in dmakers:
+                    continue
+                dmaker_type = parsed.group(1)
+            if dmaker_name is None:
+                return [v['obj'] for v in tactics.get_disruptors_list(dmaker_type).values()]
+            else:
+                obj = tactics.get_disruptor_obj(dmaker_type, dmaker_name)
+                if obj is not None:
+                    return [obj]
+
+        return []
+
+    @EnforceOrder(accepted_states=['S2'])
+    def get_generation_pool(self, action_list, valid_gen=False, save_seed=True,
+                            nb_workers=None, chunk_size=None, seed=None):
+        '''
+        Return a GenerationPool running the pipeline described by @action_list
+        (cf. get_data()) within @nb_workers processes, or None if the pipeline
+        cannot be parallelized (more than one stateful disruptor, or a
+        stateful disruptor that does not rely on the ModelWalker).
+        '''
+        if not hasattr(multiprocessing, 'get_context'):
+            self.set_error('Generation workers are not supported with python 2',
+                           code=Error.FmkWarning)
+            return None
+
+        stateful_idx = []
+        partitionable = True
+        for idx, full_action in enumerate(action_list[1:], start=1):
+            action = full_action[0] if isinstance(full_action, (tuple, list)) else full_action
+            objs = self._get_disruptor_candidates(action)
+            if any([isinstance(o, StatefulDisruptor) for o in objs]):
+                stateful_idx.append(idx)
+                for o in objs:
+                    if not isinstance(o, StatefulDisruptor) or o._gen_args_desc != GENERIC_ARGS:
+                        partitionable = False
+
+        if len(stateful_idx) > 1 or not partitionable:
+            self.set_error('The data makers sequence cannot be split among generation workers',
+                           code=Error.FmkWarning)
+            return None
+
+        return GenerationPool(self, action_list,
+                              nb_workers=self._gen_workers if nb_workers is None else nb_workers,
+                              chunk_size=self._gen_chunk_size if chunk_size is None else chunk_size,
+                              seed=seed, valid_gen=valid_gen, save_seed=save_seed,
+                              partitioned=bool(stateful_idx))
+
+    def _get_data_model_names(self):
+        prefix, arg = self.__dm_rld_args_dict[self.dm]
+        if prefix is None:
+            # data models loaded through load_multiple_data_model()
+            return [dm.name for dm in arg]
+        return self.dm.name
+
+    def _launch_generation_worker(self, prj_name, dm_name):
+        '''
+        Launch the project @prj_name with the data model(s) @dm_name, only to
+        produce data within a GenerationPool worker: the EmptyTarget is used,
+        and nothing is recorded, neither in the log files nor in the FmkDB.
+        '''
+        prj = self.get_project_by_name(prj_name)
+        if prj is None:
+            self.set_error("Project '{:s}' has not been found!".format(prj_name),
+                           code=Error.CommandError)
+            return False
+
+        self.fmkDB.disable()
+        self.__logger_dict[prj]._enable_file_logging = False
+        return self.run_project(prj=prj, tg=0, dm_name=dm_name)
+
     @EnforceOrder(accepted_states=['S1','S2'])
     def cleanup_all_dmakers(self, reset_existing_seed=True):
 
+        self.__prefetched_data = {}
+
         for dmaker_obj in self.__initialized_dmakers:
             if self.__initialized_dmakers[dmaker_obj][0]:
                 try:
@@ -2817,7 +3621,10 @@ class FmkPlumbing(object):
 
     @EnforceOrder(accepted_states=['S1','S2'])
     def cleanup_dmaker(self, dmaker_type=None, name=None, dmaker_obj=None, reset_existing_seed=True, error_on_init=True):
-        
+
+        # prefetched data are no more consistent with the data makers states
+        self.__prefetched_data = {}
+
         if dmaker_obj is not None:
             if reset_existing_seed and isinstance(dmaker_obj, Generator):
                 dmaker_obj.produced_seed = None
@@ -3951,17 +4758,45 @@ class FmkShell(cmd.Cmd):
             self.__error_msg = "Syntax Error!"
             return False
 
-        # for i in range(nb):
+        if self.fz._gen_workers > 1:
+            pool = self.fz.get_generation_pool(t, valid_gen=valid_gen, save_seed=use_existing_seed)
+        else:
+            pool = None
+
+        if pool is not None:
+            try:
+                cpt = 0
+                for data in pool:
+                    cpt += 1
+                    cont = self.fz.send_data_and_log(data)
+                    if not cont or cpt == max_loop:
+                        break
+                else:
+                    # the walk is over or a worker has failed (the errors
+                    # are registered by the pool)
+                    return False
+            finally:
+                pool.stop()
+
+            self.__error = False
+            return False
+
         cpt = 0
-        while cpt < max_loop or max_loop == -1:
-            cpt += 1
-            data = self.fz.get_data(t, valid_gen=valid_gen, save_seed=use_existing_seed)
-            if data is None:
-                return False
-            cont = self.fz.send_data_and_log(data)
-            if not cont:
-                break
- 
+        data_iter = self.fz.iter_data(t, max_loop=max_loop, valid_gen=valid_gen,
+                                      save_seed=use_existing_seed)
+        try:
+            for data in data_iter:
+                cpt += 1
+                cont = self.fz.send_data_and_log(data)
+                if not cont:
+                    break
+            else:
+                if cpt < max_loop or max_loop == -1:
+                    # get_data() has failed
+                    return False
+        finally:
+            data_iter.close()
+
         self.__error = False
         return False
 
@@ -4074,47 +4909,78 @@ class FmkShell(cmd.Cmd):
 
             actions_list.append(actions)
 
-        prev_data_list = None
-        exhausted_data_cpt = 0
+        state = {'prev_data_list': None, 'exhausted_data_cpt': 0, 'error_msg': None}
         exhausted_data = {}
         nb_data = len(actions_list)
-
-        for i in range(loop_count):
+        cpt = [0]
+
+        def produce():
+            # Returns the data to send and, for each of them, if it has been
+            # freshly generated (so that unsent ones can be given back)
+            cpt[0] += 1
+            last = cpt[0] >= loop_count
+            prev_data_list = state['prev_data_list']
             data_list = []
+            fresh_list = []
 
             for j in range(nb_data):
                 if j not in exhausted_data:
                     exhausted_data[j] = False
 
+                fresh = False
                 if not exhausted_data[j]:
                     data = self.fz.get_data(actions_list[j])
+                    fresh = data is not None
                 else:
                     if prev_data_list is not None:
                         data = prev_data_list[j]
                     else:
-                        self.__error_msg = 'The loop has terminated too soon! (number of exhausted data: %d)' % exhausted_data_cpt
-                        return False
+                        state['error_msg'] = 'The loop has terminated too soon! (number of exhausted data: %d)' \
+                            % state['exhausted_data_cpt']
+                        return None, True
 
-                if data is None and exhausted_data_cpt < nb_data:
-                    exhausted_data_cpt += 1
+                if data is None and state['exhausted_data_cpt'] < nb_data:
+                    state['exhausted_data_cpt'] += 1
                     if prev_data_list is not None:
                         data = prev_data_list[j]
                         exhausted_data[j] = True
                     else:
-                        self.__error_msg = 'The loop has terminated too soon! (number of exhausted data: %d)' % exhausted_data_cpt
-                        return False
+                        state['error_msg'] = 'The loop has terminated too soon! (number of exhausted data: %d)' \
+                            % state['exhausted_data_cpt']
+                        return None, True
+
+                    if exhausted_data[j] and state['exhausted_data_cpt'] >= nb_data:
+                        state['error_msg'] = 'The loop has terminated because all data are exhausted ' \
+                            '(number of exhausted data: %d)' % state['exhausted_data_cpt']
+                        return None, True
 
-                    if exhausted_data[j] and exhausted_data_cpt >= nb_data:
-                        self.__error_msg = 'The loop has terminated because all data are exhausted ' \
-                            '(number of exhausted data: %d)' % exhausted_data_cpt
-                        return False
-                
                 data_list.append(data)
+                fresh_list.append(fresh)
+
+            state['prev_data_list'] = data_list
 
-            prev_data_list = data_list
+            return (data_list, fresh_list), last
 
-            self.fz.send_data_and_log(data_list)
+        def give_back(item):
+            if item is None:
+                return
+            for j, (data, fresh) in enumerate(zip(*item)):
+                if fresh:
+                    self.fz._push_prefetched_data(actions_list[j], False, data)
 
+        if loop_count > 0:
+            data_iter = self.fz.prefetch(produce, leftover_func=give_back)
+            try:
+                for item in data_iter:
+                    if item is None:
+                        self.__error_msg = state['error_msg']
+                        return False
+                    data_list, _ = item
+                    self.fz.send_data_and_log(data_list)
+            finally:
+                data_iter.close()
+
+        exhausted_data_cpt = state['exhausted_data_cpt']
         if exhausted_data_cpt > 0:
             print("\nThe loop has terminated normally, but it remains non exhausted " \
                   "data (number of exhausted data: %d)" % exhausted_data_cpt)
@@ -4198,6 +5064,32 @@ class FmkShell(cmd.Cmd):
         return False
 
 
+    def do_set_generation_workers(self, line):
+        '''
+        Set the number of processes used by send_loop to generate data
+        (Default = 1, that is no generation worker).
+        |  syntax: set_generation_workers <nb> [chunk_size]
+        |  |_ chunk_size: number of data (or model walking steps for
+        |     stateful disruptors) handled at once by a worker
+        '''
+        self.__error = True
+
+        args = line.split()
+        args_len = len(args)
+
+        if args_len not in (1, 2):
+            return False
+        try:
+            val = int(args[0])
+            chunk_size = int(args[1]) if args_len == 2 else None
+            self.fz.set_generation_workers(val, chunk_size=chunk_size)
+        except:
+            return False
+
+        self.__error = False
+        return False
+
+
     def do_set_burst(self, line):
         '''
         Set the burst value. Used by the FMK to decide when delay
@@ -4224,6 +5116,32 @@ class FmkShell(cmd.Cmd):
         return False
 
 
+    def do_set_pipeline_depth(self, line):
+        '''
+        Set the number of data that can be generated in advance, while
+        the framework is waiting for the target (Default = 0).
+        |  syntax: set_pipeline_depth <arg>
+        |  |_ possible values for <arg>:
+        |      0  : data are generated just before being sent
+        |      N : up to N data are generated in advance
+        '''
+        self.__error = True
+
+        args = line.split()
+        args_len = len(args)
+
+        if args_len != 1:
+            return False
+        try:
+            val = int(args[0])
+            ok = self.fz.set_pipeline_depth(val)
+        except:
+            return False
+
+        self.__error = not ok
+        return False
+
+
     def do_show_db(self, line):
         '''Show the Data Bank'''
         self.fz.show_data_bank()
@@ -4506,6 +5424,64 @@ class FmkShell(cmd.Cmd):
         self.fz.disable_fmkdb()
         return False
 
+    def do_fmkdb_compression(self, line):
+        '''
+        Set the codec used to compress the payloads stored in FmkDB
+        |_ syntax: fmkdb_compression <zlib|zstd|none> [level]
+        '''
+        self.__error = True
+        self.__error_msg = "Syntax Error!"
+
+        args = line.split()
+        if len(args) not in (1, 2):
+            return False
+
+        codec = None if args[0].lower() == 'none' else args[0].lower()
+        try:
+            level = int(args[1]) if len(args) == 2 else None
+        except ValueError:
+            return False
+
+        self.__error = False
+        self.fz.set_fmkdb_compression(codec, level=level)
+        return False
+
+    def do_fmkdb_rotation(self, line):
+        '''
+        Set the conditions to move the DATA recorded in FmkDB to a new shard file
+        (a size in bytes, a number of data, or a duration in seconds), or rotate it now
+        |_ syntax: fmkdb_rotation <size|data|age> <value|none> [<size|data|age> <value|none> ...]
+        |_ syntax: fmkdb_rotation now
+        '''
+        self.__error = True
+        self.__error_msg = "Syntax Error!"
+
+        args = line.split()
+        if args == ['now']:
+            self.__error = False
+            self.fz.rotate_fmkdb()
+            return False
+
+        if not args or len(args) % 2 != 0:
+            return False
+
+        limits = {'size': self.fz.fmkDB.shard_max_size,
+                  'data': self.fz.fmkDB.shard_max_data,
+                  'age': self.fz.fmkDB.shard_max_age}
+        for key, value in zip(args[::2], args[1::2]):
+            if key not in limits:
+                return False
+            try:
+                limits[key] = None if value.lower() == 'none' else \
+                    (float(value) if key == 'age' else int(value))
+            except ValueError:
+                return False
+
+        self.__error = False
+        self.fz.set_fmkdb_rotation(max_size=limits['size'], max_data=limits['data'],
+                                   max_age=limits['age'])
+        return False
+
     def do_dump_db_to_file(self, line):
         '''
         Dump the Data Bank to a file in pickle format
@@ -24,6 +24,7 @@
 from __future__ import print_function
 
 import os
+import re
 import random
 import subprocess
 import fcntl
@@ -39,14 +40,22 @@ import collections
 import binascii
 
 import errno
+import heapq
+import traceback
+import functools
+import multiprocessing
 from socket import error as socket_error
+from six.moves import queue
 
 from uuid import getnode
 
 from libs.external_modules import *
-from framework.data_model import Data, NodeSemanticsCriteria
+from libs.utils import wait_for_fds
+from framework.data_model import Data, NodeSemanticsCriteria, AbsNoCsts, AbsorbStatus
 from framework.value_types import GSMPhoneNum
 from framework.global_resources import *
+from framework.fork_server import ForkServer
+from framework.data_delivery import DataDelivery
 
 class TargetStuck(Exception): pass
 
@@ -250,6 +259,7 @@ class TargetFeedback(object):
         self.cleanup()
         self._feedback_collector = collections.OrderedDict()
         self._feedback_collector_tstamped = collections.OrderedDict()
+        self._data_fbk = []
         self.set_bytes(bstring)
 
     def add_fbk_from(self, ref, fbk):
@@ -281,6 +291,32 @@ class TargetFeedback(object):
         for ref, fbk_list in fbk_collector.items():
             yield ref, fbk_list, fbk_collector_ts[ref]
 
+    def add_data_fbk(self, data, ref, fbk, status_code=None):
+        '''
+        Add feedback related to a specific data. Used by targets that process
+        several data concurrently, so that it can be recorded for the data that
+        triggered it, and not for the last one sent.
+
+        Args:
+          data (Data): the data which produced the feedback
+          ref (str): source of the feedback
+          fbk (bytes): the feedback
+          status_code (int): negative value if an error is detected
+        '''
+        now = datetime.datetime.now()
+        with self.fbk_lock:
+            self._data_fbk.append((data, ref, fbk, now, status_code))
+
+    def has_data_fbk(self):
+        return len(self._data_fbk) > 0
+
+    def iter_and_cleanup_data_fbk(self):
+        with self.fbk_lock:
+            data_fbk = self._data_fbk
+            self._data_fbk = []
+        for entry in data_fbk:
+            yield entry
+
     def set_error_code(self, err_code):
         self._err_code = err_code
 
@@ -313,6 +349,454 @@ class EmptyTarget(Target):
         pass
 
 
+class _TargetLoggerProxy(object):
+    '''
+    Logger provided to the targets aggregated by :class:`MultiTarget`. The
+    feedback they register through the Logger feedback-collector
+    infrastructure is tagged with the name of the target.
+    '''
+
+    def __init__(self, logger, multi_target, name):
+        self._logger = logger
+        self._multi_target = multi_target
+        self._name = name
+
+    def collect_target_feedback(self, fbk, status_code=None):
+        self._multi_target._add_target_fbk(self._name, 'Collector', fbk, status_code)
+
+    def __getattr__(self, name):
+        return getattr(self._logger, name)
+
+
+class MultiTarget(Target):
+    '''
+    Target aggregating several targets. Each data is sent to all of them
+    concurrently (one worker thread per target), and the feedback of each one
+    is recorded for this data under a distinct source, prefixed with the name
+    of the target. Useful to test several implementations with the same test
+    cases (differential testing) without generating them again.
+    '''
+
+    def __init__(self, targets, names=None):
+        '''
+        Args:
+          targets (list): the :class:`Target` to aggregate
+          names (list): names of the targets used as feedback sources. By
+            default, the class name of each target followed by its index.
+        '''
+        self.targets = list(targets)
+        if names is None:
+            names = ['{:s}#{:d}'.format(tg.__class__.__name__, idx)
+                     for idx, tg in enumerate(self.targets)]
+        if len(names) != len(self.targets):
+            raise ValueError('one name per target is expected')
+        self.names = list(names)
+        self._feedback = TargetFeedback()
+        self._last_data = None
+        self._workers = []
+
+    def set_logger(self, logger):
+        self._logger = logger
+        for tg, name in zip(self.targets, self.names):
+            tg.set_logger(_TargetLoggerProxy(logger, self, name))
+
+    def set_data_model(self, dm):
+        self.current_dm = dm
+        for tg in self.targets:
+            tg.set_data_model(dm)
+
+    def _set_feedback_timeout_specific(self, fbk_timeout):
+        for tg in self.targets:
+            tg.set_feedback_timeout(fbk_timeout)
+
+    def start(self):
+        started = []
+        for tg in self.targets:
+            if not tg.start():
+                for s_tg in started:
+                    s_tg.stop()
+                return False
+            started.append(tg)
+
+        for name in self.names:
+            jobs = queue.Queue()
+            th = threading.Thread(None, self._run_worker, name='MultiTarget[{:s}]'.format(name),
+                                  args=(jobs,))
+            th.daemon = True
+            th.start()
+            self._workers.append((th, jobs))
+
+        return True
+
+    def stop(self):
+        for _, jobs in self._workers:
+            jobs.put(None)
+        for th, _ in self._workers:
+            th.join()
+        self._workers = []
+
+        ret = True
+        for tg in self.targets:
+            ret = tg.stop() and ret
+        return ret
+
+    @staticmethod
+    def _run_worker(jobs):
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            func, args, results, idx, done = job
+            try:
+                results[idx] = func(*args)
+            except Exception as e:
+                results[idx] = e
+            finally:
+                done.set()
+
+    def _call_all(self, method, *args):
+        # call the method of all the targets concurrently, and raise the first
+        # exception once all of them have completed
+        results = [None] * len(self.targets)
+        events = []
+        for idx, (tg, (_, jobs)) in enumerate(zip(self.targets, self._workers)):
+            done = threading.Event()
+            jobs.put((getattr(tg, method), args, results, idx, done))
+            events.append(done)
+        for done in events:
+            done.wait()
+        for r in results:
+            if isinstance(r, Exception):
+                raise r
+        return results
+
+    def send_data(self, data, from_fmk=False):
+        self._last_data = data
+        self._call_all('send_data', data, from_fmk)
+
+    def send_multiple_data(self, data_list, from_fmk=False):
+        # feedback is recorded for the last data, as for the other targets
+        self._last_data = data_list[-1]
+        self._call_all('send_multiple_data', data_list, from_fmk)
+
+    def is_target_ready_for_new_data(self):
+        return all([tg.is_target_ready_for_new_data() for tg in self.targets])
+
+    def get_last_target_ack_date(self):
+        dates = [d for d in [tg.get_last_target_ack_date() for tg in self.targets] if d is not None]
+        return max(dates) if dates else None
+
+    def cleanup(self):
+        for tg in self.targets:
+            tg.cleanup()
+
+    def collect_feedback_without_sending(self):
+        return all([tg.collect_feedback_without_sending() for tg in self.targets])
+
+    def recover_target(self):
+        recovered = True
+        implemented = False
+        for tg in self.targets:
+            try:
+                recovered = tg.recover_target() and recovered
+            except NotImplementedError:
+                pass
+            else:
+                implemented = True
+        if not implemented:
+            raise NotImplementedError
+        return recovered
+
+    def _add_target_fbk(self, name, ref, fbk, status_code):
+        source = name if ref is None else '{:s}::{!s}'.format(name, ref)
+        self._feedback.add_data_fbk(self._last_data, source, fbk, status_code=status_code)
+
+    def get_feedback(self):
+        # targets may wait for their feedback, thus they are queried concurrently
+        for name, fbk in zip(self.names, self._call_all('get_feedback')):
+            if fbk is None:
+                continue
+            err_code = fbk.get_error_code()
+            for ref, fbk_list, _ in fbk.iter_and_cleanup_collector():
+                for f in fbk_list:
+                    self._add_target_fbk(name, ref, f, err_code)
+            for data, ref, f, _, status in fbk.iter_and_cleanup_data_fbk():
+                self._feedback.add_data_fbk(data, '{:s}::{!s}'.format(name, ref), f,
+                                            status_code=status)
+            bstring = fbk.get_bytes()
+            if bstring or (err_code is not None and err_code < 0):
+                self._add_target_fbk(name, None, bstring, err_code)
+            fbk.cleanup()
+
+        return self._feedback
+
+
+class SocketReactor(object):
+    '''
+    Long-lived thread that multiplexes a set of sockets with epoll, and
+    calls their handlers when they are ready. Handlers and timers are
+    always called from the reactor thread, which is also the only one
+    allowed to (un)register sockets. Other threads shall go through
+    :meth:`call_soon` to interact with it.
+    '''
+
+    def __init__(self, name='Reactor'):
+        self.name = name
+        self._thread = None
+        self._epobj = None
+        self._handlers = {}  # fileno -> (socket, handler)
+        self._filenos = {}  # socket -> fileno
+        self._timers = []
+        self._timer_cpt = 0
+        self._calls = collections.deque()
+        self._wakeup_fds = None
+        self._stop = False
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._epobj = select.epoll()
+        self._wakeup_fds = os.pipe()
+        for fd in self._wakeup_fds:
+            fl = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, fl | os.O_NONBLOCK)
+        self._epobj.register(self._wakeup_fds[0], select.EPOLLIN)
+        self._stop = False
+        self._thread = threading.Thread(None, self._run, name=self.name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self.call_soon(self._set_stop)
+        if not self.in_reactor():
+            self._thread.join()
+        self._thread = None
+
+    def _set_stop(self):
+        self._stop = True
+
+    def in_reactor(self):
+        return threading.current_thread() is self._thread
+
+    def call_soon(self, func, *args):
+        '''
+        Call `func(*args)` from the reactor thread (thread-safe).
+        '''
+        self._calls.append((func, args))
+        try:
+            os.write(self._wakeup_fds[1], b'x')
+        except (OSError, IOError) as e:
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def call_later(self, delay, func, *args):
+        '''
+        Call `func(*args)` from the reactor thread after `delay` seconds.
+        Shall be called from the reactor thread.
+
+        Returns:
+          list: handle to provide to :meth:`cancel_timer`
+        '''
+        handle = [False]
+        self._timer_cpt += 1
+        heapq.heappush(self._timers, (time.time() + delay, self._timer_cpt, handle, func, args))
+        return handle
+
+    @staticmethod
+    def cancel_timer(handle):
+        if handle is not None:
+            handle[0] = True
+
+    def register(self, skt, handler):
+        '''
+        Call `handler(skt, events)` each time `skt` is ready. `skt` is a socket,
+        a file object or a file descriptor. If `skt` is already registered,
+        `handler` replaces its current handler. Shall be called from the
+        reactor thread.
+
+        Returns:
+          bool: False if `skt` cannot be registered (e.g., closed socket)
+        '''
+        if skt in self._filenos:
+            fileno = self._filenos[skt]
+            self._handlers[fileno] = (skt, handler)
+            return True
+        try:
+            fileno = skt if isinstance(skt, int) else skt.fileno()
+            self._epobj.register(fileno, select.EPOLLIN)
+        except (ValueError, IOError, OSError) as e:
+            print('\n*** ERROR(while registering socket): ' + str(e))
+            return False
+        self._filenos[skt] = fileno
+        self._handlers[fileno] = (skt, handler)
+        return True
+
+    def unregister(self, skt):
+        '''
+        Shall be called from the reactor thread.
+        '''
+        fileno = self._filenos.pop(skt, None)
+        if fileno is None:
+            return
+        del self._handlers[fileno]
+        try:
+            self._epobj.unregister(fileno)
+        except (ValueError, IOError, OSError):
+            # the socket may have been closed in the meantime
+            pass
+
+    def get_handler(self, skt):
+        fileno = self._filenos.get(skt)
+        return None if fileno is None else self._handlers[fileno][1]
+
+    def _run(self):
+        while not self._stop:
+            if self._timers:
+                timeout = max(self._timers[0][0] - time.time(), 0)
+            else:
+                timeout = -1
+            try:
+                events = self._epobj.poll(timeout)
+            except (IOError, OSError) as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+
+            for fd, ev in events:
+                if fd == self._wakeup_fds[0]:
+                    try:
+                        while os.read(fd, 512):
+                            pass
+                    except (OSError, IOError):
+                        pass
+                    continue
+                entry = self._handlers.get(fd)
+                if entry is not None:
+                    skt, handler = entry
+                    self._call(handler, skt, ev)
+
+            while self._calls:
+                func, args = self._calls.popleft()
+                self._call(func, *args)
+
+            now = time.time()
+            while self._timers and self._timers[0][0] <= now:
+                _, _, handle, func, args = heapq.heappop(self._timers)
+                if not handle[0]:
+                    self._call(func, *args)
+
+        # cleanup
+        for skt in list(self._filenos.keys()):
+            self.unregister(skt)
+        self._timers = []
+        self._calls.clear()
+        self._epobj.close()
+        os.close(self._wakeup_fds[0])
+        os.close(self._wakeup_fds[1])
+
+    def _call(self, func, *args):
+        # The reactor shall survive faulty handlers
+        try:
+            func(*args)
+        except Exception:
+            print('\n*** ERROR(in {:s} thread):'.format(self.name))
+            traceback.print_exc()
+
+
+class FeedbackCompletion(object):
+    '''
+    Policy used by :class:`NetworkTarget` to decide when the feedback received
+    through an interface is complete, so that it does not have to wait for the
+    feedback timeout. The feedback is complete as soon as one of the provided
+    conditions is met.
+    '''
+
+    def __init__(self, idle_gap=None, delimiter=None, regexp=None,
+                 header=None, length_path=None, length_offset=0):
+        '''
+        Args:
+          idle_gap (float): time duration (in seconds) without receiving anything
+            after a chunk of feedback
+          delimiter (bytes): bytes terminating the feedback
+          regexp (bytes): regular expression matching a complete feedback
+          header (Node): node describing the header of the feedback, that contains its length.
+            It is absorbed (on a copy) from the beginning of the feedback.
+          length_path (str): regexp of the path of the `header` subnode that contains the
+            length of what follows the header
+          length_offset (int): value to add to the length, for instance the
+            negated header size if the length includes it
+        '''
+        assert (header is None) == (length_path is None)
+        self.idle_gap = idle_gap
+        self.delimiter = delimiter
+        self._regexp = None if regexp is None else re.compile(regexp)
+        self._header = header
+        self._length_path = length_path
+        self._length_offset = length_offset
+
+    def is_complete(self, fbk):
+        '''
+        Args:
+          fbk (bytes): feedback received so far
+
+        Returns:
+          bool: True if the feedback is complete
+        '''
+        if self.delimiter is not None and fbk.endswith(self.delimiter):
+            return True
+        if self._regexp is not None and self._regexp.search(fbk):
+            return True
+        if self._header is not None:
+            expected_sz = self._get_expected_size(fbk)
+            if expected_sz is not None and len(fbk) >= expected_sz:
+                return True
+        return False
+
+    def _get_expected_size(self, fbk):
+        header = self._header.get_clone()
+        st, off, sz, name = header.absorb(fbk, constraints=AbsNoCsts(size=True, struct=True))
+        if st not in (AbsorbStatus.Absorbed, AbsorbStatus.FullyAbsorbed):
+            # the header is not entirely received yet
+            return None
+        length_node = header.get_node_by_path(path_regexp=self._length_path)
+        if length_node is None:
+            return None
+        return off + sz + length_node.get_raw_value() + self._length_offset
+
+
+class _FeedbackCollector(object):
+    '''
+    State of the feedback collection that follows a data emission
+    '''
+
+    def __init__(self, send_id, sockets, ids, lengths, timeout, from_fmk, pre_fbk=None):
+        self.send_id = send_id
+        self.sockets = sockets
+        self.ids = ids
+        self.lengths = lengths
+        self.timeout = timeout
+        self.from_fmk = from_fmk
+        self.t0 = datetime.datetime.now()
+        self.first_pass = True
+        self.socket_errors = []
+        self.handler = None
+        self.timer = None
+        self.idle_timers = {}
+        self.done = False
+
+        self.chunks = collections.OrderedDict()
+        self.bytes_recd = {}
+        self.received = {}
+        for s in sockets:
+            self.bytes_recd[s] = 0
+            self.received[s] = b''
+            self.chunks[s] = []
+            if pre_fbk is not None and pre_fbk.get(s) is not None:
+                self.chunks[s].append(pre_fbk[s])
+
+
 class NetworkTarget(Target):
     '''Generic target class for interacting with a network resource. Can
     be used directly, but some methods may require to be overloaded to
@@ -321,11 +805,14 @@ class NetworkTarget(Target):
 
     UNKNOWN_SEMANTIC = 42
     CHUNK_SZ = 2048
+    # maximum duration (in seconds) a send can wait for the target to consume
+    # the socket buffer
+    SEND_STALL_TIMEOUT = 2
     _INTERNALS_ID = 'NetworkTarget()'
 
     def __init__(self, host='localhost', port=12345, socket_type=(socket.AF_INET, socket.SOCK_STREAM),
                  data_semantics=UNKNOWN_SEMANTIC, server_mode=False, hold_connection=False,
-                 mac_src=None, mac_dst=None):
+                 mac_src=None, mac_dst=None, pool_connections=False):
         '''
         Args:
           host (str): the IP address of the target to connect to, or
@@ -347,6 +834,11 @@ class NetworkTarget(Target):
           hold_connection (bool): If `True`, we will maintain the connection while
             sending data to the real target. Otherwise, after each data emission,
             we close the related socket.
+          pool_connections (bool): Only for SOCK_STREAM interfaces in client mode and
+            without `hold_connection`. If `True`, after each data emission the
+            connection is kept in a pool and reused for the next emissions, as long as
+            the target did not close it and it has not been idle for more than
+            `pool_max_idle_time` seconds.
         '''
 
         if not self._is_valid_socket_type(socket_type):
@@ -376,6 +868,8 @@ class NetworkTarget(Target):
         self.set_timeout(fbk_timeout=6, sending_delay=4)
 
         self.feedback_length = None  # if specified, timeout will be ignored
+        self._fbk_completion = {}  # feedback id -> FeedbackCompletion
+        self._fbk_completion_stats = {}
 
         self._default_fbk_socket_id = 'Default Feedback Socket'
         self._default_fbk_id = {}
@@ -388,6 +882,14 @@ class NetworkTarget(Target):
         self.server_mode[(host,port)] = server_mode
         self.hold_connection = {}
         self.hold_connection[(host, port)] = hold_connection
+        self.pool_connections = {}
+        self.pool_connections[(host, port)] = pool_connections
+
+        # cf. _checkout_connection()
+        self.pool_max_idle_time = 30
+        self.pool_max_size = 4
+        self._conn_pool = {}
+        self._conn_pool_lock = threading.Lock()
 
         self.stop_event = threading.Event()
         self._server_thread_lock = threading.Lock()
@@ -406,7 +908,7 @@ class NetworkTarget(Target):
         return True
 
     def register_new_interface(self, host, port, socket_type, data_semantics, server_mode=False,
-                               hold_connection=False):
+                               hold_connection=False, pool_connections=False):
 
         if not self._is_valid_socket_type(socket_type):
             raise ValueError("Unrecognized socket type")
@@ -419,6 +921,7 @@ class NetworkTarget(Target):
         self.server_mode[(host,port)] = server_mode
         self._default_fbk_id[(host, port)] = self._default_fbk_socket_id + ' - {:s}:{:d}'.format(host, port)
         self.hold_connection[(host, port)] = hold_connection
+        self.pool_connections[(host, port)] = pool_connections
 
     def set_timeout(self, fbk_timeout, sending_delay):
         '''
@@ -446,6 +949,39 @@ class NetworkTarget(Target):
         if self._sending_delay > self._feedback_timeout:
             self._sending_delay = max(self._feedback_timeout-0.2, 0)
 
+    def set_feedback_completion(self, completion, host=None, port=None, fbk_id=None):
+        '''
+        Stop collecting the feedback of an interface as soon as it is complete
+        according to `completion`. The interface is the one specified by
+        `host` and `port`, or the additional feedback interface `fbk_id`. If none
+        of them are provided, the default interface is used.
+
+        Args:
+          completion (FeedbackCompletion): completion policy (`None` to remove it)
+        '''
+        if fbk_id is None:
+            host = self.host if host is None else host
+            port = self.port if port is None else port
+            fbk_id = self._default_fbk_id[(host, port)]
+        if completion is None:
+            self._fbk_completion.pop(fbk_id, None)
+        else:
+            self._fbk_completion[fbk_id] = completion
+
+    def get_feedback_completion_stats(self):
+        '''
+        Returns:
+          dict: for each feedback id, a dict with the number of collections
+          'completed' before the feedback timeout, their 'avg_time' (in seconds),
+          and the number of collections that 'timed_out'.
+        '''
+        stats = {}
+        for fbk_id, (completed, total_time, timed_out) in self._fbk_completion_stats.items():
+            stats[fbk_id] = {'completed': completed,
+                             'avg_time': total_time / completed if completed else None,
+                             'timed_out': timed_out}
+        return stats
+
     def initialize(self):
         '''
         To be overloaded if some intial setup for the target is necessary. 
@@ -637,26 +1173,39 @@ class NetworkTarget(Target):
         self._hclient_sock2hp = {}  # only for hold_connection
         self._hclient_hp2sock = {}  # only for hold_connection
 
+        # Used by _connect_to_target()
+        self._pooled_sock2hp = {}  # only for pool_connections
+        self._conn_pool = {}
+
         self._additional_fbk_sockets = []
         self._additional_fbk_ids = {}
         self._additional_fbk_lengths = {}
         self._dynamic_interfaces = {}
         self._feedback_handled = None
-        self.feedback_thread_qty = 0
+        self._fbk_completion_stats = {}
+        self.feedback_collector_qty = 0
         self.feedback_complete_cpt = 0
         self._sending_id = 0
         self._initial_sending_id = -1
         self._first_send_data_call = True
-        self._thread_cpt = 0
         self._last_ack_date = None  # Note that `self._last_ack_date`
                                     # could be updated many times if
                                     # self.send_multiple_data() is
                                     # used.
+        # Owns all the sockets we wait on (feedback, servers)
+        self._reactor = SocketReactor(name='NET-Reactor')
+        self._reactor.start()
         self._connect_to_additional_feedback_sockets()
         return self.initialize()
 
     def stop(self):
         self.stop_event.set()
+        self._reactor.stop()
+
+        for fbk_id, st in self.get_feedback_completion_stats().items():
+            avg_time = '-' if st['avg_time'] is None else '{:.3f}s'.format(st['avg_time'])
+            self.record_info("Feedback completion of '{:s}': {:d} completed (avg time: {:s}), "
+                             "{:d} timed out".format(fbk_id, st['completed'], avg_time, st['timed_out']))
         for s in self._server_sock2hp.keys():
             s.close()
         for s in self._last_client_sock2hp.keys():
@@ -665,6 +1214,11 @@ class NetworkTarget(Target):
             s.close()
         for s in self._additional_fbk_sockets:
             s.close()
+        with self._conn_pool_lock:
+            for s in self._pooled_sock2hp.keys():
+                s.close()
+            self._pooled_sock2hp = None
+            self._conn_pool = {}
 
         self._server_sock2hp = None
         self._server_thread_share = None
@@ -711,7 +1265,14 @@ class NetworkTarget(Target):
                 # self._feedback.add_fbk_from(self._default_fbk_id[(host, port)], err_msg)
                 self._feedback.add_fbk_from(self._INTERNALS_ID, err_msg)
             else:
-                self._send_data([s], {s:(data, host, port, None)}, self._sending_id, from_fmk)
+                try:
+                    self._send_data([s], {s:(data, host, port, None)}, self._sending_id, from_fmk)
+                except TargetStuck:
+                    # A pooled connection may have been broken by the target in the meantime
+                    s = self._reconnect_to_target(s, host, port, socket_type)
+                    if s is None:
+                        raise
+                    self._send_data([s], {s:(data, host, port, None)}, self._sending_id, from_fmk)
 
 
     def send_multiple_data(self, data_list, from_fmk=False):
@@ -798,6 +1359,12 @@ class NetworkTarget(Target):
         if self.hold_connection[(host, port)] and (host, port) in self._hclient_hp2sock.keys():
             return self._hclient_hp2sock[(host, port)]
 
+        pooled = self._is_pooled_interface(host, port, socket_type)
+        if pooled:
+            s = self._checkout_connection(host, port)
+            if s is not None:
+                return s
+
         skt_sz = len(socket_type)
         if skt_sz == 2:
             family, sock_type = socket_type
@@ -828,16 +1395,82 @@ class NetworkTarget(Target):
         if self.hold_connection[(host, port)]:
             self._hclient_sock2hp[s] = (host, port)
             self._hclient_hp2sock[(host, port)] = s
+        elif pooled:
+            with self._conn_pool_lock:
+                self._pooled_sock2hp[s] = (host, port)
 
         return s
 
+    def _is_pooled_interface(self, host, port, socket_type):
+        return self.pool_connections.get((host, port), False) and socket_type[1] == socket.SOCK_STREAM \
+               and not self.hold_connection[(host, port)] and not self.server_mode[(host, port)]
+
+    @staticmethod
+    def _is_connection_alive(skt):
+        try:
+            data = skt.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+        except socket.error as serr:
+            # nothing to read: the connection is still open
+            return serr.errno in (errno.EAGAIN, errno.EWOULDBLOCK)
+        # Either the target has closed the connection (b''), or it has sent
+        # data after the end of the previous feedback collection, that would
+        # be wrongly attributed to the next data.
+        return False
+
+    def _checkout_connection(self, host, port):
+        '''
+        Returns:
+          socket: an idle connection from the pool that is still usable, or None
+        '''
+        now = time.time()
+        with self._conn_pool_lock:
+            idle_conns = self._conn_pool.get((host, port), [])
+            while idle_conns:
+                s, release_time = idle_conns.pop()
+                if now - release_time <= self.pool_max_idle_time and self._is_connection_alive(s):
+                    return s
+                del self._pooled_sock2hp[s]
+                s.close()
+        return None
+
+    def _release_connection(self, skt):
+        '''
+        Give back a connection to the pool if it comes from it, otherwise close it
+        '''
+        with self._conn_pool_lock:
+            if self._pooled_sock2hp is not None and skt in self._pooled_sock2hp:
+                hp = self._pooled_sock2hp[skt]
+                idle_conns = self._conn_pool.setdefault(hp, [])
+                if skt.fileno() != -1 and len(idle_conns) < self.pool_max_size:
+                    idle_conns.append((skt, time.time()))
+                    return
+                del self._pooled_sock2hp[skt]
+        skt.close()
+
+    def _reconnect_to_target(self, skt, host, port, socket_type):
+        '''
+        Replace a broken pooled connection with a new one.
+
+        Returns:
+          socket: the new connection, or None if `skt` is not a pooled connection
+        '''
+        with self._conn_pool_lock:
+            if self._pooled_sock2hp is None or skt not in self._pooled_sock2hp:
+                return None
+            del self._pooled_sock2hp[skt]
+            # the other idle connections are likely to be broken as well
+            for s, _ in self._conn_pool.pop((host, port), []):
+                del self._pooled_sock2hp[s]
+                s.close()
+        skt.close()
+        print('\n*** NOTE: Reconnect to {:s}:{:d}'.format(host, port))
+        return self._connect_to_target(host, port, socket_type)
+
 
     def _listen_to_target(self, host, port, socket_type, func, args=None):
 
         def start_raw_server(serversocket):
-            server_thread = threading.Thread(None, self._raw_server_main, name='SRV-' + '',
-                                             args=(serversocket, host, port, func))
-            server_thread.start()
+            self._reactor.call_soon(self._wait_for_first_datagram, serversocket, host, port, func)
 
         skt_sz = len(socket_type)
         if skt_sz == 2:
@@ -892,9 +1525,8 @@ class NetworkTarget(Target):
 
         if sock_type == socket.SOCK_STREAM:
             serversocket.listen(5)
-            server_thread = threading.Thread(None, self._server_main, name='SRV-' + '',
-                                             args=(serversocket, host, port, func))
-            server_thread.start()
+            self._reactor.call_soon(self._reactor.register, serversocket,
+                                    lambda skt, ev: self._accept_connection(skt, host, port, func))
 
         elif sock_type == socket.SOCK_DGRAM or sock_type == socket.SOCK_RAW:
             self._last_client_hp2sock[(host, port)] = (serversocket, None)
@@ -903,59 +1535,73 @@ class NetworkTarget(Target):
         else:
             raise ValueError("Unrecognized socket type")
 
-    def _server_main(self, serversocket, host, port, func):
-        while not self.stop_event.is_set():
-            try:
-                # accept connections from outside
-                (clientsocket, address) = serversocket.accept()
-            except socket.timeout:
-                pass
-            except OSError as e:
-                if e.errno == 9: # [Errno 9] Bad file descriptor
-                    # TOFIX: It may occur with python3.
-                    # In this case the resource seem to have been released by
-                    # the OS whereas there is still a reference on it.
-                    pass
-                else:
-                    raise
+    def _accept_connection(self, serversocket, host, port, func):
+        try:
+            # accept connections from outside
+            (clientsocket, address) = serversocket.accept()
+        except socket.timeout:
+            return
+        except socket.error as serr:
+            if serr.errno == errno.EAGAIN:
+                return
+            elif serr.errno == errno.EBADF:
+                # the server socket has been closed
+                self._reactor.unregister(serversocket)
+                return
             else:
-                with self._server_thread_lock:
-                    args = self._server_thread_share[(host, port)]
-                func(clientsocket, address, args)
+                raise
 
-    def _raw_server_main(self, serversocket, host, port, func):
+        with self._server_thread_lock:
+            args = self._server_thread_share[(host, port)]
+        self._run_server_handler(func, clientsocket, address, args)
 
+    def _run_server_handler(self, func, skt, address, args, **kwargs):
+        # The handlers send data and may block on the socket, thus they are
+        # run outside the reactor thread to not stall the other sockets.
+        handler_thread = threading.Thread(None, func, name='SRV-Handler',
+                                          args=(skt, address, args), kwargs=kwargs)
+        handler_thread.daemon = True
+        handler_thread.start()
+
+    def _wait_for_first_datagram(self, serversocket, host, port, func):
         with self._server_thread_lock:
             args = self._server_thread_share[(host, port)]
 
-        retry = 0
-        while retry < 10:
+        if args[0] is None:
+            serversocket.settimeout(self.feedback_timeout)
+            self._run_server_handler(func, serversocket, None, args, pre_fbk=None)
+            return
+
+        timer = []
+
+        def stop_waiting():
+            SocketReactor.cancel_timer(timer[0] if timer else None)
+            if self._reactor.get_handler(serversocket) is handle_datagram:
+                self._reactor.unregister(serversocket)
+
+        def handle_datagram(skt, events):
             try:
                 # accept UDP from outside
-                if args[0] is not None:
-                    data, address = serversocket.recvfrom(self.CHUNK_SZ)
-                else:
-                    data, address = None, None
+                data, address = skt.recvfrom(self.CHUNK_SZ)
             except socket.timeout:
-                break
-            except OSError as e:
-                if e.errno == 9: # [Errno 9] Bad file descriptor
-                    break
-                elif e.errno == 11: # [Errno 11] Resource temporarily unavailable
-                    retry += 1
-                    time.sleep(0.5)
-                    continue
-                else:
-                    raise
+                stop_waiting()
+                return
             except socket.error as serr:
-                if serr.errno == 11:  # [Errno 11] Resource temporarily unavailable
-                    retry += 1
-                    time.sleep(0.5)
-                    continue
-            else:
-                serversocket.settimeout(self.feedback_timeout)
-                func(serversocket, address, args, pre_fbk=data)
-                break
+                if serr.errno == errno.EAGAIN:
+                    return
+                stop_waiting()
+                if serr.errno == errno.EBADF:
+                    return
+                raise
+            stop_waiting()
+            skt.settimeout(self.feedback_timeout)
+            self._run_server_handler(func, skt, address, args, pre_fbk=data)
+
+        if self._reactor.register(serversocket, handle_datagram):
+            # we wait up to the socket timeout, like a blocking recvfrom() would
+            timeout = serversocket.gettimeout()
+            if timeout is not None:
+                timer.append(self._reactor.call_later(timeout, stop_waiting))
 
     def _handle_connection_to_fbk_server(self, clientsocket, address, args, pre_fbk=None):
         fbk_id, fbk_length, connected_client_event = args
@@ -976,172 +1622,157 @@ class NetworkTarget(Target):
                         from_fmk=from_fmk, pre_fbk={clientsocket: pre_fbk})
 
 
-    def _collect_feedback_from(self, fbk_sockets, fbk_ids, fbk_lengths, epobj, fileno2fd,
-                               send_id, fbk_timeout, from_fmk, pre_fbk):
+    def _handle_obsolete_socket(self, skt, collector, error=None):
+        # print('\n*** NOTE: Remove obsolete socket {!r}'.format(skt))
+        self._release_fbk_socket(skt, collector)
 
-        def _check_and_handle_obsolete_socket(skt, error=None, error_list=None):
-            # print('\n*** NOTE: Remove obsolete socket {!r}'.format(socket))
-            try:
-                epobj.unregister(skt)
-            except ValueError as e:
-                # in python3, file descriptor == -1 witnessed (!?)
-                print('\n*** ERROR(check obsolete socket): ' + str(e))
-            except socket.error as serr:
-                # in python2, bad file descriptor (errno 9) witnessed
-                print('\n*** ERROR(check obsolete socket): ' + str(serr))
-
-            self._server_thread_lock.acquire()
-            if socket in self._last_client_sock2hp.keys():
-                if error is not None:
-                    error_list.append((fbk_ids[socket], error))
-                host, port = self._last_client_sock2hp[socket]
-                del self._last_client_sock2hp[socket]
-                del self._last_client_hp2sock[(host, port)]
-                self._server_thread_lock.release()
-            else:
-                self._server_thread_lock.release()
-                with self.socket_desc_lock:
-                    if socket in self._hclient_sock2hp.keys():
-                        if error is not None:
-                            error_list.append((fbk_ids[socket], error))
-                        host, port = self._hclient_sock2hp[socket]
-                        del self._hclient_sock2hp[socket]
-                        del self._hclient_hp2sock[(host, port)]
-                    if socket in self._additional_fbk_sockets:
-                        if error is not None:
-                            error_list.append((self._additional_fbk_ids[socket], error))
-                        self._additional_fbk_sockets.remove(socket)
-                        del self._additional_fbk_ids[socket]
-                        del self._additional_fbk_lengths[socket]
-
-        chunks = collections.OrderedDict()
-        t0 = datetime.datetime.now()
-        duration = 0
-        first_pass = True
-        ack_date = None
-        dont_stop = True
-
-        bytes_recd = {}
-        for fd in fbk_sockets:
-            bytes_recd[fd] = 0
-            chunks[fd] = []
-            if pre_fbk is not None and fd in pre_fbk and pre_fbk[fd] is not None:
-                chunks[fd].append(pre_fbk[fd])
-
-        socket_errors = []
-
-        while dont_stop:
-            ready_to_read = []
-            for fd, ev in epobj.poll(timeout=0.2):
-                skt = fileno2fd[fd]
-                if ev != select.EPOLLIN:
-                    _check_and_handle_obsolete_socket(skt, error=ev, error_list=socket_errors)
-                    if skt in fbk_sockets:
-                        fbk_sockets.remove(skt)
-                    continue
-                ready_to_read.append(skt)
-
-            now = datetime.datetime.now()
-            duration = (now - t0).total_seconds()
-            if ready_to_read:
-                if first_pass:
-                    first_pass = False
-                    self._register_last_ack_date(now)
-                for s in ready_to_read:
-                    if fbk_lengths[s] is None:
-                        sz = NetworkTarget.CHUNK_SZ
-                    else:
-                        sz = min(fbk_lengths[s] - bytes_recd[s], NetworkTarget.CHUNK_SZ)
-
-                    retry = 0
-                    socket_timed_out = False
-                    while retry < 3:
-                        try:
-                            chunk = s.recv(sz)
-                        except socket.timeout:
-                            chunk = b''
-                            socket_timed_out = True  # UDP
-                            break
-                        except socket.error as serr:
-                            chunk = b''
-                            print('\n*** ERROR[{!s}] (while receiving): {:s}'.format(
-                                serr.errno, str(serr)))
-                            if serr.errno == socket.errno.EAGAIN:
-                                retry += 1
-                                time.sleep(2)
-                                continue
-                            else:
-                                break
-                        else:
-                            break
+        error_list = collector.socket_errors
+        self._server_thread_lock.acquire()
+        if skt in self._last_client_sock2hp.keys():
+            if error is not None:
+                error_list.append((collector.ids[skt], error))
+            host, port = self._last_client_sock2hp[skt]
+            del self._last_client_sock2hp[skt]
+            del self._last_client_hp2sock[(host, port)]
+            self._server_thread_lock.release()
+        else:
+            self._server_thread_lock.release()
+            with self.socket_desc_lock:
+                if skt in self._hclient_sock2hp.keys():
+                    if error is not None:
+                        error_list.append((collector.ids[skt], error))
+                    host, port = self._hclient_sock2hp[skt]
+                    del self._hclient_sock2hp[skt]
+                    del self._hclient_hp2sock[(host, port)]
+                if skt in self._additional_fbk_sockets:
+                    if error is not None:
+                        error_list.append((self._additional_fbk_ids[skt], error))
+                    self._additional_fbk_sockets.remove(skt)
+                    del self._additional_fbk_ids[skt]
+                    del self._additional_fbk_lengths[skt]
+
+    def _release_fbk_socket(self, skt, collector):
+        # The socket may have been taken over by the collector of a more
+        # recent emission
+        if self._reactor.get_handler(skt) is collector.handler:
+            self._reactor.unregister(skt)
+
+    def _collect_feedback_from(self, collector, s, ev):
+        if ev != select.EPOLLIN:
+            self._handle_obsolete_socket(s, collector, error=ev)
+            if s in collector.sockets:
+                collector.sockets.remove(s)
+            self._check_fbk_collection(collector)
+            return
 
-                    if chunk == b'':
-                        print('\n*** NOTE: Nothing more to receive from: {!r}'.format(fbk_ids[s]))
-                        fbk_sockets.remove(s)
-                        _check_and_handle_obsolete_socket(s)
-                        if not socket_timed_out:
-                            s.close()
-                        continue
-                    else:
-                        bytes_recd[s] = bytes_recd[s] + len(chunk)
-                        chunks[s].append(chunk)
-
-            if fbk_sockets:
-                for s in fbk_sockets:
-                    if s in ready_to_read:
-                        s_fbk_len = fbk_lengths[s]
-                        if s_fbk_len is None or bytes_recd[s] < s_fbk_len:
-                            dont_stop = True
-                            break
-                    else:
-                        dont_stop = True
-                        break
-                else:
-                    dont_stop = False
+        if collector.first_pass:
+            collector.first_pass = False
+            self._register_last_ack_date(datetime.datetime.now())
 
-                if duration > fbk_timeout:
-                    dont_stop = False
+        fbk_length = collector.lengths[s]
+        if fbk_length is None:
+            sz = NetworkTarget.CHUNK_SZ
+        else:
+            sz = min(fbk_length - collector.bytes_recd[s], NetworkTarget.CHUNK_SZ)
 
-            else:
-                dont_stop = False
+        socket_timed_out = False
+        try:
+            chunk = s.recv(sz)
+        except socket.timeout:
+            chunk = b''
+            socket_timed_out = True  # UDP
+        except socket.error as serr:
+            if serr.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                # nothing to read yet, we wait for the next event
+                return
+            chunk = b''
+            print('\n*** ERROR[{!s}] (while receiving): {:s}'.format(
+                serr.errno, str(serr)))
+
+        if chunk == b'':
+            print('\n*** NOTE: Nothing more to receive from: {!r}'.format(collector.ids[s]))
+            self._complete_fbk_socket(s, collector)
+            collector.sockets.remove(s)
+            self._handle_obsolete_socket(s, collector)
+            if not socket_timed_out:
+                s.close()
+        else:
+            collector.bytes_recd[s] += len(chunk)
+            collector.chunks[s].append(chunk)
+            completion = self._fbk_completion.get(collector.ids[s])
+            if fbk_length is not None and collector.bytes_recd[s] >= fbk_length:
+                # expected feedback fully received from this socket
+                self._complete_fbk_socket(s, collector)
+            elif completion is not None:
+                collector.received[s] += chunk
+                if completion.is_complete(collector.received[s]):
+                    self._complete_fbk_socket(s, collector)
+                elif completion.idle_gap is not None:
+                    SocketReactor.cancel_timer(collector.idle_timers.get(s))
+                    collector.idle_timers[s] = self._reactor.call_later(
+                        completion.idle_gap, self._handle_fbk_idle_gap, s, collector)
+
+        self._check_fbk_collection(collector)
+
+    def _handle_fbk_idle_gap(self, s, collector):
+        if self._reactor.get_handler(s) is collector.handler:
+            self._complete_fbk_socket(s, collector)
+            self._check_fbk_collection(collector)
+
+    def _complete_fbk_socket(self, s, collector, timed_out=False):
+        SocketReactor.cancel_timer(collector.idle_timers.pop(s, None))
+        self._release_fbk_socket(s, collector)
+        stats = self._fbk_completion_stats.setdefault(collector.ids[s], [0, 0.0, 0])
+        if timed_out:
+            stats[2] += 1
+        else:
+            stats[0] += 1
+            stats[1] += (datetime.datetime.now() - collector.t0).total_seconds()
 
-        for s, chks in chunks.items():
+    def _check_fbk_collection(self, collector):
+        for s in collector.sockets:
+            if self._reactor.get_handler(s) is collector.handler:
+                break
+        else:
+            # no more feedback is expected
+            self._complete_fbk_collection(collector)
+
+    def _complete_fbk_collection(self, collector):
+        if collector.done:
+            return
+        collector.done = True
+        SocketReactor.cancel_timer(collector.timer)
+        for s in collector.sockets:
+            if self._reactor.get_handler(s) is collector.handler:
+                # still waiting for feedback from this socket
+                self._complete_fbk_socket(s, collector, timed_out=True)
+
+        for s, chks in collector.chunks.items():
             fbk = b'\n'.join(chks)
             with self._fbk_handling_lock:
-                fbkid = fbk_ids[s]
+                fbkid = collector.ids[s]
                 fbk, err = self._feedback_handling(fbk, fbkid)
                 self._feedback_collect(fbk, fbkid, error=err)
                 if (self._additional_fbk_sockets is None or s not in self._additional_fbk_sockets) and \
                         (self._hclient_sock2hp is None or s not in self._hclient_sock2hp.keys()) and \
                         (self._last_client_sock2hp is None or s not in self._last_client_sock2hp.keys()):
-                    s.close()
+                    self._release_connection(s)
 
         with self._fbk_handling_lock:
-            for fbkid, ev in socket_errors:
+            for fbkid, ev in collector.socket_errors:
                 self._feedback_collect(">>> ERROR[{:d}]: unable to interact with '{:s}' "
                                        "<<<".format(ev,fbkid), fbkid, error=-ev)
-            if from_fmk:
-                self._feedback_complete(send_id)
-
-        return
-
+            if collector.from_fmk:
+                self._feedback_complete(collector.send_id)
 
     def _send_data(self, sockets, data_refs, sid, from_fmk, pre_fbk=None):
         if sid != self._initial_sending_id:
             self._initial_sending_id = sid
             # self._first_send_data_call = True
 
-        epobj = select.epoll()
-        fileno2fd = {}
-
         if self._first_send_data_call:
             self._first_send_data_call = False
-
             fbk_sockets, fbk_ids, fbk_lengths = self._get_additional_feedback_sockets()
-            if fbk_sockets:
-                for fd in fbk_sockets:
-                    epobj.register(fd, select.EPOLLIN)
-                    fileno2fd[fd.fileno()] = fd
         else:
             fbk_sockets, fbk_ids, fbk_lengths = None, None, None
 
@@ -1157,42 +1788,46 @@ class NetworkTarget(Target):
 
             for s in sockets:
                 data, host, port, address = data_refs[s]
-                epobj.register(s, select.EPOLLIN)
-                fileno2fd[s.fileno()] = s
                 fbk_sockets.append(s)
                 fbk_ids[s] = self._default_fbk_id[(host, port)]
                 fbk_lengths[s] = self.feedback_length
 
-            self._start_fbk_collector(fbk_sockets, fbk_ids, fbk_lengths, epobj, fileno2fd, from_fmk)
+            self._start_fbk_collector(fbk_sockets, fbk_ids, fbk_lengths, from_fmk)
 
             return
 
-        ready_to_read, ready_to_write, in_error = select.select([], sockets, [], self._sending_delay)
+        ready_to_write = wait_for_fds(sockets, select.POLLOUT, self._sending_delay)
         if ready_to_write:
 
             for s in ready_to_write:
                 add_main_socket = True
                 data, host, port, address = data_refs[s]
-                epobj.register(s, select.EPOLLIN)
-                fileno2fd[s.fileno()] = s
 
                 raw_data = data.to_bytes()
+                # partial sends are resumed through a view on the remaining
+                # bytes, in order not to copy them again for each retry
+                view = memoryview(raw_data)
                 totalsent = 0
-                send_retry = 0
-                while totalsent < len(raw_data) and send_retry < 10:
+                stall_deadline = None
+                while totalsent < len(raw_data):
                     try:
                         if address is None:
-                            sent = s.send(raw_data[totalsent:])
+                            sent = s.send(view[totalsent:])
                         else:
                             # with SOCK_RAW, address is ignored
-                            sent = s.sendto(raw_data[totalsent:], address)
+                            sent = s.sendto(view[totalsent:], address)
                     except socket.error as serr:
-                        send_retry += 1
-                        print('\n*** ERROR(while sending): ' + str(serr))
                         if serr.errno == socket.errno.EWOULDBLOCK:
-                            time.sleep(0.2)
+                            # the send buffer is full, we wait for the peer to
+                            # consume it, unless it does not for SEND_STALL_TIMEOUT
+                            if stall_deadline is None:
+                                stall_deadline = time.time() + self.SEND_STALL_TIMEOUT
+                            if not wait_for_fds([s], select.POLLOUT, stall_deadline - time.time()):
+                                print('\n*** ERROR(while sending): ' + str(serr))
+                                break
                             continue
-                        elif serr.errno == socket.errno.EMSGSIZE:  # for SOCK_RAW
+                        print('\n*** ERROR(while sending): ' + str(serr))
+                        if serr.errno == socket.errno.EMSGSIZE:  # for SOCK_RAW
                             self._feedback.add_fbk_from(self._INTERNALS_ID, 'Message was not sent because it was too long!')
                             break
                         else:
@@ -1203,6 +1838,7 @@ class NetworkTarget(Target):
                             s.close()
                             raise TargetStuck("socket connection broken")
                         totalsent = totalsent + sent
+                        stall_deadline = None
 
                 if fbk_sockets is None:
                     assert fbk_ids is None
@@ -1219,24 +1855,30 @@ class NetworkTarget(Target):
                     fbk_lengths[s] = self.feedback_length
 
 
-            self._start_fbk_collector(fbk_sockets, fbk_ids, fbk_lengths, epobj, fileno2fd, from_fmk,
+            self._start_fbk_collector(fbk_sockets, fbk_ids, fbk_lengths, from_fmk,
                                       pre_fbk=pre_fbk)
 
         else:
             raise TargetStuck("system not ready for sending data!")
 
 
-    def _start_fbk_collector(self, fbk_sockets, fbk_ids, fbk_lengths, epobj, fileno2fd, from_fmk,
-                             pre_fbk=None):
-        self._thread_cpt += 1
+    def _start_fbk_collector(self, fbk_sockets, fbk_ids, fbk_lengths, from_fmk, pre_fbk=None):
         if from_fmk:
-            self.feedback_thread_qty += 1
-        feedback_thread = threading.Thread(None, self._collect_feedback_from,
-                                           name='FBK-' + repr(self._sending_id) + '#' + repr(self._thread_cpt),
-                                           args=(fbk_sockets, fbk_ids, fbk_lengths, epobj, fileno2fd,
-                                                 self._sending_id, self._feedback_timeout, from_fmk,
-                                                 pre_fbk))
-        feedback_thread.start()
+            self.feedback_collector_qty += 1
+        collector = _FeedbackCollector(self._sending_id, fbk_sockets, fbk_ids, fbk_lengths,
+                                       self._feedback_timeout, from_fmk, pre_fbk=pre_fbk)
+        self._reactor.call_soon(self._arm_fbk_collector, collector)
+
+    def _arm_fbk_collector(self, collector):
+        collector.handler = lambda skt, ev: self._collect_feedback_from(collector, skt, ev)
+        for s in copy.copy(collector.sockets):
+            if not self._reactor.register(s, collector.handler):
+                collector.sockets.remove(s)
+
+        elapsed = (datetime.datetime.now() - collector.t0).total_seconds()
+        collector.timer = self._reactor.call_later(max(collector.timeout - elapsed, 0),
+                                                   self._complete_fbk_collection, collector)
+        self._check_fbk_collection(collector)
 
 
     def _feedback_collect(self, fbk, ref, error=0):
@@ -1247,7 +1889,7 @@ class NetworkTarget(Target):
     def _feedback_complete(self, sid):
         if sid == self._sending_id:
             self.feedback_complete_cpt += 1
-        if self.feedback_complete_cpt == self.feedback_thread_qty:
+        if self.feedback_complete_cpt == self.feedback_collector_qty:
             self._feedback_handled = True
 
     def _before_sending_data(self, data_list, from_fmk):
@@ -1427,21 +2069,110 @@ class PrinterTarget(Target):
             print('CUPS Server Errror: ', err)
 
 
+class _OutputBuffer(object):
+    '''
+    Keep the last bytes written by an application on one of its outputs, and
+    look for error patterns as the data comes in.
+    '''
+    pattern_overlap = 256
+
+    def __init__(self, max_size, patterns=()):
+        self.max_size = max_size
+        self.patterns = patterns
+        self.matched = False
+        self.truncated = False
+        self._chunks = collections.deque()
+        self._size = 0
+        self._tail = b''
+
+    def append(self, chunk):
+        if self.patterns and not self.matched:
+            # patterns can straddle two chunks
+            window = self._tail + chunk
+            self.matched = any(p.search(window) for p in self.patterns)
+            self._tail = window[-self.pattern_overlap:]
+
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        while self._size > self.max_size:
+            extra = self._size - self.max_size
+            first = self._chunks[0]
+            if len(first) <= extra:
+                self._chunks.popleft()
+                self._size -= len(first)
+            else:
+                self._chunks[0] = first[extra:]
+                self._size -= extra
+            self.truncated = True
+
+    def get_bytes(self):
+        return b''.join(list(self._chunks))
+
+
 class LocalTarget(Target):
 
-    def __init__(self, tmpfile_ext, target_path=None):
-        self.__suffix = '{:0>12d}'.format(random.randint(2**16, 2**32))
+    def __init__(self, tmpfile_ext, target_path=None, fork_server=False,
+                 delivery_mode=DataDelivery.FILE, output_buffer_size=65536):
+        '''
+        Args:
+          tmpfile_ext (str): extension of the file provided to the application
+          target_path (str): path of the application
+          fork_server (bool): if True, the application is run for each test case
+            by a fork server started once with the target, instead of being
+            spawned from the framework process. If the fork server cannot be
+            started, LocalTarget falls back to the regular behavior.
+          delivery_mode (str): how the data is provided to the application. Refer
+            to :class:`framework.data_delivery.DataDelivery`.
+          output_buffer_size (int): maximum number of bytes kept from each output
+            (stdout/stderr) of the application. The last ones are kept.
+        '''
         self.__app = None
         self.__pre_args = None
         self.__post_args = None
         self._data_sent = None
         self._feedback_computed = None
         self.__feedback = TargetFeedback()
+        self._fork_server_enabled = fork_server
+        self._fork_server = None
+        self._delivery = DataDelivery(delivery_mode, file_ext=tmpfile_ext)
+        self._reactor = None
+        self._output_buffer_size = output_buffer_size
+        self._outputs = None
+        self._app_streams = ()
+        self.set_error_patterns([b'error', b'invalid'])
         self.set_target_path(target_path)
         self.set_tmp_file_extension(tmpfile_ext)
 
+    def set_error_patterns(self, patterns):
+        '''
+        Set the patterns which reveal an error when they are found in the
+        standard output of the application.
+
+        Args:
+          patterns (list): bytes or compiled regular expressions
+        '''
+        self._error_patterns = [p if hasattr(p, 'search') else re.compile(re.escape(p))
+                                for p in patterns]
+
+    def get_error_patterns(self):
+        return self._error_patterns
+
     def set_tmp_file_extension(self, tmpfile_ext):
         self._tmpfile_ext = tmpfile_ext
+        self._delivery.file_ext = tmpfile_ext
+
+    def set_delivery_mode(self, delivery_mode):
+        '''
+        Args:
+          delivery_mode (str): one of the modes of
+            :class:`framework.data_delivery.DataDelivery`
+        '''
+        self._stop_fork_server()
+        self._delivery.close()
+        self._delivery = DataDelivery(delivery_mode, file_ext=self._tmpfile_ext)
+
+    def get_delivery_mode(self):
+        return self._delivery.mode
 
     def set_target_path(self, target_path):
         self.__target_path = target_path
@@ -1480,47 +2211,164 @@ class LocalTarget(Target):
 
         self._data_sent = False
 
+        self._reactor = SocketReactor(name='LocalTarget')
+        self._reactor.start()
+
+        if self._fork_server_enabled:
+            self._start_fork_server(self._build_cmd(self._delivery.path()))
+
         return self.initialize()
 
     def stop(self):
+        self._stop_fork_server()
+        if self._reactor is not None:
+            self._reactor.stop()
+            self._reactor = None
+        self._delivery.close()
         return self.terminate()
 
+    def _start_fork_server(self, cmd):
+        self._fork_server = ForkServer(cmd, stdin=self._delivery.stdin,
+                                       pass_fds=self._delivery.fds)
+        if not self._fork_server.start():
+            print('\n*** WARNING: the fork server of LocalTarget cannot be started, '
+                  'the application will be spawned for each test case')
+            self._fork_server = None
+            self._fork_server_enabled = False
+            return
+        # the outputs of the fork server are shared by all the processes it
+        # runs, thus they are always provided to the buffers of the current one
+        self._new_outputs()
+        self._reactor_sync(self._watch_outputs,
+                           ((self._fork_server.stdout, lambda: self._outputs['stdout']),
+                            (self._fork_server.stderr, lambda: self._outputs['stderr'])))
+
+    def _stop_fork_server(self):
+        if self._fork_server is not None:
+            self._reactor_sync(self._unwatch_outputs,
+                               (self._fork_server.stdout, self._fork_server.stderr))
+            self._fork_server.stop()
+            self._fork_server = None
+        self.__app = None
+
+    def _reactor_sync(self, func, *args):
+        # call func() from the reactor thread and wait for its completion
+        if self._reactor is None:
+            return
+        done = threading.Event()
+
+        def call():
+            try:
+                func(*args)
+            finally:
+                done.set()
+
+        self._reactor.call_soon(call)
+        done.wait(5)
+
+    def _new_outputs(self):
+        self._outputs = {
+            'stdout': _OutputBuffer(self._output_buffer_size, self._error_patterns),
+            'stderr': _OutputBuffer(self._output_buffer_size),
+        }
+
+    def _watch_outputs(self, streams):
+        # reactor thread
+        for f, get_buffer in streams:
+            self._reactor.register(f, functools.partial(self._read_output, get_buffer))
+
+    def _unwatch_outputs(self, streams):
+        # reactor thread
+        for f in streams:
+            self._reactor.unregister(f)
+
+    def _read_output(self, get_buffer, f, ev):
+        # reactor thread
+        try:
+            chunk = os.read(f.fileno(), 65536)
+        except (OSError, IOError) as e:
+            if e.errno == errno.EAGAIN:
+                return False
+            chunk = b''
+        if chunk:
+            get_buffer().append(chunk)
+            return True
+        # EOF
+        self._reactor.unregister(f)
+        if self._fork_server is None or f not in (self._fork_server.stdout, self._fork_server.stderr):
+            f.close()
+        return False
+
+    def _flush_outputs(self, streams):
+        # reactor thread
+        for f in streams:
+            handler = self._reactor.get_handler(f)
+            while handler is not None and handler(f, select.EPOLLIN):
+                pass
+
+    def _build_cmd(self, name):
+        name = [] if name is None else [name]
+        pre_args = [] if self.__pre_args is None else self.__pre_args.split()
+        post_args = [] if self.__post_args is None else self.__post_args.split()
+        return [self.__target_path] + pre_args + name + post_args
+
     def _before_sending_data(self):
         self._feedback_computed = False
 
     def send_data(self, data, from_fmk=False):
         self._before_sending_data()
         data = data.to_bytes()
-        wkspace = workspace_folder
 
-        name = os.path.join(wkspace, 'fuzz_test_' + self.__suffix + self._tmpfile_ext)
-        with open(name, 'wb') as f:
-             f.write(data)
-
-        if self.__pre_args is not None and self.__post_args is not None:
-            cmd = [self.__target_path] + self.__pre_args.split() + [name] + self.__post_args.split()
-        elif self.__pre_args is not None:
-            cmd = [self.__target_path] + self.__pre_args.split() + [name]
-        elif self.__post_args is not None:
-            cmd = [self.__target_path, name] + self.__post_args.split()
-        else:
-            cmd = [self.__target_path, name]
-
-        self.__app = subprocess.Popen(args=cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        cmd = self._build_cmd(self._delivery.deliver(data))
+
+        if self._fork_server_enabled:
+            if self._fork_server is not None and not self._fork_server.is_alive():
+                self._stop_fork_server()
+            if self._fork_server is None:
+                self._start_fork_server(cmd)
+            if self._fork_server is not None:
+                # the command line is provided with the request if it changed
+                # (arguments updated or ring of files)
+                self._reactor_sync(self._flush_outputs, self._app_streams)
+                self._new_outputs()
+                app = self._fork_server.run(cmd)
+                if app is not None:
+                    self.__app = app
+                    self._app_streams = (self._fork_server.stdout, self._fork_server.stderr)
+                    self._data_sent = True
+                    return
+                # the fork server is broken, it will be restarted for the next test
+                # case and this one is spawned directly
+                self._stop_fork_server()
+
+        self.__app = subprocess.Popen(args=cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                      **self._delivery.popen_kwargs())
 
         fl = fcntl.fcntl(self.__app.stderr, fcntl.F_GETFL)
         fcntl.fcntl(self.__app.stderr, fcntl.F_SETFL, fl | os.O_NONBLOCK)
 
         fl = fcntl.fcntl(self.__app.stdout, fcntl.F_GETFL)
         fcntl.fcntl(self.__app.stdout, fcntl.F_SETFL, fl | os.O_NONBLOCK)
+
+        # the outputs are continuously drained so that the application never
+        # blocks on a full pipe
+        self._new_outputs()
+        stdout_buf, stderr_buf = self._outputs['stdout'], self._outputs['stderr']
+        self._app_streams = (self.__app.stdout, self.__app.stderr)
+        self._reactor.call_soon(self._watch_outputs,
+                                ((self.__app.stdout, lambda: stdout_buf),
+                                 (self.__app.stderr, lambda: stderr_buf)))
         self._data_sent = True
-        
+
     def cleanup(self):
         if self.__app is None:
             return
 
         try:
-            os.kill(self.__app.pid, signal.SIGTERM)
+            if self._fork_server is not None:
+                self.__app.kill()
+            else:
+                os.kill(self.__app.pid, signal.SIGTERM)
         except:
             print("\n*** WARNING: cannot kill application with PID {:d}".format(self.__app.pid))
         finally:
@@ -1539,41 +2387,334 @@ class LocalTarget(Target):
         elif self.__app is None:
             return self.__feedback
 
-        exit_status = self.__app.poll()
+        # the feedback is complete as soon as the application exits
+        exit_status = self._wait_for_exit(delay)
+        self._reactor_sync(self._flush_outputs, self._app_streams)
+
         if exit_status is not None and exit_status < 0:
             self.__feedback.set_error_code(exit_status)
             self.__feedback.add_fbk_from("Application[{:d}]".format(self.__app.pid),
                                          "Negative return status ({:d})".format(exit_status))
 
-        err_detected = False
-        ret = select.select([self.__app.stdout, self.__app.stderr], [], [], delay)
-        if ret[0]:
-            byte_string = b''
-            for fd in ret[0][:-1]:
-                byte_string += fd.read() + b'\n\n'
-
-            if b'error' in byte_string or b'invalid' in byte_string:
-                self.__feedback.set_error_code(-1)
-                self.__feedback.add_fbk_from("LocalTarget[stdout]", "Application outputs errors on stdout")
-
-            stderr_msg = ret[0][-1].read()
-            if stderr_msg:
-                self.__feedback.set_error_code(-2)
-                self.__feedback.add_fbk_from("LocalTarget[stderr]", "Application outputs on stderr")
-                byte_string += stderr_msg
-            else:
-                byte_string = byte_string[:-2]  # remove '\n\n'
+        stdout, stderr = self._outputs['stdout'], self._outputs['stderr']
+        byte_string = stdout.get_bytes()
 
-        else:
-            byte_string = b''
+        if stdout.matched:
+            self.__feedback.set_error_code(-1)
+            self.__feedback.add_fbk_from("LocalTarget[stdout]", "Application outputs errors on stdout")
+
+        stderr_msg = stderr.get_bytes()
+        if stderr_msg:
+            self.__feedback.set_error_code(-2)
+            self.__feedback.add_fbk_from("LocalTarget[stderr]", "Application outputs on stderr")
+            byte_string += b'\n\n' + stderr_msg
 
         self.__feedback.set_bytes(byte_string)
 
         return self.__feedback
 
+    def _wait_for_exit(self, timeout):
+        if self._fork_server is not None:
+            # the exit status is provided by the fork server
+            return self.__app.poll(timeout=timeout)
+
+        exit_status = self.__app.poll()
+        if exit_status is not None or timeout <= 0:
+            return exit_status
+
+        if hasattr(os, 'pidfd_open'):
+            try:
+                pidfd = os.pidfd_open(self.__app.pid)
+            except OSError:
+                pidfd = None
+            if pidfd is not None:
+                try:
+                    wait_for_fds([pidfd], select.POLLIN, timeout)
+                finally:
+                    os.close(pidfd)
+                return self.__app.poll()
+
+        deadline = time.time() + timeout
+        while exit_status is None and time.time() < deadline:
+            time.sleep(0.005)
+            exit_status = self.__app.poll()
+        return exit_status
+
+
+class _LocalSlot(object):
+    '''
+    State of one instance of the application run by :class:`LocalPoolTarget`
+    '''
+
+    def __init__(self, idx, delivery):
+        self.idx = idx
+        self.delivery = delivery
+        self.app = None
+        self.data = None
+        self.output = None
+        self.open_streams = 0
+        self.pidfd = None
+        self.timer = None
+        self.timed_out = False
+
+
+class LocalPoolTarget(LocalTarget):
+    '''
+    LocalTarget running several instances of the application concurrently.
+    Each data sent is dispatched to a free slot, and the output and the exit
+    status of each instance are collected asynchronously. The feedback is
+    provided for the data that produced it (refer to
+    :meth:`TargetFeedback.add_data_fbk`), so that it is recorded in the FmkDB
+    with the right data ID.
+
+    The framework benefits from the concurrency when several data are sent at
+    once (:meth:`send_multiple_data` or burst mode).
+    '''
+
+    def __init__(self, tmpfile_ext, target_path=None, instances=None,
+                 delivery_mode=DataDelivery.FILE, exec_timeout=5):
+        '''
+        Args:
+          tmpfile_ext (str): extension of the file provided to the application
+          target_path (str): path of the application
+          instances (int): number of instances of the application that can run
+            concurrently. By default, the number of CPUs.
+          delivery_mode (str): refer to :class:`LocalTarget`. Each instance has
+            its own file/descriptor.
+          exec_timeout (float): an instance which runs for more than this
+            duration is killed
+        '''
+        LocalTarget.__init__(self, tmpfile_ext, target_path=target_path,
+                             delivery_mode=delivery_mode)
+        self.instances = instances if instances else multiprocessing.cpu_count()
+        self.exec_timeout = exec_timeout
+        self._slots = []
+        self._free_slots = collections.deque()
+        self._slots_cond = threading.Condition()
+        self._reactor = None
+        self._pool_feedback = TargetFeedback()
+
+    def start(self):
+        if not self.get_target_path():
+            print('/!\\ ERROR /!\\: the LocalTarget path has not been set')
+            return False
+
+        self._reactor = SocketReactor(name='LocalPoolTarget')
+        self._reactor.start()
+        mode = self.get_delivery_mode()
+        self._slots = [_LocalSlot(i, DataDelivery(mode, file_ext=self._tmpfile_ext,
+                                                  prefix='fuzz_test_{:d}_'.format(i)))
+                       for i in range(self.instances)]
+        self._free_slots = collections.deque(self._slots)
+
+        return self.initialize()
+
+    def stop(self):
+        if self._reactor is not None:
+            for slot in self._slots:
+                if slot.app is not None:
+                    self._reactor.call_soon(self._kill_instance, slot)
+            self.wait_for_instances(timeout=2)
+            self._reactor.stop()
+            self._reactor = None
+        for slot in self._slots:
+            self._close_pidfd(slot)
+            if slot.app is not None:
+                slot.app.stdout.close()
+                slot.app.stderr.close()
+            slot.delivery.close()
+        self._slots = []
+        self._free_slots.clear()
+        return self.terminate()
+
+    def _acquire_slot(self):
+        with self._slots_cond:
+            while not self._free_slots:
+                # instances that hang are killed after exec_timeout
+                self._slots_cond.wait(0.1)
+            return self._free_slots.popleft()
+
+    def send_data(self, data, from_fmk=False):
+        slot = self._acquire_slot()
+        cmd = self._build_cmd(slot.delivery.deliver(data.to_bytes()))
+        try:
+            app = subprocess.Popen(args=cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   **slot.delivery.popen_kwargs())
+        except OSError:
+            self._pool_feedback.add_data_fbk(data, 'LocalTarget',
+                                             b'Application cannot be executed', status_code=-3)
+            with self._slots_cond:
+                self._free_slots.append(slot)
+                self._slots_cond.notify_all()
+            return
+
+        for f in (app.stdout, app.stderr):
+            fl = fcntl.fcntl(f, fcntl.F_GETFL)
+            fcntl.fcntl(f, fcntl.F_SETFL, fl | os.O_NONBLOCK)
+
+        slot.app = app
+        slot.data = data
+        slot.output = {app.stdout: [], app.stderr: []}
+        slot.timed_out = False
+        self._reactor.call_soon(self._watch_instance, slot)
+
+    def send_multiple_data(self, data_list, from_fmk=False):
+        for data in data_list:
+            self.send_data(data, from_fmk=from_fmk)
+
+    def is_target_ready_for_new_data(self):
+        with self._slots_cond:
+            return len(self._free_slots) > 0
+
+    def wait_for_instances(self, timeout=None):
+        '''
+        Wait for the termination of all the running instances.
+
+        Returns:
+          bool: True if no instance is running anymore
+        '''
+        t0 = datetime.datetime.now()
+        with self._slots_cond:
+            while len(self._free_slots) < len(self._slots):
+                if timeout is not None:
+                    remaining = timeout - (datetime.datetime.now() - t0).total_seconds()
+                    if remaining <= 0:
+                        return False
+                    self._slots_cond.wait(remaining)
+                else:
+                    self._slots_cond.wait(0.1)
+        return True
+
+    def cleanup(self):
+        # Instances are not killed at the end of a burst as some of them can
+        # still be processing their data. The ones that hang are killed after
+        # exec_timeout.
+        pass
+
+    def get_feedback(self, delay=0.2):
+        '''
+        Wait at most `delay` seconds for the running instances, and provide the
+        feedback of the instances that have terminated. The feedback of the
+        others will be provided by a next call.
+        '''
+        self.wait_for_instances(timeout=delay)
+        return self._pool_feedback
+
+    def _watch_instance(self, slot):
+        # reactor thread
+        slot.open_streams = 0
+        for f in (slot.app.stdout, slot.app.stderr):
+            if self._reactor.register(f, functools.partial(self._read_instance_output, slot)):
+                slot.open_streams += 1
+        slot.timer = self._reactor.call_later(self.exec_timeout, self._on_exec_timeout, slot)
+        if slot.open_streams == 0:
+            self._complete_instance(slot, slot.app)
+
+    def _read_instance_output(self, slot, f, ev):
+        # reactor thread
+        try:
+            chunk = os.read(f.fileno(), 65536)
+        except (OSError, IOError) as e:
+            if e.errno == errno.EAGAIN:
+                return
+            chunk = b''
+        if chunk:
+            slot.output[f].append(chunk)
+            return
+        self._reactor.unregister(f)
+        slot.open_streams -= 1
+        if slot.open_streams == 0:
+            self._complete_instance(slot, slot.app)
+
+    def _on_exec_timeout(self, slot):
+        slot.timer = None
+        slot.timed_out = True
+        self._kill_instance(slot)
+        # the outputs may be kept open by children of the application
+        self._complete_instance(slot, slot.app)
+
+    def _kill_instance(self, slot):
+        if slot.app is None:
+            return
+        try:
+            slot.app.kill()
+        except OSError:
+            pass
+
+    def _wait_for_instance_exit(self, slot, app):
+        # reactor thread
+        if slot.pidfd is not None:
+            # already waiting for the pidfd to be readable
+            return
+        if hasattr(os, 'pidfd_open'):
+            try:
+                pidfd = os.pidfd_open(app.pid)
+            except OSError:
+                pidfd = None
+            if pidfd is not None:
+                if self._reactor.register(pidfd, lambda fd, ev: self._complete_instance(slot, app)):
+                    slot.pidfd = pidfd
+                    return
+                os.close(pidfd)
+        # kernels without pidfd support
+        self._reactor.call_later(0.01, self._complete_instance, slot, app)
+
+    def _close_pidfd(self, slot):
+        if slot.pidfd is not None:
+            if self._reactor is not None:
+                self._reactor.unregister(slot.pidfd)
+            os.close(slot.pidfd)
+            slot.pidfd = None
+
+    def _complete_instance(self, slot, app):
+        # reactor thread
+        if slot.app is not app:
+            # already completed
+            return
+        exit_status = app.poll()
+        if exit_status is None:
+            # the application closed its outputs but is still running
+            self._wait_for_instance_exit(slot, app)
+            return
+        self._reactor.cancel_timer(slot.timer)
+        slot.timer = None
+        self._reactor.unregister(app.stdout)
+        self._reactor.unregister(app.stderr)
+        self._close_pidfd(slot)
+
+        stdout = b''.join(slot.output[app.stdout])
+        stderr = b''.join(slot.output[app.stderr])
+        source = 'Application[{:d}]'.format(app.pid)
+        data = slot.data
+
+        if slot.timed_out:
+            self._pool_feedback.add_data_fbk(
+                data, source, 'Application has not terminated within {!s}s'.format(self.exec_timeout),
+                status_code=-4)
+        elif exit_status < 0:
+            self._pool_feedback.add_data_fbk(
+                data, source, 'Negative return status ({:d})'.format(exit_status),
+                status_code=exit_status)
+        if any(p.search(stdout) for p in self._error_patterns):
+            self._pool_feedback.add_data_fbk(data, 'LocalTarget[stdout]', stdout, status_code=-1)
+        elif stdout:
+            self._pool_feedback.add_data_fbk(data, 'LocalTarget[stdout]', stdout, status_code=0)
+        if stderr:
+            self._pool_feedback.add_data_fbk(data, 'LocalTarget[stderr]', stderr, status_code=-2)
+
+        app.stdout.close()
+        app.stderr.close()
+        slot.app = None
+        slot.data = None
+        slot.output = None
+        with self._slots_cond:
+            self._free_slots.append(slot)
+            self._slots_cond.notify_all()
+
 
 class SIMTarget(Target):
-    delay_between_write = 0.1  # without, it seems some commands can be lost
+    delay_between_write = 0.1  # maximum waiting time for the PDU prompt
+    final_error_results = (b'+CME ERROR', b'+CMS ERROR', b'NO CARRIER')
 
     def __init__(self, serial_port, baudrate, pin_code, targeted_tel_num):
         self.serial_port = serial_port
@@ -1594,26 +2735,21 @@ class SIMTarget(Target):
         self.ser = serial.Serial(self.serial_port, self.baudrate, timeout=2,
                                  dsrdtr=True, rtscts=True)
 
-        self.ser.write(b"ATE1\r\n") # echo ON
-        time.sleep(self.delay_between_write)
-        self.ser.write(b"AT+CMEE=1\r\n") # enable extended error reports
-        time.sleep(self.delay_between_write)
-        self.ser.write(b"AT+CPIN?\r\n") # need to unlock?
-        cpin_fbk = self._retrieve_feedback_from_serial(timeout=0)
+        # Each command is sent once the modem has answered the previous one
+        fbk = self._send_at_command(b"ATE1") # echo ON
+        fbk += self._send_at_command(b"AT+CMEE=1") # enable extended error reports
+        cpin_fbk = fbk + self._send_at_command(b"AT+CPIN?") # need to unlock?
+        fbk = b''
         if cpin_fbk.find(b'SIM PIN') != -1:
             # Note that if SIM is already unlocked modem will answer CME ERROR: 3
             # if we try to unlock it again.
             # So we need to unlock only when it is needed.
             # If modem is unlocked the answer will be: CPIN: READY
             # otherwise it will be: CPIN: SIM PIN.
-            self.ser.write(b"AT+CPIN="+self.pin_code+b"\r\n") # enter pin code
-        time.sleep(self.delay_between_write)
-        self.ser.write(b"AT+CMGF=0\r\n") # PDU mode
-        time.sleep(self.delay_between_write)
-        self.ser.write(b"AT+CSMS=0\r\n") # check if modem can process SMS
-        time.sleep(self.delay_between_write)
-
-        fbk = self._retrieve_feedback_from_serial(timeout=1)
+            fbk += self._send_at_command(b"AT+CPIN="+self.pin_code) # enter pin code
+        fbk += self._send_at_command(b"AT+CMGF=0") # PDU mode
+        fbk += self._send_at_command(b"AT+CSMS=0") # check if modem can process SMS
+
         code = 0 if fbk.find(b'ERROR') == -1 else -1
         self._logger.collect_target_feedback(fbk, status_code=code)
         if code < 0:
@@ -1624,20 +2760,43 @@ class SIMTarget(Target):
     def stop(self):
         self.ser.close()
 
+    def _send_at_command(self, cmd, timeout=1):
+        self.ser.write(cmd + b"\r\n")
+        return self._retrieve_feedback_from_serial(timeout=timeout)
+
+    @classmethod
+    def _has_final_result(cls, feedback):
+        for line in feedback.splitlines():
+            line = line.strip()
+            if line in (b'OK', b'ERROR') or line.startswith(cls.final_error_results):
+                return True
+        return False
+
+    def _read_from_serial(self, deadline, until):
+        # Read from the serial port as soon as data is available, until the
+        # callable `until` returns True on what has been read or the
+        # deadline is reached
+        data = b''
+        fd = self.ser.fileno()
+        while True:
+            if not wait_for_fds([fd], select.POLLIN, deadline - time.time()):
+                break
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                break
+            data += chunk
+            if until(data):
+                break
+        return data
+
     def _retrieve_feedback_from_serial(self, timeout=None):
-        feedback = b''
-        t0 = datetime.datetime.now()
-        duration = -1
+        '''
+        Retrieve the answer of the modem, which is complete when a final result
+        code (OK, ERROR, ...) is received, or when `timeout` expires.
+        '''
         timeout = self.feedback_timeout if timeout is None else timeout
-        while duration < timeout:
-            now = datetime.datetime.now()
-            duration = (now - t0).total_seconds()
-            time.sleep(0.1)
-            fbk = self.ser.readline()
-            if fbk.strip():
-                feedback += fbk
-
-        return feedback
+        feedback = self._read_from_serial(time.time() + timeout, self._has_final_result)
+        return b''.join([l for l in feedback.splitlines(True) if l.strip()])
 
     def send_data(self, data, from_fmk=False):
         node_list = data.node[NodeSemanticsCriteria(mandatory_criteria=['tel num'])]
@@ -1656,9 +2815,12 @@ class SIMTarget(Target):
         pdu = b'00' + pdu + b"\x1a\r\n"
 
         self.ser.write(b"AT+CMGS=23\r\n") # PDU mode
-        time.sleep(self.delay_between_write)
+        # the PDU is expected after the prompt of the modem
+        prompt = self._read_from_serial(time.time() + self.delay_between_write,
+                                        lambda d: d.find(b'>') != -1)
         self.ser.write(pdu)
 
         fbk = self._retrieve_feedback_from_serial()
+        fbk = b''.join([l for l in prompt.splitlines(True) if l.strip()]) + fbk
         code = 0 if fbk.find(b'ERROR') == -1 else -1
         self._logger.collect_target_feedback(fbk, status_code=code)
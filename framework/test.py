@@ -30,6 +30,9 @@ import functools
 import binascii
 import unittest
 import collections
+import tempfile
+import shutil
+import io
 
 import argparse
 
@@ -39,6 +42,7 @@ from framework.data_model import *
 from framework.value_types import *
 
 from libs.external_modules import *
+from libs.utils import wait_for_fds
 
 import data_models.example as example
 import data_models.protocols.usb
@@ -1585,7 +1589,7 @@ class TestModelWalker(unittest.TestCase):
         print('***')
         simple  = self.dm.get_data('Simple')
         nonterm_consumer = NonTermVisitor(respect_order=True)
-        for rnode, consumed_node, orig_node_val, idx in ModelWalker(simple, nonterm_consumer, make_determinist=True, max_steps=20):
+        for rnode, consumed_node, orig_node_val, idx in ModelWalker(simple, nonterm_consumer, make_determinist=True, max_steps=30):
             print(colorize('[%d] '%idx + repr(rnode.to_bytes()), rgb=Color.INFO))
         self.assertEqual(idx, 4)
 
@@ -1593,7 +1597,7 @@ class TestModelWalker(unittest.TestCase):
 
         simple  = self.dm.get_data('Simple')
         nonterm_consumer = NonTermVisitor(respect_order=False)
-        for rnode, consumed_node, orig_node_val, idx in ModelWalker(simple, nonterm_consumer, make_determinist=True, max_steps=20):
+        for rnode, consumed_node, orig_node_val, idx in ModelWalker(simple, nonterm_consumer, make_determinist=True, max_steps=30):
             print(colorize('[%d] '%idx + repr(rnode.to_bytes()), rgb=Color.INFO))
         self.assertEqual(idx, 4)
 
@@ -1747,6 +1751,74 @@ class TestModelWalker(unittest.TestCase):
             print(colorize('[%d] ' % idx + repr(rnode.to_bytes()), rgb=Color.INFO))
         self.assertEqual(idx, 310)
 
+    def test_walk_ranges(self):
+        # 'TestNode' has existence conditions, thus some of the generated cases
+        # are not visible
+        def walk(initial_step=1, partition=None):
+            ModelWalker.partition = partition
+            random.seed(0)
+            try:
+                nt = self.dm.get_data('TestNode')
+                walker = ModelWalker(nt, TypedNodeDisruption(), make_determinist=True,
+                                     initial_step=initial_step)
+                return [(idx, rnode.to_bytes()) for rnode, consumed_node, orig_node_val, idx in walker]
+            finally:
+                ModelWalker.partition = None
+
+        steps = walk()
+        self.assertEqual([idx for idx, val in steps], list(range(1, len(steps)+1)))
+
+        # Steps are numbered the same whatever the initial step
+        for initial_step in [2, 50, 100, len(steps)]:
+            self.assertEqual(walk(initial_step=initial_step), steps[initial_step-1:])
+
+        # The partitions of the walk cover each step once
+        parts = [walk(initial_step=3, partition=(7, 3, idx)) for idx in range(3)]
+        self.assertEqual(sorted(parts[0] + parts[1] + parts[2]), steps[2:])
+        self.assertEqual(parts[1][:7], steps[9:16])
+
+    def test_walk_shared_by_node(self):
+        class CountingDisruption(TypedNodeDisruption):
+            def consume_node(self, node):
+                self.consumed.append(node.get_path_from(self._root_node))
+                return TypedNodeDisruption.consume_node(self, node)
+
+        def walk(partition=None):
+            ModelWalker.partition = partition
+            consumer = CountingDisruption()
+            consumer.consumed = []
+            try:
+                nt = self.dm.get_data('TestNode')
+                walker = ModelWalker(nt, consumer, make_determinist=True)
+                steps = [(ModelWalker.last_share, walker.consumed_node_path) for x in walker]
+            finally:
+                ModelWalker.partition = None
+                ModelWalker.last_share = None
+            return steps, consumer.consumed
+
+        steps, consumed = walk()
+        self.assertTrue(len(set(consumed)) > 3)
+
+        # Each worker only consumes its own nodes, and the shares put back
+        # in order give the sequential walk
+        parts = [walk(partition=(7, 3, idx)) for idx in range(3)]
+        self.assertEqual(sorted(parts[0][1] + parts[1][1] + parts[2][1]), sorted(consumed))
+        for idx, (s, c) in enumerate(parts):
+            self.assertTrue(len(c) < len(consumed))
+            self.assertTrue(all(share % 3 == idx and by_node for (share, by_node), path in s))
+        merged = sorted(parts[0][0] + parts[1][0] + parts[2][0], key=lambda x: x[0][0])
+        self.assertEqual([path for share, path in merged], [path for share, path in steps])
+
+        # The walk is split in windows of steps if a specific range is requested
+        ModelWalker.partition = (7, 3, 0)
+        try:
+            walker = ModelWalker(self.dm.get_data('TestNode'), TypedNodeDisruption(),
+                                 make_determinist=True, max_steps=30)
+            self.assertEqual([ModelWalker.last_share for x in walker], [(0, False)] * 7 + [(3, False)] * 7)
+        finally:
+            ModelWalker.partition = None
+            ModelWalker.last_share = None
+
     def test_TypedNodeDisruption_BitfieldCollapse(self):
         '''
         Test case similar to test_TermNodeDisruption_1() but with more
@@ -2633,6 +2705,246 @@ class TestNodeFeatures(unittest.TestCase):
         # corrupted_data.show()
 
 
+    def test_bytes_cache(self):
+        leaf1 = Node('leaf1', value_type=String(val_list=['AAA']))
+        leaf2 = Node('leaf2', value_type=String(val_list=['BBB']))
+        leaf3 = Node('leaf3', value_type=String(val_list=['CCC']))
+        mid = Node('mid', subnodes=[leaf2, leaf3])
+        top = Node('top', subnodes=[leaf1, mid])
+        top.set_env(Env())
+
+        self.assertEqual(top.to_bytes(), b'AAABBBCCC')
+
+        Node.reset_bytes_cache_stats()
+        self.assertEqual(top.to_bytes(), b'AAABBBCCC')
+        self.assertEqual(Node.get_bytes_cache_stats(), {'hits': 1, 'misses': 0})
+
+        # Only the ancestor chain of the modified node is recomputed
+        Node.reset_bytes_cache_stats()
+        leaf3.set_frozen_value(b'ZZ')
+        self.assertEqual(top.to_bytes(), b'AAABBBZZ')
+        stats = Node.get_bytes_cache_stats()
+        self.assertEqual(stats['misses'], 3)
+        self.assertEqual(stats['hits'], 2)
+
+        top['top/mid/leaf2'].set_values(['XX'])
+        self.assertEqual(top.to_bytes(), b'AAAXXZZ')
+
+        mid.unfreeze(recursive=True)
+        self.assertEqual(top.to_bytes(), b'AAAXXCCC')
+
+        # Non-freezable nodes are never cached, nor their ancestors
+        leaf1.set_values(value_type=String(val_list=['1']))
+        leaf1.clear_attr(NodeInternals.Freezable)
+        self.assertEqual(top.to_bytes(), b'1XXCCC')
+        self.assertIsNone(leaf1._bytes_cache)
+        self.assertIsNone(top._bytes_cache)
+        self.assertEqual(mid._bytes_cache, b'XXCCC')
+
+        # Clones whose state is reset do not inherit the caches
+        leaf3.set_frozen_value(b'ZZ')
+        self.assertEqual(mid.to_bytes(), b'XXZZ')
+        mid_clone = mid.get_clone(ignore_frozen_state=True)
+        self.assertEqual(mid_clone.to_bytes(), b'XXCCC')
+
+        # Modifications of entangled nodes invalidate the graphs of all of them
+        ent1 = Node('ent1', value_type=String(val_list=['E1']))
+        ent2 = Node('ent2', value_type=String(val_list=['E1']))
+        ent1.entangle_with(ent2)
+        top1 = Node('top1', subnodes=[Node('pre1', values=['<']), ent1])
+        top2 = Node('top2', subnodes=[Node('pre2', values=['>']), ent2])
+        top1.set_env(Env())
+        top2.set_env(Env())
+        self.assertEqual(top1.to_bytes(), b'<E1')
+        self.assertEqual(top2.to_bytes(), b'>E1')
+        ent1.set_values(['E2'])
+        self.assertEqual(top1.to_bytes(), b'<E2')
+        self.assertEqual(top2.to_bytes(), b'>E2')
+
+        ent1.add_conf('ALT')
+        ent1.set_values(['ALT1'], conf='ALT', ignore_entanglement=True)
+        ent2.add_conf('ALT')
+        ent2.set_values(['ALT2'], conf='ALT', ignore_entanglement=True)
+        self.assertEqual(top2.to_bytes(), b'>E2')
+        ent1.set_current_conf('ALT')
+        self.assertEqual(top1.to_bytes(), b'<ALT1')
+        self.assertEqual(top2.to_bytes(), b'>ALT2')
+
+        # The encoding of a node is recomputed when its subnodes or its
+        # encoder change
+        enc_leaf = Node('enc_leaf', values=['x'])
+        enc = Node('enc', subnodes=[enc_leaf])
+        enc.set_encoder(Wrap_Enc(['[', ']']))
+        enc_top = Node('enc_top', subnodes=[enc, Node('end', values=['!'])])
+        enc_top.set_env(Env())
+        self.assertEqual(enc_top.to_bytes(), b'[x]!')
+        enc_leaf.set_frozen_value(b'y')
+        self.assertEqual(enc_top.to_bytes(), b'[y]!')
+        enc.set_encoder(Wrap_Enc(['(', ')']))
+        self.assertEqual(enc_top.to_bytes(), b'(y)!')
+
+        # NodeInternals methods forwarded by the Node invalidate the cache
+        enc_leaf.import_value_type(String(val_list=['z']))
+        self.assertIsNone(enc_top._bytes_cache)
+        enc_leaf.unfreeze()
+        self.assertEqual(enc_top.to_bytes(), b'(z)!')
+        # the invalidating wrappers are only defined once per method name
+        self.assertIs(enc_leaf.import_value_type.__func__, leaf1.import_value_type.__func__)
+
+        # Replacing the NodeInternals through Node.cc invalidates the cache,
+        # while direct writes to Node.internals need an explicit invalidation
+        self.assertEqual(enc_top.to_bytes(), b'(z)!')
+        enc_leaf.cc = NodeInternals_TypedValue()
+        enc_leaf.cc.import_value_type(String(val_list=['w']))
+        self.assertEqual(enc_top.to_bytes(), b'(w)!')
+        new_internals = NodeInternals_TypedValue()
+        new_internals.import_value_type(String(val_list=['v']))
+        enc_leaf.internals[enc_leaf.current_conf] = new_internals
+        self.assertEqual(enc_top.to_bytes(), b'(w)!')
+        enc_leaf.invalidate_bytes_cache()
+        self.assertEqual(enc_top.to_bytes(), b'(v)!')
+
+    def test_compact_representation(self):
+        leaf = Node('leaf', value_type=BitField(subfield_sizes=[4, 4], subfield_val_lists=[[3], [5]]))
+        func = Node('func', vt=UINT8(int_list=[1]))
+        func.set_func(lambda x: x, func_node_arg=leaf)
+        top = Node('top', subnodes=[leaf, func])
+        top.set_semantics(['sem'])
+        top.set_env(Env())
+
+        # No per-instance __dict__, even through the attribute forwarding
+        for obj in (top, leaf, func, top.cc, leaf.cc, func.cc, top.cc.custo, top.semantics):
+            self.assertFalse(hasattr(obj, '__dict__'))
+
+        # Only the value type methods delegated by NodeInternals_TypedValue
+        # are reachable from the node
+        self.assertRaises(AttributeError, getattr, leaf, 'set_subfield')
+
+        self.assertTrue(leaf.is_attr_set(NodeInternals.Mutable))
+        self.assertFalse(leaf.is_attr_set(NodeInternals.Finite))
+        self.assertRaises(ValueError, leaf.is_attr_set, 42)
+        self.assertEqual(leaf.get_subfield(1), 5)
+
+        top_copy = top.get_clone()
+        leaf_copy = top_copy['top/leaf$']
+        leaf_copy.clear_attr(NodeInternals.Mutable)
+        self.assertFalse(leaf_copy.is_attr_set(NodeInternals.Mutable))
+        self.assertTrue(leaf.is_attr_set(NodeInternals.Mutable))
+        self.assertEqual(top_copy.to_bytes(), top.to_bytes())
+
+    def test_compiled_internals_criteria(self):
+        leaf = Node('leaf', value_type=String(val_list=['AAA']))
+        leaf.clear_attr(NodeInternals.Mutable)
+        top = Node('top', subnodes=[leaf])
+        top.set_env(Env())
+
+        ic = NodeInternalsCriteria(negative_attrs=[NodeInternals.Mutable],
+                                   node_kinds=[NodeInternals_Term])
+        self.assertFalse(ic.is_compiled())
+        self.assertEqual(top.get_reachable_nodes(internals_criteria=ic), [leaf])
+        self.assertTrue(ic.is_compiled())
+
+        # Assignments and extensions recompile the criteria
+        ic.node_subkinds = [INT_str]
+        self.assertFalse(ic.is_compiled())
+        self.assertEqual(top.get_reachable_nodes(internals_criteria=ic), [])
+
+        ic = NodeInternalsCriteria(negative_node_kinds=[NodeInternals_Term])
+        self.assertEqual(top.get_reachable_nodes(internals_criteria=ic), [top])
+        ic.extend(NodeInternalsCriteria(mandatory_attrs=[NodeInternals.Mutable]))
+        self.assertTrue(ic.is_compiled())
+        self.assertEqual(top.get_reachable_nodes(internals_criteria=ic), [top])
+        ic.extend(NodeInternalsCriteria(node_kinds=[NodeInternals_TypedValue]))
+        self.assertEqual(top.get_reachable_nodes(internals_criteria=ic), [])
+
+    def test_reachable_nodes(self):
+        leaf1 = Node('leaf1', value_type=String(val_list=['AAA']))
+        leaf2 = Node('leaf2', value_type=String(val_list=['BBB']))
+        mid = Node('mid', subnodes=[leaf2])
+        top = Node('top', subnodes=[leaf1, mid])
+        top.set_env(Env())
+        top.freeze()
+
+        ic = NodeInternalsCriteria(mandatory_attrs=[NodeInternals.Mutable],
+                                   node_kinds=[NodeInternals_TypedValue])
+        self.assertEqual(top.get_reachable_nodes(internals_criteria=ic), [leaf1, leaf2])
+
+        leaf1.clear_attr(NodeInternals.Mutable)
+        self.assertEqual(top.get_reachable_nodes(internals_criteria=ic), [leaf2])
+
+        ic.node_kinds = [NodeInternals_NonTerm]
+        self.assertEqual(top.get_reachable_nodes(internals_criteria=ic), [mid, top])
+
+        leaf3 = Node('leaf3', value_type=String(val_list=['CCC']))
+        mid.set_subnodes_basic([leaf3])
+        top.unfreeze(dont_change_state=True)
+        self.assertEqual(top.get_reachable_nodes(path_regexp='mid/'), [leaf3])
+
+        # Nodes reachable through several paths are only returned once,
+        # in walking order when it is requested
+        shared = Node('shared', value_type=String(val_list=['S']))
+        a = Node('a', subnodes=[shared])
+        b = Node('b', subnodes=[shared])
+        dup = Node('dup', subnodes=[a, b])
+        dup.set_env(Env())
+        dup.freeze()
+        self.assertEqual(dup.get_reachable_nodes(internals_criteria=ic, respect_order=True),
+                         [dup, a, b])
+        self.assertEqual([n.name for n in dup.get_reachable_nodes()], ['a', 'b', 'dup', 'shared'])
+
+    def test_path_index(self):
+        leaf1 = Node('leaf1', value_type=String(val_list=['AAA']))
+        leaf2 = Node('leaf2', value_type=String(val_list=['BBB']))
+        mid = Node('mid', subnodes=[leaf2])
+        top = Node('top', subnodes=[leaf1, mid])
+        top.set_env(Env())
+        top.freeze()
+
+        self.assertEqual(leaf2.get_path_from(top), 'top/mid/leaf2')
+        self.assertIs(top.get_node_by_path(path='top/mid/leaf2'), leaf2)
+        index = top._path_index
+
+        # Value changes do not affect the index
+        leaf2.set_values(['XXX'])
+        top.freeze()
+        self.assertEqual(leaf2.get_all_paths_from(top), ['top/mid/leaf2'])
+        self.assertIs(top._path_index, index)
+
+        # Structure changes do
+        leaf3 = Node('leaf3', value_type=String(val_list=['CCC']))
+        mid.set_subnodes_basic([leaf3])
+        top.unfreeze(dont_change_state=True)
+        top.freeze()
+        self.assertIsNone(leaf2.get_path_from(top))
+        self.assertIs(top.get_node_by_path(path='top/mid/leaf3'), leaf3)
+        self.assertIsNot(top._path_index, index)
+
+        alt = Node('alt', value_type=String(val_list=['ALT']))
+        mid.add_conf('ALT')
+        mid.set_subnodes_basic([alt], conf='ALT')
+        top.set_current_conf('ALT')
+        self.assertEqual(alt.get_path_from(top), 'top/mid/alt')
+        self.assertIsNone(top.get_node_by_path(path='top/mid/leaf3'))
+
+    def test_clone_shared_attrs(self):
+        leaf = Node('leaf', value_type=String(val_list=['AAA']))
+        top = Node('top', subnodes=[leaf])
+        top.set_env(Env())
+
+        clone = top.get_clone()
+        clone_leaf = clone['top/leaf']
+        self.assertIsNot(clone_leaf.cc, leaf.cc)
+
+        # Attributes are shared until one of the nodes alters them
+        clone_leaf.clear_attr(NodeInternals.Mutable)
+        self.assertFalse(clone_leaf.is_attr_set(NodeInternals.Mutable))
+        self.assertTrue(leaf.is_attr_set(NodeInternals.Mutable))
+
+        leaf.clear_attr(NodeInternals.Freezable)
+        self.assertFalse(leaf.is_attr_set(NodeInternals.Freezable))
+        self.assertTrue(clone_leaf.is_attr_set(NodeInternals.Freezable))
+
+
 class TestNode_NonTerm(unittest.TestCase):
 
     @classmethod
@@ -3508,6 +3820,1065 @@ class TestFMK(unittest.TestCase):
 
         self.assertEqual(idx, expected_idx)
 
+    def test_generation_pool(self):
+        def walk_info(d):
+            info = d.info[('sd_fuzz_typed_nodes', 'tTYPE')][0]
+            return [i for i in info if i.startswith(('model walking index', 'current fuzzed node'))]
+
+        # The walk of tTYPE is split by node among 3 workers, or in ranges
+        # of 4 steps when it does not start from the first step
+        for ui in [UI(runs_per_node=1), UI(runs_per_node=1, init=5)]:
+            act = ['OFF_GEN', ('tTYPE', ui)]
+
+            fmk.cleanup_all_dmakers(reset_existing_seed=True)
+            random.seed(42)
+            outcomes = []
+            for j in range(100):
+                d = fmk.get_data(act, save_seed=True)
+                if d is None:
+                    break
+                outcomes.append(walk_info(d))
+            end_errors = [e.code for e in fmk.get_error()]
+            fmk.cleanup_all_dmakers(reset_existing_seed=True)
+
+            pool = fmk.get_generation_pool(act, nb_workers=3, chunk_size=4, seed=42)
+            try:
+                data_list = list(pool)
+            finally:
+                pool.stop()
+
+            # the end of the walk is reported as in the sequential case
+            self.assertEqual([e.code for e in fmk.get_error()], end_errors)
+            self.assertEqual([walk_info(d) for d in data_list], outcomes)
+
+        # The errors of the workers are reported
+        pool = fmk.get_generation_pool(['OFF_GEN', 'NONEXISTENT'], nb_workers=2, chunk_size=4)
+        try:
+            data_list = list(pool)
+        finally:
+            pool.stop()
+        self.assertEqual(data_list, [])
+        self.assertTrue(fmk.is_not_ok())
+        fmk.get_error()
+
+        # Only one stateful disruptor can be split
+        self.assertIsNone(fmk.get_generation_pool(['OFF_GEN', 'tTYPE', 'tWALK'], nb_workers=2))
+        fmk.get_error()
+
+    def test_fmkdb_batched_writes(self):
+        tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(tmp_dir, 'fmkDB.db')
+        db = Database(fmkdb_path=db_path, commit_batch_size=100, commit_period=60)
+        try:
+            self.assertTrue(db.start())
+            db.insert_data_model('dm')
+            db.insert_project('prj')
+            db.insert_dmaker('dm', 'GEN', 'g', True, True)
+            db.insert_dmaker('dm', 'tTYPE', 'd', False, True)
+            ids = [db.insert_data('GEN', 'dm', ('data%d' % i).encode(), 5, None, None, 'tg', 'prj')
+                   for i in range(4)]
+            self.assertEqual(ids, [1, 2, 3, 4])
+            db.insert_multiple_steps([(4, 1, 'GEN', 'g', None, None, b'info'),
+                                      (4, 2, 'tTYPE', 'd', None, None, None)])
+            db.insert_multiple_feedback(4, 'src', [(None, b'fbk1'), (None, b'fbk2')], status_code=-1)
+            self.assertEqual(len(db.last_feedback['src']), 2)
+
+            # Not yet committed
+            ret = db.execute_sql_statement('SELECT COUNT(*) FROM STEPS')
+            self.assertEqual(ret[0][0], 2)
+            con = sqlite3.connect(db_path)
+            try:
+                self.assertEqual(con.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+                self.assertEqual(con.execute('SELECT COUNT(*) FROM DATA').fetchone()[0], 0)
+                db.stop()
+                self.assertEqual(con.execute('SELECT COUNT(*) FROM DATA').fetchone()[0], 4)
+                self.assertEqual(con.execute('SELECT COUNT(*) FROM FEEDBACK').fetchone()[0], 2)
+            finally:
+                con.close()
+
+            # DATA IDs are preallocated from the existing records
+            db = Database(fmkdb_path=db_path)
+            self.assertTrue(db.start())
+            self.assertEqual(db.insert_data('GEN', 'dm', b'data', 4, None, None, 'tg', 'prj'), 5)
+        finally:
+            db.stop()
+            shutil.rmtree(tmp_dir)
+
+    def test_fmkdb_indexed_analysis(self):
+        tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(tmp_dir, 'fmkDB.db')
+        db = Database(fmkdb_path=db_path)
+        try:
+            self.assertTrue(db.start())
+            db.insert_data_model('dm')
+            db.insert_project('prj')
+            db.insert_dmaker('dm', 'GEN', 'g', True, True)
+            db.insert_dmaker('dm', 'tTYPE', 'd', False, True)
+            db.insert_dmaker('dm', 'CGEN', 'g', True, True, clone_type='GEN')
+            for i in range(6):
+                db.insert_data('CGEN' if i == 5 else 'GEN', 'dm', b'data', 4, None, None,
+                               'tg%d' % (i % 2), 'prj')
+            db.insert_feedback(2, 'src', None, b'crash', status_code=-1)
+            db.insert_feedback(3, 'src', None, b' \n', status_code=0)
+            db.stop()
+
+            # Turn it into a database created before schema versioning
+            con = sqlite3.connect(db_path)
+            con.executescript("DROP TABLE SHARDS; DELETE FROM CONF WHERE ITEM == 'SHARD_START';"
+                              "DROP TRIGGER PAYLOADS_REFS_INSERT; DROP TRIGGER PAYLOADS_REFS_DELETE;"
+                              "ALTER TABLE DATA DROP COLUMN CONTENT_HASH;"
+                              "DROP TABLE PAYLOADS; DROP TABLE DICTIONARIES;"
+                              "DROP TABLE DATA_STATS; DROP TRIGGER DATA_STATS_INSERT;"
+                              "DROP TRIGGER DATA_STATS_DELETE; DROP INDEX FEEDBACK_DATA_ID_IDX;"
+                              "DROP INDEX FEEDBACK_STATUS_SOURCE_IDX;"
+                              "DELETE FROM CONF WHERE ITEM == 'SCHEMA_VERSION';")
+            con.close()
+
+            db = Database(fmkdb_path=db_path)
+            self.assertTrue(db.start())
+            ret = db.execute_sql_statement("SELECT VALUE FROM CONF WHERE ITEM == 'SCHEMA_VERSION'")
+            self.assertEqual(ret[0][0], Database.SCHEMA_VERSION)
+            db.insert_data('GEN', 'dm', b'data', 4, None, None, 'tg0', 'prj')
+            db.remove_data(1, colorized=False)
+            ret = db.execute_sql_statement("SELECT TARGET, TYPE, TOTAL FROM STATS_BY_TARGET "
+                                           "ORDER BY TARGET ASC;")
+            self.assertEqual(ret, [('tg0', 'GEN', 3), ('tg1', 'GEN', 3)])
+            self.assertEqual(db.execute_sql_statement("SELECT * FROM STATS;"), [('GEN', 6)])
+
+            self.assertEqual(db.get_data_with_impact(display=False), [2])
+            self.assertEqual(db.get_data_without_fbk(display=False), [3, 5, 7, 4, 6])
+            self.assertEqual(db.get_data_with_specific_fbk('cra', display=False), [2])
+
+            for stmt in ["SELECT DATA_ID, STATUS, SOURCE FROM FEEDBACK WHERE STATUS < 0;",
+                         "SELECT * FROM FEEDBACK WHERE DATA_ID == 2;",
+                         "SELECT * FROM STEPS WHERE DATA_ID == 2;",
+                         "SELECT * FROM COMMENTS WHERE DATA_ID == 2;",
+                         "SELECT * FROM FMKINFO WHERE DATA_ID == 2;",
+                         "SELECT ID FROM DATA WHERE PRJ_NAME == 'prj';",
+                         "SELECT ID FROM DATA WHERE 0 <= SENT_DATE and SENT_DATE <= 1;",
+                         "SELECT DATA.ID FROM DATA WHERE NOT EXISTS (SELECT 1 FROM FEEDBACK "
+                         "WHERE FEEDBACK.DATA_ID == DATA.ID);",
+                         "SELECT * FROM STATS_BY_TARGET;"]:
+                plan = db.get_query_plan(stmt)
+                self.assertTrue(plan)
+                for step in plan:
+                    for table in ('FEEDBACK', 'STEPS', 'COMMENTS', 'FMKINFO'):
+                        self.assertFalse(step.startswith('SCAN ' + table), (stmt, plan))
+                    if 'WHERE' in stmt and 'NOT EXISTS' not in stmt:
+                        self.assertFalse(step.startswith('SCAN DATA'), (stmt, plan))
+        finally:
+            db.stop()
+            shutil.rmtree(tmp_dir)
+
+    def test_fmkdb_streaming(self):
+        tmp_dir = tempfile.mkdtemp()
+        db = Database(fmkdb_path=os.path.join(tmp_dir, 'fmkDB.db'))
+        export_folder = gr.exported_data_folder
+        try:
+            self.assertTrue(db.start())
+            db.insert_data_model('dm')
+            db.insert_project('prj')
+            db.insert_dmaker('dm', 'GEN', 'g', True, True)
+            db.insert_dmaker('dm', 'CGEN', 'g', True, True, clone_type='GEN')
+            for i in range(1, 26):
+                content = b'' if i == 3 else ('content%d' % i).encode() * 10
+                db.insert_data('CGEN' if i == 7 else 'GEN', 'dm', content, len(content),
+                               None, None, 'tg', 'prj')
+            db.insert_data('UNKNOWN', 'dm', b'x', 1, None, None, 'tg', 'prj')
+
+            records = list(db.iter_data(start_id=2, batch_size=4))
+            self.assertEqual([rec[0] for rec in records], list(range(2, 26)))
+            self.assertEqual(records[0], (2, b'content2' * 10, 'GEN', 'g', 'dm'))
+            self.assertEqual(records[5][2:4], ('GEN', 'g'))
+            self.assertEqual(db.fetch_data(start_id=10, end_id=12),
+                             list(db.iter_data(start_id=10, end_id=12, batch_size=1)))
+            lazy = list(db.iter_data(end_id=5, with_content=False))
+            self.assertEqual([rec[1] for rec in lazy], [None] * 5)
+
+            self.assertEqual(db.read_data_content(12, offset=9, size=10), b'content12c')
+            self.assertEqual(db.read_data_content(12, offset=100), b'')
+            self.assertEqual(db.read_data_content(3), b'')
+            self.assertIsNone(db.read_data_content(1000))
+
+            gr.exported_data_folder = tmp_dir
+            buf = io.BytesIO()
+            db._export_data_content(11, buf, chunk_size=7)
+            self.assertEqual(buf.getvalue(), b'content11' * 10)
+            db.export_data(10, 12, colorized=False)
+            exported = sorted(os.listdir(os.path.join(tmp_dir, 'dm')))
+            self.assertEqual(len(exported), 3)
+            with open(os.path.join(tmp_dir, 'dm', exported[1]), 'rb') as f:
+                self.assertEqual(f.read(), b'content11' * 10)
+        finally:
+            gr.exported_data_folder = export_folder
+            db.stop()
+            shutil.rmtree(tmp_dir)
+
+    def test_fmkdb_dedup_storage(self):
+        tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(tmp_dir, 'fmkDB.db')
+        db = Database(fmkdb_path=db_path, compression='zlib')
+        try:
+            self.assertTrue(db.start())
+            db.insert_data_model('dm')
+            db.insert_project('prj')
+            db.insert_dmaker('dm', 'GEN', 'g', True, True)
+            samples = [b'<header version="1.0"><body>' + str(i).encode() + b'</body></header>'
+                       for i in range(10)]
+            self.assertIsNotNone(db.train_dictionary('dm', samples))
+            self.assertTrue(db.has_dictionary('dm'))
+
+            payload = b'<header version="1.0"><body>' + b'A' * 5000 + b'</body></header>'
+            for i in range(3):
+                db.insert_data('GEN', 'dm', payload, len(payload), None, None, 'tg', 'prj')
+            db.insert_data('GEN', 'dm', b'\x01\x02', 2, None, None, 'tg', 'prj')
+
+            ret = db.execute_sql_statement(
+                "SELECT CODEC, DICT_ID IS NOT NULL, SIZE, REFS FROM PAYLOADS ORDER BY ID;")
+            self.assertEqual(ret, [('zlib', 1, len(payload), 3), (None, 0, 2, 1)])
+            nb_payloads, nb_data, emitted_sz, stored_sz = db.get_storage_stats()
+            self.assertEqual((nb_payloads, nb_data, emitted_sz), (2, 4, 3 * len(payload) + 2))
+            self.assertLess(stored_sz, 100)
+            db.display_stats(colorized=False)
+
+            self.assertEqual([rec[1] for rec in db.iter_data()], [payload] * 3 + [b'\x01\x02'])
+            self.assertEqual(db.read_data_content(2, offset=26, size=8), b'y>AAAAAA')
+            self.assertEqual(db.read_data_content(4, offset=1), b'\x02')
+            buf = io.BytesIO()
+            db._export_data_content(3, buf, chunk_size=100)
+            self.assertEqual(buf.getvalue(), payload)
+
+            # The payload is removed with its last reference
+            db.remove_data(4, colorized=False)
+            self.assertEqual(db.get_storage_stats()[:2], (1, 3))
+            db.insert_data('GEN', 'dm', b'\x01\x02', 2, None, None, 'tg', 'prj')
+            self.assertEqual(db.read_data_content(5), b'\x01\x02')
+            db.stop()
+
+            # DATA recorded before deduplication keep their own content
+            con = sqlite3.connect(db_path)
+            con.execute("INSERT INTO DATA(ID,TYPE,DM_NAME,CONTENT,TARGET,PRJ_NAME) "
+                        "VALUES(6,'GEN','dm',x'4142','tg','prj')")
+            con.commit()
+            con.close()
+            db = Database(fmkdb_path=db_path)
+            self.assertTrue(db.start())
+            self.assertEqual([rec[1] for rec in db.iter_data(start_id=5)], [b'\x01\x02', b'AB'])
+            self.assertEqual(db.read_data_content(6), b'AB')
+            self.assertEqual(db.read_data_content(2), payload)
+        finally:
+            db.stop()
+            shutil.rmtree(tmp_dir)
+
+    def test_fmkdb_commit_rollback(self):
+        tmp_dir = tempfile.mkdtemp()
+        db = Database(fmkdb_path=os.path.join(tmp_dir, 'fmkDB.db'))
+        try:
+            self.assertTrue(db.start())
+            db.insert_data_model('dm')
+            db.insert_project('prj')
+            db.insert_dmaker('dm', 'GEN', 'g', True, True)
+            self.assertTrue(db.commit())
+
+            # The foreign key violation is only detected when committing
+            db.execute_sql_statement("PRAGMA defer_foreign_keys = ON")
+            db.insert_data('GEN', 'dm', b'payload', 7, None, None, 'tg', 'prj')
+            db.insert_feedback(1000, 'src', None, b'fbk')
+            self.assertIsNone(db.commit())
+
+            # The payload of the rolled back transaction is inserted again
+            db.insert_data('GEN', 'dm', b'payload', 7, None, None, 'tg', 'prj')
+            self.assertTrue(db.commit())
+            self.assertEqual(db.read_data_content(2), b'payload')
+        finally:
+            db.stop()
+            shutil.rmtree(tmp_dir)
+
+    def test_fmkdb_shard_rotation(self):
+        tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(tmp_dir, 'fmkDB.db')
+        db = Database(fmkdb_path=db_path, shard_max_data=3)
+        try:
+            self.assertTrue(db.start())
+            db.insert_data_model('dm')
+            db.insert_project('prj')
+            db.insert_dmaker('dm', 'GEN', 'g', True, True)
+            for i in range(1, 9):
+                db.insert_data('GEN', 'dm', b'payload' * i, 7 * i, None, None, 'tg', 'prj')
+                db.insert_feedback(i, 'src', datetime.datetime.now(), b'fbk', -1 if i % 2 else 0)
+            # Feedback may be received after the rotation
+            db.insert_feedback(3, 'late', datetime.datetime.now(), b'fbk', -2)
+
+            shards = db.get_shards()
+            self.assertEqual([rec[:3] for rec in shards],
+                             [('fmkDB.1-3.db', 1, 3), ('fmkDB.4-6.db', 4, 6)])
+            for path, _, _, _, _ in shards:
+                self.assertTrue(os.path.isfile(os.path.join(tmp_dir, path)))
+            db.display_shards(colorized=False)
+
+            self.assertEqual([(rec[0], rec[1]) for rec in db.iter_data(batch_size=2)],
+                             [(i, b'payload' * i) for i in range(1, 9)])
+            self.assertEqual(db.get_data_with_impact(display=False), [1, 3, 5, 7])
+            self.assertEqual(db.execute_sql_statement("SELECT TOTAL FROM STATS_BY_TARGET;"),
+                             [(8,)])
+            self.assertEqual(db.read_data_content(2, offset=7, size=3), b'pay')
+            self.assertEqual(db.get_storage_stats()[:2], (8, 8))
+            db.display_data_info(1, with_data=True, with_fbk=True, colorized=False)
+
+            db.remove_data(3, colorized=False)
+            self.assertEqual(db.get_data_with_impact(display=False), [1, 5, 7])
+
+            db.set_shard_rotation(max_data=None)
+            db.insert_data('GEN', 'dm', b'last', 4, None, None, 'tg', 'prj')
+            db.stop()
+
+            # The shards are attached again and the IDs go on
+            db = Database(fmkdb_path=db_path)
+            self.assertTrue(db.start())
+            self.assertEqual([rec[0] for rec in db.iter_data(with_content=False)],
+                             [1, 2, 4, 5, 6, 7, 8, 9])
+            self.assertTrue(db.rotate_shard())
+            db.insert_data('GEN', 'dm', b'next', 4, None, None, 'tg', 'prj')
+            self.assertEqual(db.get_shards()[-1][:3], ('fmkDB.7-9.db', 7, 9))
+            db.stop()
+
+            # Archived shards are ignored
+            os.remove(os.path.join(tmp_dir, 'fmkDB.1-3.db'))
+            db = Database(fmkdb_path=db_path)
+            self.assertTrue(db.start())
+            self.assertEqual([rec[0] for rec in db.iter_data(with_content=False)],
+                             [4, 5, 6, 7, 8, 9, 10])
+            self.assertEqual(db.read_data_content(9), b'last')
+        finally:
+            db.stop()
+            shutil.rmtree(tmp_dir)
+
+    def test_fmkdb_parallel_analysis(self):
+        tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(tmp_dir, 'fmkDB.db')
+        db = Database(fmkdb_path=db_path, shard_max_data=10)
+        try:
+            self.assertTrue(db.start())
+            db.insert_data_model('dm')
+            db.insert_project('prj1')
+            db.insert_project('prj2')
+            db.insert_dmaker('dm', 'GEN', 'g', True, True)
+            for i in range(1, 31):
+                db.insert_data('GEN', 'dm', b'data', 4, None, None, 'tg%d' % (i % 3),
+                               'prj%d' % (i % 2 + 1))
+                if i % 4:
+                    db.insert_feedback(i, 'src%d' % (i % 2), None, b'error %d' % i,
+                                       status_code=-(i % 3))
+
+            analyses = [
+                lambda: db.get_data_with_impact(display=False),
+                lambda: db.get_data_with_impact(prj_name='prj1', fbk_src='src1', display=False),
+                lambda: db.get_data_without_fbk(display=False),
+                lambda: db.get_data_with_specific_fbk('error 1', display=False),
+                lambda: db._get_analysis_records(
+                    "SELECT DATA.ID, DATA.TARGET, DATA.PRJ_NAME, FEEDBACK.SOURCE FROM FEEDBACK "
+                    "INNER JOIN DATA ON DATA.ID == FEEDBACK.DATA_ID", [], []),
+            ]
+            expected = [analysis() for analysis in analyses]
+            self.assertEqual(len(db.get_shards()), 2)
+
+            db.set_analysis_workers(2)
+            db.ANALYSIS_PARTITION_MIN_SIZE = 4
+            self.assertEqual(db._get_analysis_partitions(),
+                             [(1, 5), (6, 10), (11, 15), (16, 20), (21, 25), (26, 30)])
+            self.assertEqual([analysis() for analysis in analyses], expected)
+        finally:
+            db.stop()
+            shutil.rmtree(tmp_dir)
+
+    def test_network_target_feedback(self):
+        srv = socket.socket()
+        srv.bind(('127.0.0.1', 0))
+        srv.listen(1)
+        port = srv.getsockname()[1]
+
+        def echo_server():
+            c, _ = srv.accept()
+            while True:
+                d = c.recv(100)
+                if not d:
+                    break
+                c.sendall(b'ECHO:' + d)
+            c.close()
+
+        srv_thread = threading.Thread(target=echo_server)
+        srv_thread.start()
+
+        tg = NetworkTarget(host='127.0.0.1', port=port, hold_connection=True)
+        tg.set_logger(fmk.lg)
+        tg.set_timeout(fbk_timeout=5, sending_delay=1)
+        tg.feedback_length = 10
+        tg.start()
+        nb_threads = threading.active_count()
+        try:
+            for i in range(3):
+                tg.send_data(Data('data{:d}'.format(i).encode()), from_fmk=True)
+                t0 = datetime.datetime.now()
+                while not tg.is_target_ready_for_new_data():
+                    time.sleep(0.001)
+                # completed as soon as the expected length has been received
+                self.assertTrue((datetime.datetime.now() - t0).total_seconds() < 2)
+                fbk = [f for _, f, _ in tg.get_feedback().iter_and_cleanup_collector()]
+                self.assertEqual(fbk, [['ECHO:data{:d}'.format(i).encode()]])
+                self.assertEqual(threading.active_count(), nb_threads)
+        finally:
+            tg.stop()
+            srv_thread.join()
+            srv.close()
+
+    def test_network_target_connection_pool(self):
+        srv = socket.socket()
+        srv.bind(('127.0.0.1', 0))
+        srv.listen(5)
+        port = srv.getsockname()[1]
+        accepted = []
+
+        def echo_server():
+            while True:
+                c, _ = srv.accept()
+                accepted.append(c)
+                d = c.recv(100)
+                if d == b'stop':
+                    c.close()
+                    break
+                # the target closes the connection after answering to 'bye!!'
+                while d:
+                    c.sendall(b'ECHO:' + d)
+                    if d == b'bye!!':
+                        break
+                    d = c.recv(100)
+                c.close()
+
+        srv_thread = threading.Thread(target=echo_server)
+        srv_thread.start()
+
+        tg = NetworkTarget(host='127.0.0.1', port=port, pool_connections=True)
+        tg.set_logger(fmk.lg)
+        tg.set_timeout(fbk_timeout=5, sending_delay=1)
+        tg.feedback_length = 10
+        tg.start()
+
+        def send(msg):
+            tg.send_data(Data(msg), from_fmk=True)
+            while not tg.is_target_ready_for_new_data():
+                time.sleep(0.001)
+            return [f for _, f, _ in tg.get_feedback().iter_and_cleanup_collector()]
+
+        try:
+            for i in range(3):
+                self.assertEqual(send('data{:d}'.format(i).encode()),
+                                 [['ECHO:data{:d}'.format(i).encode()]])
+            self.assertEqual(send(b'bye!!'), [[b'ECHO:bye!!']])
+            self.assertEqual(len(accepted), 1)
+            time.sleep(0.1)
+            # the closed connection is detected when checked out
+            self.assertEqual(send(b'data3'), [[b'ECHO:data3']])
+            self.assertEqual(len(accepted), 2)
+        finally:
+            tg.stop()
+            socket.create_connection(('127.0.0.1', port)).sendall(b'stop')
+            srv_thread.join()
+            srv.close()
+
+    def test_network_target_large_payload(self):
+        srv = socket.socket()
+        srv.bind(('127.0.0.1', 0))
+        srv.listen(1)
+        port = srv.getsockname()[1]
+        received = []
+
+        def server():
+            c, _ = srv.accept()
+            while True:
+                d = c.recv(1 << 20)
+                if not d:
+                    break
+                received.append(d)
+                # slow reader: the send buffer of the target fills up
+                time.sleep(0.001)
+            c.close()
+
+        srv_thread = threading.Thread(target=server)
+        srv_thread.start()
+
+        payload = b''.join(struct.pack('>I', i) for i in range(4 << 20))
+        tg = NetworkTarget(host='127.0.0.1', port=port, hold_connection=True)
+        tg.set_logger(fmk.lg)
+        tg.set_timeout(fbk_timeout=0.1, sending_delay=0.05)
+        tg.start()
+        try:
+            tg.send_data(Data(payload), from_fmk=True)
+            while not tg.is_target_ready_for_new_data():
+                time.sleep(0.001)
+        finally:
+            tg.stop()
+            srv_thread.join()
+            srv.close()
+
+        self.assertEqual(b''.join(received), payload)
+
+    def test_network_target_send_stall(self):
+        srv = socket.socket()
+        srv.bind(('127.0.0.1', 0))
+        srv.listen(1)
+        port = srv.getsockname()[1]
+        accepted = []
+        srv_thread = threading.Thread(target=lambda: accepted.append(srv.accept()[0]))
+        srv_thread.start()
+
+        tg = NetworkTarget(host='127.0.0.1', port=port, hold_connection=True)
+        tg.SEND_STALL_TIMEOUT = 0.3
+        tg.set_logger(fmk.lg)
+        tg.set_timeout(fbk_timeout=0.1, sending_delay=0.05)
+        tg.start()
+        try:
+            # the target never reads: the send is given up after the stall timeout
+            t0 = time.time()
+            tg.send_data(Data(b'\x00' * (64 << 20)), from_fmk=True)
+            self.assertLess(time.time() - t0, 1.5)
+        finally:
+            tg.stop()
+            srv_thread.join()
+            for c in accepted:
+                c.close()
+            srv.close()
+
+    def test_wait_for_fds(self):
+        r, w = socket.socketpair()
+        high_fd = None
+        try:
+            self.assertEqual(wait_for_fds([r], select.POLLIN, 0.05), [])
+            self.assertEqual(wait_for_fds([r, w], select.POLLOUT, 0), [r, w])
+            w.sendall(b'x')
+            self.assertEqual(wait_for_fds([r], select.POLLIN, None), [r])
+            # unlike select.select(), file descriptors beyond FD_SETSIZE are supported
+            try:
+                high_fd = os.dup2(r.fileno(), 2000) or 2000
+            except OSError:
+                self.skipTest('RLIMIT_NOFILE too low')
+            self.assertEqual(wait_for_fds([high_fd], select.POLLIN, 0), [high_fd])
+        finally:
+            if high_fd is not None:
+                os.close(high_fd)
+            r.close()
+            w.close()
+
+    def test_network_target_feedback_completion(self):
+        srv = socket.socket()
+        srv.bind(('127.0.0.1', 0))
+        srv.listen(1)
+        port = srv.getsockname()[1]
+
+        answers = {
+            b'delim': [b'part1', b'part2\r\n'],
+            b'header': [b'AB\x00', b'\x03xy', b'z'],
+            b'idle': [b'some'],
+        }
+
+        def server():
+            c, _ = srv.accept()
+            while True:
+                d = c.recv(100)
+                if not d:
+                    break
+                for chunk in answers[d]:
+                    c.sendall(chunk)
+                    time.sleep(0.05)
+            c.close()
+
+        srv_thread = threading.Thread(target=server)
+        srv_thread.start()
+
+        header = Node('hdr', subnodes=[Node('magic', values=['AB']),
+                                       Node('len', value_type=UINT16_be())])
+        header.set_env(Env())
+
+        tg = NetworkTarget(host='127.0.0.1', port=port, hold_connection=True)
+        tg.set_logger(fmk.lg)
+        tg.set_timeout(fbk_timeout=5, sending_delay=1)
+        self.assertEqual(tg.get_feedback_completion_stats(), {})
+        tg.start()
+
+        def send(msg, completion):
+            tg.set_feedback_completion(completion)
+            tg.send_data(Data(msg), from_fmk=True)
+            t0 = datetime.datetime.now()
+            while not tg.is_target_ready_for_new_data():
+                time.sleep(0.001)
+            self.assertTrue((datetime.datetime.now() - t0).total_seconds() < 2)
+            return [f for _, f, _ in tg.get_feedback().iter_and_cleanup_collector()]
+
+        try:
+            self.assertEqual(send(b'delim', FeedbackCompletion(delimiter=b'\r\n')),
+                             [[b'part1\npart2\r\n']])
+            self.assertEqual(send(b'header', FeedbackCompletion(header=header, length_path='len$')),
+                             [[b'AB\x00\n\x03xy\nz']])
+            self.assertEqual(send(b'idle', FeedbackCompletion(idle_gap=0.2)),
+                             [[b'some']])
+            stats = list(tg.get_feedback_completion_stats().values())[0]
+            self.assertEqual((stats['completed'], stats['timed_out']), (3, 0))
+        finally:
+            tg.stop()
+            srv_thread.join()
+            srv.close()
+
+    def test_network_target_server_mode(self):
+        s = socket.socket()
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+        s.close()
+
+        tg = NetworkTarget(host='127.0.0.1', port=port, server_mode=True)
+        tg.set_logger(fmk.lg)
+        tg.set_timeout(fbk_timeout=2, sending_delay=1)
+        handler_threads = []
+        handle_connection = tg._handle_target_connection
+
+        def record_thread(*args, **kwargs):
+            handler_threads.append(threading.current_thread().name)
+            return handle_connection(*args, **kwargs)
+
+        tg._handle_target_connection = record_thread
+        received = []
+
+        def client():
+            c = socket.create_connection(('127.0.0.1', port), timeout=5)
+            received.append(c.recv(100))
+            c.sendall(b'ECHO:' + received[0])
+            time.sleep(0.5)
+            c.close()
+
+        tg.start()
+        client_thread = threading.Thread(target=client)
+        try:
+            client_thread.start()
+            tg.send_data(Data(b'hello'), from_fmk=True)
+            t0 = datetime.datetime.now()
+            while not tg.is_target_ready_for_new_data():
+                time.sleep(0.001)
+            self.assertTrue((datetime.datetime.now() - t0).total_seconds() < 3)
+            fbk = [f for _, f, _ in tg.get_feedback().iter_and_cleanup_collector()]
+            self.assertEqual(received, [b'hello'])
+            self.assertEqual(fbk, [[b'ECHO:hello']])
+            # the connection handler does not run on the reactor thread
+            self.assertEqual(handler_threads, ['SRV-Handler'])
+        finally:
+            client_thread.join()
+            tg.stop()
+
+    def _make_local_apps(self, **scripts):
+        """
+        Write the shell scripts of the applications run by the local targets of a
+        test, within a temporary folder removed at the end of the test.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        apps = {}
+        for name, script in scripts.items():
+            apps[name] = os.path.join(tmp_dir, name + '.sh')
+            with open(apps[name], 'w') as f:
+                f.write('#!/bin/sh\n' + script.format(tmp_dir=tmp_dir))
+            os.chmod(apps[name], 0o755)
+        return apps
+
+    @staticmethod
+    def _run_local_test_case(tg, msg, delay=2):
+        tg.send_data(Data(msg))
+        fbk = tg.get_feedback(delay=delay)
+        outcome = (fbk.get_error_code(), fbk.get_bytes())
+        fbk.cleanup()
+        list(fbk.iter_and_cleanup_collector())
+        tg.cleanup()
+        return outcome
+
+    def test_local_target_fork_server(self):
+        app = self._make_local_apps(app='grep -q crash "$1" && kill -SEGV $$\ncat "$1"\n')['app']
+
+        tg = LocalTarget(tmpfile_ext='.txt', target_path=app, fork_server=True)
+        try:
+            self.assertTrue(tg.start())
+            stub_pid = tg._fork_server._stub.pid
+            self.assertEqual(self._run_local_test_case(tg, b'hello'), (0, b'hello'))
+            self.assertEqual(self._run_local_test_case(tg, b'crash'), (-signal.SIGSEGV, b''))
+            self.assertEqual(self._run_local_test_case(tg, b'world'), (0, b'world'))
+
+            # the application is run by the same fork server for each test case
+            self.assertEqual(tg._fork_server._stub.pid, stub_pid)
+
+            # a new command line is provided to the same fork server
+            tg.set_post_args('extra')
+            self.assertEqual(self._run_local_test_case(tg, b'again'), (0, b'again'))
+            self.assertEqual(tg._fork_server._stub.pid, stub_pid)
+
+            # a process reaped by the stub is not signaled anymore (its PID may be reused)
+            child = tg._fork_server.run()
+            select.select([tg._fork_server._st_fd], [], [], 2)
+            child.kill()
+            self.assertEqual(child.returncode, 0)
+
+            # a broken fork server does not make the test case look like a crash
+            st_r, st_w = os.pipe()
+            os.close(st_w)
+            os.close(tg._fork_server._st_fd)
+            tg._fork_server._st_fd = st_r
+            tg.send_data(Data(b'fallback'))
+            self.assertIsNone(tg._fork_server)
+            fbk = tg.get_feedback(delay=2)
+            self.assertEqual((fbk.get_error_code(), fbk.get_bytes()), (0, b'fallback'))
+            tg.cleanup()
+            self.assertEqual(self._run_local_test_case(tg, b'restarted'), (0, b'restarted'))
+            self.assertNotEqual(tg._fork_server._stub.pid, stub_pid)
+        finally:
+            tg.stop()
+
+    def test_local_target_delivery_modes(self):
+        app = self._make_local_apps(
+            app='if [ -n "$1" ]; then exec cat "$1"; else exec cat; fi\n')['app']
+
+        for fork_server in (False, True):
+            for mode in DataDelivery.modes:
+                tg = LocalTarget(tmpfile_ext='.txt', target_path=app,
+                                 fork_server=fork_server, delivery_mode=mode)
+                tg.start()
+                paths = set()
+                try:
+                    for i in range(3):
+                        msg = '{:s} test case {:d}'.format(mode, i).encode('ascii')
+                        self.assertEqual(self._run_local_test_case(tg, msg), (0, msg))
+                        paths.add(tg._delivery.path())
+                        if tg._delivery._anon_fd is not None:
+                            # only handed over to the programs through pass_fds
+                            self.assertFalse(os.get_inheritable(tg._delivery._anon_fd))
+                    self.assertEqual(len(paths), 3 if mode == DataDelivery.RING else 1)
+                finally:
+                    tg.stop()
+                if mode == DataDelivery.RING:
+                    self.assertFalse([p for p in paths if os.path.exists(p)])
+
+        act = ['TESTNODE', ('EXT', None, UI(cmd='/bin/cat', delivery='stdin'))]
+        d = fmk.get_data(act)
+        self.assertIsNotNone(d)
+        fmk.cleanup_dmaker(dmaker_type='TESTNODE', reset_existing_seed=True)
+
+    def test_local_target_output_capture(self):
+        app = self._make_local_apps(
+            app='sleep 0.3\nhead -c 1000000 /dev/zero | tr "\\0" "a"\ncat "$1"\n')['app']
+
+        for fork_server in (False, True):
+            tg = LocalTarget(tmpfile_ext='.txt', target_path=app, fork_server=fork_server,
+                             output_buffer_size=1000)
+            tg.set_error_patterns([re.compile(b'ASS?ERT'), b'panic'])
+            try:
+                tg.start()
+                for msg, err_code in [(b'fine', 0), (b'ASSERT failed', -1), (b'kernel panic', -1)]:
+                    t0 = time.time()
+                    # output produced after a while is not lost, and the feedback
+                    # is complete as soon as the application exits (long before
+                    # the delay)
+                    self.assertEqual(self._run_local_test_case(tg, msg, delay=60),
+                                     (err_code, b'a' * (1000 - len(msg)) + msg))
+                    self.assertLess(time.time() - t0, 30)
+            finally:
+                tg.stop()
+
+    def test_local_pool_target(self):
+        # each instance records when it starts and ends
+        app = self._make_local_apps(
+            app='f="$1"\nstamp() {{ date +%s.%N > "{tmp_dir}/$(cat "$f").$1"; }}\n'
+                'stamp start\nsleep 0.3\n'
+                'grep -q crash "$1" && {{ stamp end; kill -SEGV $$; }}\n'
+                'grep -q hang "$1" && sleep 5\ncat "$1"\nstamp end\n')['app']
+        stamps_dir = os.path.dirname(app)
+
+        def stamp(msg, event):
+            with open(os.path.join(stamps_dir, '{:s}.{:s}'.format(msg, event))) as f:
+                return float(f.read())
+
+        tg = LocalPoolTarget(tmpfile_ext='.txt', target_path=app, instances=4, exec_timeout=1)
+        try:
+            self.assertTrue(tg.start())
+            data_list = [Data(m) for m in [b'first', b'crash', b'third', b'hang', b'fifth']]
+            tg.send_multiple_data(data_list[:4])
+            self.assertFalse(tg.is_target_ready_for_new_data())
+            tg.send_data(data_list[4])
+            self.assertTrue(tg.wait_for_instances(timeout=10))
+
+            # the 4 first instances run concurrently and the last one waits
+            # for a free slot
+            first_starts = [stamp(m, 'start') for m in ('first', 'crash', 'third', 'hang')]
+            first_end = min(stamp(m, 'end') for m in ('first', 'crash', 'third'))
+            self.assertLess(max(first_starts), first_end)
+            self.assertGreaterEqual(stamp('fifth', 'start'), first_end)
+
+            fbk = {}
+            for d, ref, f, _, status in tg.get_feedback().iter_and_cleanup_data_fbk():
+                fbk.setdefault(d.to_bytes(), []).append((ref, f, status))
+
+            self.assertEqual(fbk[b'first'], [('LocalTarget[stdout]', b'first', 0)])
+            self.assertEqual(fbk[b'third'], [('LocalTarget[stdout]', b'third', 0)])
+            self.assertEqual(fbk[b'fifth'], [('LocalTarget[stdout]', b'fifth', 0)])
+            self.assertEqual([status for _, _, status in fbk[b'crash']], [-signal.SIGSEGV])
+            self.assertEqual([status for _, _, status in fbk[b'hang']], [-4])
+        finally:
+            tg.stop()
+
+    def test_local_pool_target_exit_wait(self):
+        # the application closes its outputs long before exiting
+        app = self._make_local_apps(app='cat "$1"\nexec >&- 2>&-\nsleep 0.5\nexit 3\n')['app']
+
+        tg = LocalPoolTarget(tmpfile_ext='.txt', target_path=app, instances=1, exec_timeout=5)
+        completion_calls = []
+        complete_instance = tg._complete_instance
+
+        def count_calls(slot, app):
+            completion_calls.append(app.poll())
+            return complete_instance(slot, app)
+
+        tg._complete_instance = count_calls
+        try:
+            self.assertTrue(tg.start())
+            tg.send_data(Data(b'output'))
+            self.assertTrue(tg.wait_for_instances(timeout=5))
+            fbk = [(ref, f, status) for _, ref, f, _, status
+                   in tg.get_feedback().iter_and_cleanup_data_fbk()]
+            self.assertEqual(fbk, [('LocalTarget[stdout]', b'output', 0)])
+            self.assertEqual(completion_calls[-1], 3)
+            if hasattr(os, 'pidfd_open'):
+                # the exit is notified by the pidfd instead of being polled
+                self.assertEqual(completion_calls, [None, 3])
+            self.assertIsNone(tg._slots[0].pidfd)
+        finally:
+            tg.stop()
+
+    def test_logger_data_feedback(self):
+        tmp_dir = tempfile.mkdtemp()
+        db = Database(fmkdb_path=os.path.join(tmp_dir, 'fmkDB.db'))
+        lg = Logger(name='test', enable_file_logging=False)
+        lg.fmkDB = db
+        try:
+            self.assertTrue(db.start())
+            db.insert_data_model(Database.DEFAULT_DM_NAME)
+            db.insert_project('prj')
+            lg.start()
+            recorded, unrecorded = Data(b'recorded'), Data(b'unrecorded')
+            lg.log_data(recorded)
+            self.assertEqual(lg.commit_log_entry(None, 'prj', 'tg'), 1)
+            self.assertEqual(recorded.get_data_id(), 1)
+
+            lg.log_data(unrecorded)
+            lg._reset_current_state()
+            self.assertIsNone(unrecorded.get_data_id())
+
+            now = datetime.datetime.now()
+            lg.log_target_feedback_from(b'crash', now, source='src', status_code=-1,
+                                        data=unrecorded)
+            lg.log_target_feedback_from(b'ok', now, source='src', status_code=0, data=recorded)
+            self.assertEqual(db.execute_sql_statement("SELECT DATA_ID, CONTENT FROM FEEDBACK"),
+                             [(1, b'ok')])
+        finally:
+            lg.stop()
+            db.stop()
+            shutil.rmtree(tmp_dir)
+
+    def test_logger_data_id(self):
+        tmp_dir = tempfile.mkdtemp()
+        db = Database(fmkdb_path=os.path.join(tmp_dir, 'fmkDB.db'))
+        lg = Logger(name='test', enable_file_logging=False, explicit_data_recording=True)
+        lg.fmkDB = db
+        try:
+            self.assertTrue(db.start())
+            db.insert_data_model(Database.DEFAULT_DM_NAME)
+            db.insert_project('prj')
+            lg.start()
+            fetched = Data(b'fetched')
+            fetched.set_data_id(5)
+
+            # not recorded again: the data keeps the ID of its FmkDB record
+            lg.log_data(fetched)
+            self.assertIsNone(lg.commit_log_entry(None, 'prj', 'tg'))
+            self.assertEqual(fetched.get_data_id(), 5)
+
+            # recorded again: the ID of the new record replaces it
+            fetched.make_recordable()
+            lg.log_data(fetched)
+            self.assertEqual(lg.commit_log_entry(None, 'prj', 'tg'), 1)
+            self.assertEqual(fetched.get_data_id(), 1)
+
+            # the recording fails: the previous ID does not identify this emission
+            db.disable()
+            lg.log_data(fetched)
+            self.assertIsNone(lg.commit_log_entry(None, 'prj', 'tg'))
+            self.assertIsNone(fetched.get_data_id())
+        finally:
+            lg.stop()
+            db.stop()
+            shutil.rmtree(tmp_dir)
+
+    def test_multi_target(self):
+        apps = self._make_local_apps(good='cat "$1"\n',
+                                     bad='grep -q crash "$1" && kill -SEGV $$\ncat "$1"\n')
+
+        class SlowTarget(EmptyTarget):
+            def send_data(self, data, from_fmk=False):
+                self.sending = (time.time(), )
+                time.sleep(0.3)
+                self.sending += (time.time(), )
+
+        slow_targets = [SlowTarget(), SlowTarget()]
+        tg = MultiTarget([LocalTarget('.txt', target_path=apps['good']),
+                          LocalTarget('.txt', target_path=apps['bad'])] + slow_targets,
+                         names=['good', 'bad', 'slow1', 'slow2'])
+        tg.set_logger(fmk.lg)
+        try:
+            self.assertTrue(tg.start())
+            for msg in [b'hello', b'crash']:
+                d = Data(msg)
+                tg.send_data(d)
+                # the targets are stimulated concurrently
+                starts, ends = zip(*[slow_tg.sending for slow_tg in slow_targets])
+                self.assertLess(max(starts), min(ends))
+                fbk = {}
+                for fd, ref, f, _, status in tg.get_feedback().iter_and_cleanup_data_fbk():
+                    self.assertIs(fd, d)
+                    fbk.setdefault(ref.split('::')[0], []).append((ref, f, status))
+                tg.cleanup()
+
+                self.assertEqual(sorted(fbk.keys()), ['bad', 'good'])
+                self.assertEqual(fbk['good'], [('good', msg, 0)])
+                if msg == b'crash':
+                    self.assertEqual(fbk['bad'][-1][2], -signal.SIGSEGV)
+                    self.assertTrue(fbk['bad'][0][0].startswith('bad::Application['))
+                else:
+                    self.assertEqual(fbk['bad'], [('bad', msg, 0)])
+        finally:
+            tg.stop()
+
+    def test_sim_target_serial_feedback(self):
+        import pty
+        import tty
+
+        master, slave = pty.openpty()
+        tty.setraw(slave)
+
+        def fake_modem():
+            buf = b''
+            while True:
+                try:
+                    d = os.read(master, 1024)
+                except OSError:
+                    break
+                if not d:
+                    break
+                buf += d
+                if buf.endswith(b'AT+CMGS=23\r\n'):
+                    time.sleep(0.02)
+                    os.write(master, b'\r\n> ')
+                    buf = b''
+                elif buf.endswith(b'\x1a\r\n'):
+                    answer = b'+CMS ERROR: 500' if binascii.hexlify(b'DEAD').upper() in buf else b'+CMGS: 12\r\n\r\nOK'
+                    time.sleep(0.05)
+                    os.write(master, b'\r\n' + answer + b'\r\n')
+                    buf = b''
+
+        modem_thread = threading.Thread(target=fake_modem)
+        modem_thread.start()
+
+        class FbkLogger(object):
+            def __init__(self):
+                self.fbk = []
+            def collect_target_feedback(self, fbk, status_code=None):
+                self.fbk.append((fbk, status_code))
+
+        tel = Node('tel', value_type=GSMPhoneNum(val_list=['0600000000']))
+        tel.set_semantics(['tel num'])
+        ud = Node('ud', values=['BEEF'])
+        sms = Node('sms', subnodes=[tel, ud])
+        sms.set_env(Env())
+
+        tg = SIMTarget(serial_port=None, baudrate=115200, pin_code='0000',
+                       targeted_tel_num='0612345678')
+        tg.set_logger(FbkLogger())
+        tg.ser = os.fdopen(slave, 'r+b', 0)
+        try:
+            for user_data, code in [('BEEF', 0), ('DEAD', -1)]:
+                ud.set_values(val_list=[user_data])
+                t0 = datetime.datetime.now()
+                tg.send_data(Data(sms))
+                # feedback is complete on the final result code, before the
+                # feedback timeout
+                self.assertTrue((datetime.datetime.now() - t0).total_seconds() < 1)
+                fbk, status = tg._logger.fbk[-1]
+                self.assertEqual(status, code)
+                self.assertTrue(fbk.startswith(b'> '))
+        finally:
+            tg.stop()
+            os.close(master)
+            modem_thread.join()
+
+    def test_pipelined_generation(self):
+        act = ['OFF_GEN', ('tTYPE', UI(runs_per_node=1))]
+
+        def walk_info(d):
+            info = d.info[('sd_fuzz_typed_nodes', 'tTYPE')][0]
+            return [i for i in info if i.startswith(('model walking index', 'current fuzzed node'))]
+
+        fmk.cleanup_all_dmakers(reset_existing_seed=True)
+        outcomes = [walk_info(fmk.get_data(act, save_seed=True)) for i in range(20)]
+        fmk.cleanup_all_dmakers(reset_existing_seed=True)
+
+        fmk.set_pipeline_depth(2)
+        try:
+            prefetched = []
+            data_iter = fmk.iter_data(act, save_seed=True)
+            for d in data_iter:
+                prefetched.append(walk_info(d))
+                if len(prefetched) == 10:
+                    break
+            data_iter.close()
+            stats = fmk.get_pipeline_stats()
+
+            # Data generated in advance are not lost
+            for i in range(10):
+                prefetched.append(walk_info(fmk.get_data(act, save_seed=True)))
+        finally:
+            fmk.set_pipeline_depth(0)
+            fmk.cleanup_all_dmakers(reset_existing_seed=True)
+
+        self.assertEqual(prefetched, outcomes)
+        self.assertEqual(stats['consumed'], 10)
+        self.assertTrue(10 <= stats['produced'] <= 13)
+        self.assertTrue(stats['max_queue_depth'] <= 2)
+
+    def test_pipelined_generation_errors(self):
+        fmk.get_error()
+        cpt = [0]
+        seen = []
+
+        def produce():
+            cpt[0] += 1
+            # errors set by the main thread are not visible from the producer
+            seen.append(fmk.is_not_ok())
+            fmk.set_error('producer {:d}'.format(cpt[0]), code=Error.DataUnusable)
+            return cpt[0], cpt[0] == 50
+
+        consumed = []
+        for item in fmk.prefetch(produce, depth=2):
+            consumed.append(item)
+            with fmk._wait_section():
+                for i in range(20):
+                    fmk.set_error('main {:d}.{:d}'.format(item, i))
+            errors = [e.msg for e in fmk.get_error()]
+            self.assertEqual(errors[0], 'producer {:d}'.format(item))
+            self.assertEqual(errors[1:], ['main {:d}.{:d}'.format(item, i) for i in range(20)])
+
+        self.assertEqual(consumed, list(range(1, 51)))
+        self.assertEqual(seen, [False] * 50)
+        self.assertTrue(fmk.is_ok())
 
 
 if __name__ == "__main__":
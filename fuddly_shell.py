@@ -26,9 +26,13 @@
 import sys
 from framework.plumbing import *
 
-fmk = FmkPlumbing()
+# The guard is needed by the processes spawned by the framework (cf.
+# GenerationPool), which import this module
+if __name__ == "__main__":
 
-shell = FmkShell("Fuddly Shell", fmk)
-shell.cmdloop()
+    fmk = FmkPlumbing()
 
-sys.exit(0)
+    shell = FmkShell("Fuddly Shell", fmk)
+    shell.cmdloop()
+
+    sys.exit(0)
@@ -124,3 +124,11 @@ except ImportError:
     serial_module = False
     print('WARNING [FMK]: python(3)-serial module is not installed! '
           'Should be installed for serial-based Target.')
+
+zstd_module = True
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd_module = False
+    print('WARNING [FMK]: python(3)-zstandard module is not installed, zstd compression '
+          'of FmkDB payloads will not be available!')
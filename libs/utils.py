@@ -22,6 +22,9 @@
 ################################################################################
 
 import os
+import time
+import errno
+import select
 
 def ensure_dir(f):
     d = os.path.dirname(f)
@@ -47,3 +50,31 @@ def chunk_lines(string, length):
     if chk_list:
         chk_list[-1] = (chk_list[-1])[:-1]
     return chk_list
+
+def wait_for_fds(fds, events, timeout):
+    '''
+    Wait until some of `fds` (file descriptors, or objects providing a
+    fileno() method) are ready for `events` (e.g., select.POLLIN), at most
+    `timeout` seconds (None to wait indefinitely). Contrary to
+    select.select(), file descriptors beyond FD_SETSIZE are supported.
+
+    Returns:
+      list: the ready items of `fds` (in error ones included, so that their
+      next I/O reports it)
+    '''
+    poller = select.poll()
+    filenos = {}
+    for fd in fds:
+        fileno = fd if isinstance(fd, int) else fd.fileno()
+        filenos[fileno] = fd
+        poller.register(fileno, events)
+    deadline = None if timeout is None else time.time() + max(timeout, 0)
+    while True:
+        remaining = None if deadline is None else max(deadline - time.time(), 0) * 1000
+        try:
+            ready = poller.poll(remaining)
+        except (select.error, OSError, IOError) as e:
+            if e.args[0] == errno.EINTR:
+                continue
+            raise
+        return [filenos[fileno] for fileno, _ in ready]
@@ -45,6 +45,10 @@ group.add_argument('--no-color', action='store_true', help='Do not use colors')
 group.add_argument('-v', '--verbose', action='store_true', help='Verbose mode')
 group.add_argument('--page-width', type=int, metavar='WIDTH', default=100,
                     help='Width hint for displaying information')
+group.add_argument('-j', '--jobs', type=int, metavar='NB_PROCESSES', default=1,
+                   help='Number of processes scanning the database in parallel (0 for the '
+                        'number of CPUs). Supported by: --data-with-impact, '
+                        '--data-without-fbk, --data-with-specific-fbk')
 
 group = parser.add_argument_group('Configuration Handles')
 group.add_argument('--fbk-src', metavar='FEEDBACK_SOURCES',
@@ -58,6 +62,9 @@ group.add_argument('--project', metavar='PROJECT_NAME',
 
 group = parser.add_argument_group('Fuddly Database Visualization')
 group.add_argument('-s', '--all-stats', action='store_true', help='Show all statistics')
+group.add_argument('--shards', action='store_true',
+                   help='Show the previous shards of the database (their records are '
+                        'transparently included in the other queries)')
 
 group = parser.add_argument_group('Fuddly Database Information')
 group.add_argument('-i', '--info', type=int, metavar='DATA_ID',
@@ -142,8 +149,10 @@ if __name__ == "__main__":
             return string
 
     page_width = args.page_width
+    jobs = args.jobs if args.jobs > 0 else None
 
     display_stats = args.all_stats
+    display_shards = args.shards
 
     data_info = args.info
     data_info_by_date = args.info_by_date
@@ -163,7 +172,7 @@ if __name__ == "__main__":
     fbk_src = args.fbk_src
     data_with_specific_fbk = args.data_with_specific_fbk
 
-    fmkdb = Database(fmkdb_path=fmkdb)
+    fmkdb = Database(fmkdb_path=fmkdb, analysis_workers=jobs)
     ok = fmkdb.start()
     if not ok:
         print(colorize("*** ERROR: The database {:s} is invalid! ***".format(fmkdb.fmk_db_path),
@@ -174,6 +183,10 @@ if __name__ == "__main__":
 
         fmkdb.display_stats(colorized=colorized)
 
+    elif display_shards:
+
+        fmkdb.display_shards(colorized=colorized)
+
     elif data_info is not None:
 
         fmkdb.display_data_info(data_info, with_data=with_data, with_fbk=with_fbk,